@@ -0,0 +1,244 @@
+"""Headless batch pipeline: analyze many variant files without the API server.
+
+Each input file goes through parse, scoring, ensemble, annotation, clinical
+rules and the requested reports in a worker process, one file per task,
+largest files first. Results go to a job store (Parquet by default) under
+``--output``, laid out as the API lays them out, with the same
+content-addressed job ids; ``JOB_STORE=parquet JOB_STORE_DIR=<output>``
+serves them afterwards. Reports land in the report cache under
+``<output>/artifacts/``.
+
+Run from ``webtool/``::
+
+    python -m app.backend.batch data/cohorts/ --output runs/cohort1 --workers 32 --reports xlsx
+    python -m app.backend.batch a.vcf b.csv --output runs/ab --analyses SIFT,PolyPhen-2
+
+Every finished file appends a line to ``<output>/manifest.jsonl``. A file
+whose job already has results for the same analyses, and the requested
+reports, is skipped, so rerunning the same command after a crash or a
+scheduler timeout resumes where the last run stopped (``--force`` redoes
+everything). ``--stream`` runs the analysis in bounded memory: chunks flow
+through the stages concurrently and results are written to the store as
+they finish, instead of the whole file's results being built up first.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from .services.artifacts import ArtifactStore
+from .services.metrics import StageTimer
+from .services.parsers import parse_variant_file
+from .services.pipeline import analysis_key, run_pipeline
+from .services.reports import TEMPLATE_VERSION, load_templates, report_ext, write_report
+from .services.serialization import dumps
+from .services.storage import get_store, upload_job_id
+from .services.streaming import stream_analysis
+
+logger = logging.getLogger(__name__)
+
+INPUT_SUFFIXES = (".vcf", ".vcf.gz", ".csv", ".json", ".xlsx")
+REPORT_FORMATS = ("html", "pdf", "xlsx")
+REPORT_PAGE_SIZE = 5000
+MANIFEST = "manifest.jsonl"
+
+# Per-process store handles, opened by the pool initializer
+_worker: Dict[str, Any] = {}
+
+
+def find_inputs(paths: List[str]) -> List[str]:
+    """Input files from files and directories (searched recursively), without duplicates."""
+    found: Dict[str, None] = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_SUFFIXES):
+                        found[os.path.abspath(os.path.join(root, name))] = None
+        elif os.path.isfile(path):
+            found[os.path.abspath(path)] = None
+        else:
+            raise FileNotFoundError(path)
+    return list(found)
+
+
+def _init_worker(output: str, backend: str) -> None:
+    store = get_store(backend, output)
+    _worker["store"] = store
+    _worker["artifacts"] = ArtifactStore(os.path.join(store.base_dir, "artifacts"))
+    load_templates()
+
+
+def process_file(
+    path: str, analyses: List[str], options: Dict[str, Any], reports: List[str], force: bool = False,
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """Run one file through the pipeline; returns its manifest record."""
+    store, artifacts = _worker["store"], _worker["artifacts"]
+    t0 = time.perf_counter()
+    timer = StageTimer()
+    record: Dict[str, Any] = {"input": path, "status": "skipped"}
+    try:
+        with timer.stage("read"):
+            with open(path, "rb") as fh:
+                content = fh.read()
+        digest = hashlib.sha256(content).hexdigest()
+        job_id = upload_job_id(os.path.basename(path), digest)
+        key = analysis_key(analyses, options)
+        record.update(job_id=job_id, sha256=digest)
+
+        meta = None if force else store.load_meta(job_id)
+        if meta is None:
+            with timer.stage("parse"):
+                variants = parse_variant_file(os.path.basename(path), content)
+            with timer.stage("upload_write"):
+                store.save(job_id, {"filename": os.path.basename(path), "sha256": digest, "variants": variants})
+            record["status"] = "done"
+        del content
+
+        if meta is None or meta.get("analysis_key") != key or not meta["has_results"]:
+            if stream:
+                # The store pages the variants back in, chunk by chunk
+                variants = None
+                stream_analysis(store, job_id, analyses, options, timer=timer, analysis_key=key)
+            else:
+                if meta is not None:
+                    with timer.stage("load"):
+                        variants = store.load_variants(job_id)
+                results = run_pipeline(variants, analyses, options, timer=timer)
+                with timer.stage("hash"):
+                    results_sha256 = hashlib.sha256(dumps(results)).hexdigest()
+                with timer.stage("store_write"):
+                    store.save_results(
+                        job_id, results, analysis_key=key, results_sha256=results_sha256, stage_timings=timer.rounded()
+                    )
+                del results
+            del variants
+            artifacts.purge(job_id)
+            meta = store.load_meta(job_id)
+            record["status"] = "done"
+        record["num_variants"] = meta["num_variants"]
+
+        results_digest = (
+            meta.get("results_sha256") or hashlib.sha256(dumps(store.load_results(job_id))).hexdigest()
+        )[:32]
+        record["reports"] = {}
+        for fmt in reports:
+            ext = report_ext(fmt)
+            report = artifacts.get(job_id, results_digest, TEMPLATE_VERSION, ext)
+            if report is None:
+                with timer.stage(f"report_{ext}"):
+                    report = artifacts.put(
+                        job_id, results_digest, TEMPLATE_VERSION, ext,
+                        # Files are already spread over the pool; no nested PDF pool
+                        lambda tmp: write_report(
+                            ext, store.iter_results(job_id, page_size=REPORT_PAGE_SIZE), tmp,
+                            meta["num_variants"], pdf_workers=1,
+                        ),
+                    )
+                record["status"] = "done"
+            record["reports"][fmt] = report
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Batch processing of %s failed", path)
+        record.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+    record["seconds"] = round(time.perf_counter() - t0, 3)
+    record["stage_timings"] = timer.rounded()
+    return record
+
+
+def run_batch(
+    files: List[str],
+    output: str,
+    backend: str = "parquet",
+    workers: Optional[int] = None,
+    analyses: Optional[List[str]] = None,
+    options: Optional[Dict[str, Any]] = None,
+    reports: Optional[List[str]] = None,
+    force: bool = False,
+    progress: bool = True,
+    stream: bool = False,
+) -> List[Dict[str, Any]]:
+    """Process ``files`` across ``workers`` processes, appending each record to the manifest."""
+    os.makedirs(output, exist_ok=True)
+    # Largest first, so one big file does not start last and hold up the run
+    files = sorted(files, key=os.path.getsize, reverse=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    records: List[Dict[str, Any]] = []
+    with open(os.path.join(output, MANIFEST), "a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(output, backend)
+    ) as pool:
+        futures = {
+            pool.submit(process_file, path, analyses or ["all"], options or {}, reports or [], force, stream): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as exc:  # noqa: BLE001  (a worker died, e.g. out of memory)
+                record = {"input": futures[future], "status": "failed", "error": f"{type(exc).__name__}: {exc}"}
+            record["finished_at"] = time.time()
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            records.append(record)
+            if progress:
+                print(
+                    f"[{len(records)}/{len(files)}] {record['status']:<7} {os.path.basename(record['input'])}"
+                    f"  {record.get('num_variants', 0):,} variants  {record.get('seconds', 0):.1f} s"
+                    + (f"  {record['error']}" if "error" in record else ""),
+                    flush=True,
+                )
+    return records
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="variant files, or directories to search for " + ", ".join(INPUT_SUFFIXES))
+    parser.add_argument("--output", required=True, help="directory for the job store, reports and manifest")
+    parser.add_argument("--store", default="parquet", choices=["parquet", "sqlite", "json"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("--analyses", default="all", help="comma-separated algorithms, as for /analyze")
+    parser.add_argument("--options", default="{}", help="analysis options as JSON, as for /analyze")
+    parser.add_argument("--reports", default="", help="comma-separated report formats: " + ", ".join(REPORT_FORMATS))
+    parser.add_argument("--force", action="store_true", help="reprocess files that already have results")
+    parser.add_argument("--stream", action="store_true", help="analyze in bounded memory, writing results as chunks finish")
+    args = parser.parse_args(argv)
+
+    reports = [r.strip() for r in args.reports.split(",") if r.strip()]
+    unknown = set(reports) - set(REPORT_FORMATS)
+    if unknown:
+        parser.error(f"unknown report format(s): {', '.join(sorted(unknown))}")
+    try:
+        options = json.loads(args.options)
+        files = find_inputs(args.inputs)
+    except (ValueError, FileNotFoundError) as exc:
+        parser.error(str(exc))
+    if not files:
+        parser.error("no input files found")
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    t0 = time.perf_counter()
+    records = run_batch(
+        files, args.output, backend=args.store, workers=args.workers,
+        analyses=[a.strip() for a in args.analyses.split(",") if a.strip()],
+        options=options, reports=reports, force=args.force, stream=args.stream,
+    )
+    elapsed = time.perf_counter() - t0
+    counts = {status: sum(1 for r in records if r["status"] == status) for status in ("done", "skipped", "failed")}
+    variants = sum(r.get("num_variants", 0) for r in records if r["status"] == "done")
+    print(
+        f"{counts['done']} done, {counts['skipped']} skipped, {counts['failed']} failed in {elapsed:.1f} s"
+        f" ({variants / elapsed if elapsed else 0:,.0f} variants/s); manifest: {os.path.join(args.output, MANIFEST)}"
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
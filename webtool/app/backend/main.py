@@ -1,17 +1,75 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import BackgroundTasks, FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+import base64
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+import os
+import sys
+import threading
 import uuid
 
 from .services.parsers import parse_variant_file
-from .services.scoring import run_scoring_algorithms, run_ensemble_scores
-from .services.annotate import annotate_with_databases, clinical_actionability
-from .services.reports import generate_html_report, generate_pdf_report, generate_excel_report
-from .services.storage import LocalJSONStore
-from .services.cosmic_client import get_cosmic_client
+from .services.pipeline import analysis_key, run_pipeline
+from .services.analysis_jobs import AnalysisRunner
+from .services.reports import (
+    PDF_MEDIA_TYPE,
+    TEMPLATE_VERSION,
+    XLSX_MEDIA_TYPE,
+    load_templates,
+    report_ext,
+    shutdown_pdf_pool,
+    stream_html_report,
+    write_report,
+)
+from .services.downloads import not_modified, etag_matches, serve_download
+from .services.artifacts import ArtifactPurged, ArtifactStore
+from .services.storage import COLUMN_SECTIONS, RESULT_SECTIONS, get_store, upload_job_id
+from .services.cosmic_client import get_cosmic_client, run_search, run_search_batch
+from .services.serialization import FastJSONResponse, dumps
+from .services.compression import CompressionMiddleware
+from .services.retention import RetentionManager
+from .services.structures import STRUCTURE_FORMATS, StructureNotFound, get_structure_store
+from .services import metrics
+from .services.metrics import ANALYSES_IN_PROGRESS, MetricsMiddleware, StageTimer, time_stage
+from .services.profiling import ProfileStore, ProfilingMiddleware, tag_job
+from .services.shards import SHARD_MAX_VARIANTS, ShardQueue, submit_sharded
+
+logger = logging.getLogger(__name__)
+
+store = get_store()
+artifacts = ArtifactStore(os.path.join(store.base_dir, "artifacts"))
+profiles = ProfileStore(os.path.join(store.base_dir, "profiles"), max_profiles=int(os.environ.get("PROFILE_MAX_COUNT", "200")))
+retention = RetentionManager(store, artifacts=artifacts, profiles=profiles)
+# Shards of large analyses, processed by `python -m app.backend.sharded work` on any node
+shard_queue = ShardQueue(store.base_dir)
+structures = get_structure_store(os.path.join(store.base_dir, "structures"))
+# Structures fetched (and indexed) in the background at startup
+STRUCTURE_PREFETCH = [p.strip() for p in os.environ.get("STRUCTURE_PREFETCH", "").split(",") if p.strip()]
+
 
-app = FastAPI(title="Cancer Mutation Webtool API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compiling templates imports jinja2; keep it off the path to serving requests
+    threading.Thread(target=load_templates, name="template-warmup", daemon=True).start()
+    retention.start()
+    if STRUCTURE_PREFETCH:
+        threading.Thread(target=structures.prefetch, args=(STRUCTURE_PREFETCH,), name="structure-prefetch", daemon=True).start()
+    yield
+    runner.shutdown()
+    retention.stop()
+    shutdown_pdf_pool()
+
+
+app = FastAPI(
+    title="Cancer Mutation Webtool API",
+    version="0.1.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,8 +78,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-store = LocalJSONStore()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+app.add_middleware(MetricsMiddleware)
+# Per-request profiling (X-Profile header or ?profile=), off unless REQUEST_PROFILING=1
+if os.environ.get("REQUEST_PROFILING", "0").lower() in ("1", "true", "yes"):
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profiles,
+        paths=("/upload", "/analyze", "/report"),
+        interval=float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000,
+    )
 
 
 class AnalyzeRequest(BaseModel):
@@ -35,41 +101,183 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage timings, pipeline and COSMIC counters and in-flight gauges, in Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _analysis_key(req: AnalyzeRequest) -> str:
+    return analysis_key(req.analyses, req.options)
+
+
 @app.post("/upload")
 async def upload_variants(file: UploadFile = File(...)) -> Dict[str, Any]:
     try:
-        content = await file.read()
-        variants = parse_variant_file(file.filename, content)
-        job_id = str(uuid.uuid4())
-        store.save(job_id, {"filename": file.filename, "variants": variants})
-        return {"job_id": job_id, "num_variants": len(variants)}
+        hasher = hashlib.sha256()
+        chunks = []
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            chunks.append(chunk)
+        digest = hasher.hexdigest()
+        job_id = upload_job_id(file.filename, digest)
+        existing = store.load_meta(job_id)
+        if existing is not None:
+            # Every upload gets a job of its own, so one client's analysis never
+            # replaces another's results. Copying the first upload of the file
+            # skips parsing and carries over its results for reuse.
+            source, job_id = job_id, str(uuid.uuid4())
+        tag_job(job_id)
+        if existing is not None and store.copy_job(source, job_id):
+            return {"job_id": job_id, "num_variants": existing["num_variants"], "sha256": digest, "deduplicated": True}
+
+        with time_stage("parse"):
+            variants = parse_variant_file(file.filename, b"".join(chunks))
+        with time_stage("upload_write"):
+            store.save(job_id, {"filename": file.filename, "sha256": digest, "variants": variants})
+        return {"job_id": job_id, "num_variants": len(variants), "sha256": digest, "deduplicated": False}
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc))
 
 
 @app.post("/analyze")
-async def analyze(req: AnalyzeRequest) -> Dict[str, Any]:
+async def analyze(req: AnalyzeRequest, background_tasks: BackgroundTasks) -> Dict[str, Any]:
     if not req.job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
-    payload = store.load(req.job_id)
-    if payload is None:
+    meta = store.load_meta(req.job_id)
+    if meta is None:
         raise HTTPException(status_code=404, detail="job_id not found")
+    tag_job(req.job_id)
+
+    analysis_key = _analysis_key(req)
+    if meta.get("analysis_key") == analysis_key and meta["has_results"]:
+        return FastJSONResponse({"job_id": req.job_id, **store.load_results(req.job_id)})
 
-    variants = payload["variants"]
-    scores = run_scoring_algorithms(variants, req.analyses, req.options)
-    ensemble = run_ensemble_scores(scores)
-    annotations = annotate_with_databases(variants)
-    clinical = clinical_actionability(annotations)
-
-    results = {
-        "variants": variants,
-        "scores": scores,
-        "ensemble": ensemble,
-        "annotations": annotations,
-        "clinical": clinical,
+    timer = StageTimer()
+    try:
+        with ANALYSES_IN_PROGRESS.track():
+            with timer.stage("load"):
+                variants = store.load_variants(req.job_id)
+            results = run_pipeline(variants, req.analyses, req.options, timer=timer)
+            with timer.stage("hash"):
+                results_sha256 = hashlib.sha256(dumps(results)).hexdigest()
+            with timer.stage("store_write"):
+                store.save_results(
+                    req.job_id, results,
+                    analysis_key=analysis_key, results_sha256=results_sha256, stage_timings=timer.rounded(),
+                )
+    finally:
+        timer.finish()
+    background_tasks.add_task(_results_saved, req.job_id, meta.get("results_sha256"), results_sha256)
+    return FastJSONResponse({"job_id": req.job_id, **results}, headers={"Server-Timing": timer.server_timing()})
+
+
+def _results_saved(job_id: str, previous_sha256: Optional[str], results_sha256: str) -> None:
+    """Follow-up work once new results are stored (runs in the background)."""
+    if previous_sha256 != results_sha256:
+        artifacts.purge(job_id)
+        _drop_job_index(job_id)
+    if PRERENDER_FORMATS:
+        _prerender_reports(job_id)
+
+
+MAX_PAGE_SIZE = 1000
+# Larger pages for clients catching up with a running analysis
+MAX_ANALYSIS_PAGE_SIZE = 5000
+ANALYSIS_CHUNK_SIZE = int(os.environ.get("ANALYSIS_CHUNK_SIZE", "5000"))
+# Bounded-memory mode: stages overlap and results go to the store chunk by chunk
+ANALYSIS_STREAMING = os.environ.get("ANALYSIS_STREAMING", "0").lower() in ("1", "true", "yes")
+runner = AnalysisRunner(
+    store,
+    workers=int(os.environ.get("ANALYSIS_WORKERS", "2")),
+    chunk_size=ANALYSIS_CHUNK_SIZE,
+    on_complete=_results_saved,
+    streaming=ANALYSIS_STREAMING,
+)
+
+
+@app.post("/jobs/{job_id}/analyze", status_code=202)
+def analyze_async(job_id: str, req: AnalyzeRequest) -> Dict[str, Any]:
+    """Start an analysis in the background; poll ``GET /jobs/{job_id}/analysis`` for progress."""
+    meta = store.load_meta(job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="job_id not found")
+    analysis_key = _analysis_key(req)
+    if meta.get("analysis_key") == analysis_key and meta["has_results"]:
+        return _stored_status(job_id, meta)
+    try:
+        return runner.submit(job_id, req.analyses, req.options, analysis_key)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+def _stored_status(job_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    n = meta["num_variants"]
+    return {
+        "job_id": job_id, "state": "done", "processed": n, "total": n, "error": None,
+        "stage_timings": meta.get("stage_timings"),
     }
-    store.save(req.job_id, {**payload, "results": results})
-    return {"job_id": req.job_id, **results}
+
+
+@app.get("/jobs/{job_id}/analysis")
+def analysis_status(
+    job_id: str,
+    offset: Optional[int] = Query(None, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_ANALYSIS_PAGE_SIZE),
+):
+    """Progress of a background analysis.
+
+    With ``offset``, also returns the results finished so far for variants
+    ``[offset, offset + limit)``, so clients can render a job as it runs.
+    """
+    status = runner.status(job_id)
+    if status is None:
+        meta = store.load_meta(job_id)
+        if meta is None or not meta["has_results"]:
+            raise HTTPException(status_code=404, detail="no analysis for job_id")
+        status = _stored_status(job_id, meta)
+    body: Dict[str, Any] = {**status, "results": None}
+    if offset is not None:
+        page = runner.partial(job_id, offset, limit)
+        if page is None and status["state"] == "done":
+            page = store.load_results(job_id, offset=offset, limit=limit)
+        body["results"] = page
+    return FastJSONResponse(body)
+
+
+class ShardedAnalyzeRequest(AnalyzeRequest):
+    max_shard_variants: int = Field(SHARD_MAX_VARIANTS, ge=1)
+
+
+@app.post("/jobs/{job_id}/shards", status_code=202)
+def analyze_sharded(job_id: str, req: ShardedAnalyzeRequest) -> Dict[str, Any]:
+    """Queue an analysis split by chromosome for the shard workers.
+
+    Poll ``GET /jobs/{job_id}/shards``; once it is ``done`` the results are
+    served like any other analysis.
+    """
+    meta = store.load_meta(job_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="job_id not found")
+    analysis_key = _analysis_key(req)
+    if meta.get("analysis_key") == analysis_key and meta["has_results"]:
+        return _stored_status(job_id, meta)
+    try:
+        return submit_sharded(shard_queue, store, job_id, req.analyses, req.options, req.max_shard_variants)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@app.get("/jobs/{job_id}/shards")
+def sharded_status(job_id: str) -> Dict[str, Any]:
+    """Progress of a sharded analysis, shard by shard."""
+    status = shard_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="no sharded analysis for job_id")
+    return status
 
 
 class ReportRequest(BaseModel):
@@ -77,23 +285,226 @@ class ReportRequest(BaseModel):
     format: str = "html"  # html | pdf | xlsx
 
 
+REPORT_PAGE_SIZE = 5000
+# Formats rendered in the background as soon as /analyze stores new results,
+# e.g. REPORT_PRERENDER=pdf,xlsx. Empty (the default) renders on first request.
+PRERENDER_FORMATS = [f.strip() for f in os.environ.get("REPORT_PRERENDER", "").split(",") if f.strip()]
+
+
+def _results_digest(job_id: str, meta: Dict[str, Any]) -> str:
+    # Jobs analyzed before results were hashed at write time
+    digest = meta.get("results_sha256") or hashlib.sha256(dumps(store.load_results(job_id))).hexdigest()
+    return digest[:32]
+
+
+def _html_chunks(job_id: str, num_variants: int):
+    pages = store.iter_results(job_id, page_size=REPORT_PAGE_SIZE)
+    return (chunk.encode("utf-8") for chunk in stream_html_report(pages, num_variants))
+
+
+def _report_artifact(job_id: str, meta: Dict[str, Any], digest: str, fmt: str) -> str:
+    """Path of the rendered report, rendering it on a cache miss."""
+    ext = report_ext(fmt)
+
+    def write(tmp: str) -> None:
+        with time_stage(f"report_{ext}"):
+            write_report(ext, store.iter_results(job_id, page_size=REPORT_PAGE_SIZE), tmp, meta["num_variants"])
+
+    try:
+        return artifacts.get_or_create(job_id, digest, TEMPLATE_VERSION, ext, write)
+    except ArtifactPurged:
+        raise HTTPException(status_code=409, detail="Results changed while the report was rendering; retry the request")
+
+
+def _prerender_reports(job_id: str) -> None:
+    meta = store.load_meta(job_id)
+    if meta is None or not meta["has_results"]:
+        return
+    digest = _results_digest(job_id, meta)
+    for fmt in PRERENDER_FORMATS:
+        try:
+            _report_artifact(job_id, meta, digest, fmt)
+        except Exception:  # noqa: BLE001
+            logger.exception("Pre-rendering %s report for job %s failed", fmt, job_id)
+
+
 @app.post("/report")
 async def report(req: ReportRequest):
-    payload = store.load(req.job_id)
-    if payload is None or "results" not in payload:
+    meta = store.load_meta(req.job_id)
+    if meta is None or not meta["has_results"]:
         raise HTTPException(status_code=404, detail="results not found for job_id")
+    if req.format not in {"html", "pdf", "xlsx", "excel"}:
+        raise HTTPException(status_code=400, detail="Unsupported report format")
+    tag_job(req.job_id)
 
-    results = payload["results"]
+    digest = _results_digest(req.job_id, meta)
     if req.format == "html":
-        return {"html": generate_html_report(results)}
-    if req.format == "pdf":
-        pdf_bytes_b64 = generate_pdf_report(results)
-        return {"pdf_base64": pdf_bytes_b64}
-    if req.format in {"xlsx", "excel"}:
-        xlsx_b64 = generate_excel_report(results)
-        return {"excel_base64": xlsx_b64}
+        path = artifacts.get(req.job_id, digest, TEMPLATE_VERSION, "html")
+        if path is not None:
+            return FileResponse(path, media_type="text/html; charset=utf-8")
+        # First render streams to the client and into the cache at the same time
+        return StreamingResponse(
+            artifacts.tee(req.job_id, digest, TEMPLATE_VERSION, "html", _html_chunks(req.job_id, meta["num_variants"])),
+            media_type="text/html; charset=utf-8",
+        )
+    fmt = "xlsx" if req.format == "excel" else req.format
+    path = _report_artifact(req.job_id, meta, digest, fmt)
+    with open(path, "rb") as fh:
+        encoded = base64.b64encode(fh.read()).decode("utf-8")
+    return FastJSONResponse({"pdf_base64" if fmt == "pdf" else "excel_base64": encoded})
+
 
-    raise HTTPException(status_code=400, detail="Unsupported report format")
+DOWNLOAD_MEDIA_TYPES = {"pdf": PDF_MEDIA_TYPE, "xlsx": XLSX_MEDIA_TYPE, "html": "text/html; charset=utf-8"}
+
+
+@app.api_route("/jobs/{job_id}/report.{fmt}", methods=["GET", "HEAD"])
+def download_report(job_id: str, fmt: str, request: Request):
+    """Binary report download with ETag revalidation and byte ranges."""
+    if fmt not in {"pdf", "xlsx"}:
+        raise HTTPException(status_code=400, detail="Unsupported report format")
+    meta = store.load_meta(job_id)
+    if meta is None or not meta["has_results"]:
+        raise HTTPException(status_code=404, detail="results not found for job_id")
+
+    digest = _results_digest(job_id, meta)
+    etag = f'"{digest}-{TEMPLATE_VERSION}-{fmt}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    ext = report_ext(fmt)
+    path = _report_artifact(job_id, meta, digest, fmt)
+    return serve_download(request, path, DOWNLOAD_MEDIA_TYPES[ext], f"cancer_mutation_report_{job_id[:8]}.{ext}", etag)
+
+
+@app.get("/jobs/{job_id}/results")
+def job_results_page(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    sections: Optional[str] = None,
+):
+    """One page of results, indexed by variant position in the upload."""
+    wanted = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(RESULT_SECTIONS)
+    unknown = set(wanted) - set(RESULT_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(sorted(unknown))}")
+    meta = store.load_meta(job_id)
+    if meta is None or not meta["has_results"]:
+        raise HTTPException(status_code=404, detail="results not found for job_id")
+    page = store.load_results(job_id, sections=wanted, offset=offset, limit=limit)
+    return FastJSONResponse({"job_id": job_id, "offset": offset, "limit": limit, "total": meta["num_variants"], **page})
+
+
+@app.get("/jobs/{job_id}/columns/{section}")
+def job_columns(
+    job_id: str,
+    section: str,
+    columns: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """Selected columns of one section in columnar form ({column: [values]})."""
+    if section not in COLUMN_SECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown section: {section}")
+    wanted = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    data = store.load_columns(job_id, section, wanted, offset=offset, limit=limit)
+    if data is None:
+        raise HTTPException(status_code=404, detail="results not found for job_id")
+    return FastJSONResponse({"job_id": job_id, "section": section, "offset": offset, "columns": data})
+
+
+class ScoreRangeModel(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    include_missing: bool = False
+    max_exclusive: bool = False
+
+
+class QueryRequest(BaseModel):
+    genes: List[str] = []
+    ranges: Dict[str, ScoreRangeModel] = {}  # score or ensemble column -> bounds
+    cancer_types: List[str] = []  # any of these COSMIC cancer types
+    cancer_types_include_missing: bool = False
+    contains: Optional[str] = None  # substring of the variant, protein change or COSMIC id
+    actionable: Optional[bool] = None
+    cosmic_match: Optional[bool] = None
+    sort_by: Optional[str] = None
+    descending: bool = False
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=MAX_PAGE_SIZE)
+    columns: Optional[List[str]] = None
+
+
+def _job_index(job_id: str, meta: Optional[Dict[str, Any]] = None):
+    # The query subsystem (and numpy) loads with the first query
+    from .services.query import get_index_cache
+
+    meta = meta or store.load_meta(job_id)
+    if meta is None or not meta["has_results"]:
+        return None
+    return get_index_cache().get(store, job_id, _results_digest(job_id, meta), meta["num_variants"])
+
+
+def _drop_job_index(job_id: str) -> None:
+    # Indexes are built on the first /query or /aggregate, which would load the
+    # whole job right after a bounded-memory analysis; only drop a stale one
+    query = sys.modules.get(f"{__package__}.services.query")
+    if query is not None:
+        query.get_index_cache().invalidate(job_id)
+
+
+def _result_query(req: QueryRequest):
+    from .services.query import Query as ResultQuery, ScoreRange
+
+    return ResultQuery(
+        genes=req.genes,
+        ranges={name: ScoreRange(**bounds.model_dump()) for name, bounds in req.ranges.items()},
+        cancer_types=req.cancer_types,
+        cancer_types_include_missing=req.cancer_types_include_missing,
+        contains=req.contains,
+        actionable=req.actionable,
+        cosmic_match=req.cosmic_match,
+        sort_by=req.sort_by,
+        descending=req.descending,
+        offset=req.offset,
+        limit=req.limit,
+    )
+
+
+@app.post("/jobs/{job_id}/query")
+def job_query(job_id: str, req: QueryRequest):
+    """Filtered, sorted page of a job's variants, answered from an in-memory column index."""
+    index = _job_index(job_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="results not found for job_id")
+    try:
+        total, rows = index.search(_result_query(req))
+        items = index.rows(rows, req.columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return FastJSONResponse({"job_id": job_id, "total": total, "offset": req.offset, "limit": req.limit, "rows": items})
+
+
+MAX_AGGREGATE_SAMPLE = 10000
+
+
+class AggregateRequest(QueryRequest):
+    bins: int = Field(50, ge=1, le=500)
+    top_genes: int = Field(30, ge=1, le=500)
+    sample: int = Field(0, ge=0, le=MAX_AGGREGATE_SAMPLE)
+
+
+@app.post("/jobs/{job_id}/aggregate")
+def job_aggregate(job_id: str, req: AggregateRequest):
+    """Score histograms, a gene x score heatmap and an optional evenly spaced sample of the matching variants."""
+    index = _job_index(job_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="results not found for job_id")
+    try:
+        rows = index.match(_result_query(req))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return FastJSONResponse({"job_id": job_id, **index.aggregate(rows, bins=req.bins, top_genes=req.top_genes, sample=req.sample)})
 
 
 class COSMICSearchRequest(BaseModel):
@@ -111,24 +522,31 @@ async def cosmic_search(req: COSMICSearchRequest):
     cosmic_client = get_cosmic_client()  # Uses mock client for demo
     
     try:
-        if req.search_type == "gene":
-            result = cosmic_client.get_gene_info(req.query)
-        elif req.search_type == "mutation":
-            result = cosmic_client.search_mutations(req.gene or req.query, req.query)
-        elif req.search_type == "coordinates":
-            if not all([req.chromosome, req.position, req.ref, req.alt]):
-                raise HTTPException(status_code=400, detail="Missing coordinate parameters")
-            result = cosmic_client.search_by_coordinates(req.chromosome, req.position, req.ref, req.alt)
-        elif req.search_type == "cancer_type":
-            result = cosmic_client.search_cancer_types(req.query)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid search type")
-        
+        result = run_search(cosmic_client, **req.model_dump())
         return {"results": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+MAX_BATCH_QUERIES = 5000
+
+
+class COSMICBatchSearchRequest(BaseModel):
+    queries: List[COSMICSearchRequest]
+    max_workers: int = 8
+
+
+@app.post("/cosmic/search/batch")
+def cosmic_search_batch(req: COSMICBatchSearchRequest):
+    if len(req.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    cosmic_client = get_cosmic_client()
+    queries = [q.model_dump() for q in req.queries]
+    return run_search_batch(cosmic_client, queries, max_workers=min(max(req.max_workers, 1), 32))
+
+
 class COSMICMutationRequest(BaseModel):
     cosmic_id: str
 
@@ -142,3 +560,90 @@ async def cosmic_mutation_details(req: COSMICMutationRequest):
         return {"mutation": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/structures")
+def list_structures() -> Dict[str, Any]:
+    """PDB IDs available from the local structure cache."""
+    return {"structures": structures.cached_ids(), "offline": structures.offline}
+
+
+@app.get("/structures/{pdb_id}.{fmt}")
+def get_structure(pdb_id: str, fmt: str):
+    """A PDB or mmCIF file, fetched from the mirror on first use and then served locally."""
+    if fmt not in STRUCTURE_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported structure format")
+    try:
+        path = structures.get(pdb_id, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StructureNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Structure download failed: {e}")
+    # Released entries are immutable under their ID
+    return FileResponse(path, media_type=STRUCTURE_FORMATS[fmt], headers={"Cache-Control": "public, max-age=86400"})
+
+
+@app.get("/structures/{pdb_id}/residues")
+def structure_residues(
+    pdb_id: str,
+    gene: Optional[str] = None,
+    uniprot: Optional[str] = None,
+    position: Optional[int] = Query(None, ge=1),
+) -> Dict[str, Any]:
+    """Residues modelling UniProt positions, from the structure's precomputed index."""
+    try:
+        return structures.residues(pdb_id, gene=gene, uniprot=uniprot, position=position)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StructureNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Structure download failed: {e}")
+
+
+@app.get("/admin/storage")
+def admin_storage() -> Dict[str, Any]:
+    return retention.stats()
+
+
+@app.post("/admin/storage/sweep")
+def admin_storage_sweep() -> Dict[str, Any]:
+    return retention.sweep()
+
+
+@app.get("/admin/profiles")
+def admin_profiles(job_id: Optional[str] = None) -> Dict[str, Any]:
+    """Captured request profiles, newest first."""
+    try:
+        return {"profiles": profiles.list(job_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_profile(profile_id: str) -> Dict[str, Any]:
+    """A profile's request details and top functions."""
+    summary = profiles.get(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return summary
+
+
+PROFILE_DOWNLOADS = {
+    "stacks.txt": ("stacks", "text/plain; charset=utf-8"),
+    "profile.prof": ("pstats", "application/octet-stream"),
+}
+
+
+@app.get("/admin/profiles/{profile_id}/{name}")
+def admin_profile_file(profile_id: str, name: str):
+    """Collapsed stacks (sampling mode) or the pstats dump (cProfile mode) of a profile."""
+    if name not in PROFILE_DOWNLOADS:
+        raise HTTPException(status_code=404, detail="Unknown profile file")
+    kind, media_type = PROFILE_DOWNLOADS[name]
+    path = profiles.file(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"profile has no {name}")
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}-{name}")
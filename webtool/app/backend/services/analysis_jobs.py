@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import ANALYSES_IN_PROGRESS, ANALYSES_QUEUED, StageTimer
+from .pipeline import merge_results, run_pipeline
+from .serialization import dumps
+from .storage import RESULT_SECTIONS, _page
+from .streaming import STREAM_QUEUE_DEPTH, stream_analysis
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs stay visible to status polls for this long
+FINISHED_TTL_SECONDS = 3600.0
+_PUBLIC_FIELDS = (
+    "job_id", "state", "processed", "total", "error", "submitted_at", "started_at", "finished_at", "stage_timings",
+)
+
+
+class AnalysisRunner:
+    """Runs analyses in a small thread pool and tracks their progress.
+
+    The pipeline works through a job in chunks of ``chunk_size`` variants.
+    Finished chunks are kept in memory until the job completes, so clients
+    can fetch partial results while the rest is still running; the full
+    results are then written to the store in one ``save_results`` call.
+    ``on_complete(job_id, previous_sha256, results_sha256)`` runs after the
+    save. Seconds spent per stage are saved with the results as
+    ``stage_timings`` (up to the save itself, which only the status shows).
+
+    With ``streaming``, chunks of ``STREAM_CHUNK_SIZE`` variants instead flow
+    through the stages concurrently (see :func:`~.streaming.stream_analysis`)
+    and are written to the store as they finish, so memory does not grow
+    with the job; partial results are then not available until it is done.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        workers: int = 2,
+        chunk_size: int = 5000,
+        on_complete: Optional[Callable[[str, Optional[str], str], None]] = None,
+        streaming: bool = False,
+        queue_depth: int = STREAM_QUEUE_DEPTH,
+    ) -> None:
+        self.store = store
+        self.chunk_size = chunk_size
+        self.streaming = streaming
+        self.queue_depth = queue_depth
+        self.on_complete = on_complete
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, analyses: List[str], options: Dict[str, Any], analysis_key: str) -> Dict[str, Any]:
+        """Queue an analysis; a job already running with the same key is not started twice."""
+        with self._lock:
+            self._prune(time.time())
+            current = self._jobs.get(job_id)
+            if current is not None and current["state"] in ("queued", "running"):
+                if current["analysis_key"] != analysis_key:
+                    raise RuntimeError("A different analysis is already running for this job")
+                return self._public(current)
+            job: Dict[str, Any] = {
+                "job_id": job_id,
+                "state": "queued",
+                "analysis_key": analysis_key,
+                "processed": 0,
+                "total": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "stage_timings": None,
+                "parts": [],
+            }
+            self._jobs[job_id] = job
+        ANALYSES_QUEUED.inc()
+        self._executor.submit(self._run, job, analyses, options)
+        return self._public(job)
+
+    def _run(self, job: Dict[str, Any], analyses: List[str], options: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        timer = StageTimer()
+        ANALYSES_QUEUED.dec()
+        ANALYSES_IN_PROGRESS.inc()
+        try:
+            with timer.stage("load"):
+                meta = self.store.load_meta(job_id)
+                variants = None if self.streaming else self.store.load_variants(job_id)
+            with self._lock:
+                job.update(state="running", total=meta["num_variants"], started_at=time.time())
+            if self.streaming:
+                def progress(processed: int) -> None:
+                    with self._lock:
+                        job["processed"] = processed
+
+                results_sha256 = stream_analysis(
+                    self.store, job_id, analyses, options, queue_depth=self.queue_depth,
+                    timer=timer, on_progress=progress, analysis_key=job["analysis_key"],
+                )
+            else:
+                results: Dict[str, Any] = {"variants": [], **{section: {} for section in RESULT_SECTIONS}}
+                for offset in range(0, len(variants), self.chunk_size):
+                    part = run_pipeline(
+                        variants[offset:offset + self.chunk_size], analyses, options, offset=offset, timer=timer
+                    )
+                    merge_results(results, part)
+                    with self._lock:
+                        job["parts"].append((offset, part))
+                        job["processed"] = offset + len(part["variants"])
+
+                with timer.stage("hash"):
+                    results_sha256 = hashlib.sha256(dumps(results)).hexdigest()
+                with timer.stage("store_write"):
+                    self.store.save_results(
+                        job_id, results,
+                        analysis_key=job["analysis_key"], results_sha256=results_sha256, stage_timings=timer.rounded(),
+                    )
+            if self.on_complete is not None:
+                self.on_complete(job_id, (meta or {}).get("results_sha256"), results_sha256)
+            with self._lock:
+                job.update(state="done", finished_at=time.time(), stage_timings=timer.rounded(), parts=[])
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Analysis of job %s failed", job_id)
+            with self._lock:
+                job.update(state="failed", error=str(exc), finished_at=time.time(), stage_timings=timer.rounded(), parts=[])
+        finally:
+            ANALYSES_IN_PROGRESS.dec()
+            timer.finish()
+
+    def _prune(self, now: float) -> None:
+        for job_id, job in list(self._jobs.items()):
+            if job["finished_at"] is not None and now - job["finished_at"] > FINISHED_TTL_SECONDS:
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: job[name] for name in _PUBLIC_FIELDS}
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._public(job)
+
+    def partial(self, job_id: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """Finished results for variants ``[offset, offset + limit)`` of a running job.
+
+        Returns None when the job is not running here (the caller should read
+        the store instead), or when it is streaming.
+        """
+        if self.streaming:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] not in ("queued", "running"):
+                return None
+            parts = list(job["parts"])
+        page: Dict[str, Any] = {"variants": [], **{section: {} for section in RESULT_SECTIONS}}
+        end = offset + limit
+        for start, part in parts:
+            stop = start + len(part["variants"])
+            if stop <= offset or start >= end:
+                continue
+            lo, hi = max(offset, start), min(end, stop)
+            page["variants"].extend(part["variants"][lo - start:hi - start])
+            for section in RESULT_SECTIONS:
+                page[section].update(_page(part[section], lo, hi - lo))
+        return page
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -4,12 +4,12 @@ from typing import List, Dict, Any
 from .cosmic_client import get_cosmic_client
 
 
-def annotate_with_databases(variants: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-	"""Annotate variants with COSMIC database information"""
+def annotate_with_databases(variants: List[Dict[str, Any]], offset: int = 0) -> Dict[str, Dict[str, Any]]:
+	"""Annotate variants with COSMIC database information (``offset``: job index of ``variants[0]``)"""
 	cosmic_client = get_cosmic_client()
 	annotations: Dict[str, Dict[str, Any]] = {}
 	
-	for idx, v in enumerate(variants):
+	for idx, v in enumerate(variants, start=offset):
 		key = _vk(v, idx)
 		gene = v.get("gene", "")
 		chrom = v.get("chrom", "")
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Iterable, Iterator, Optional
+
+_LOCK_STRIPES = 64
+
+
+class ArtifactPurged(RuntimeError):
+    """The job's artifacts were purged (its results changed) while one was being written."""
+
+
+class ArtifactStore:
+    """Rendered report files on disk, one directory per job.
+
+    An artifact is identified by the job's results digest, the report
+    template version and the format, so the bytes behind an ETag never change
+    and byte ranges stay consistent across requests. Re-analysis or a template
+    change produces a new key; older files for the job are dropped when the
+    new one is published.
+    """
+
+    def __init__(self, base_dir: str) -> None:
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+        # Striped locks so concurrent requests for one artifact render it once.
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def path(self, job_id: str, digest: str, version: str, ext: str) -> str:
+        return os.path.join(self.base_dir, job_id, f"{digest}-{version}.{ext}")
+
+    def get(self, job_id: str, digest: str, version: str, ext: str) -> Optional[str]:
+        path = self.path(job_id, digest, version, ext)
+        return path if os.path.exists(path) else None
+
+    def _tmp_path(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def _publish(self, tmp: str, path: str) -> None:
+        try:
+            os.replace(tmp, path)
+        except FileNotFoundError as exc:
+            self._raise_if_purged(exc, tmp)
+            raise
+        key = os.path.basename(path).rsplit(".", 1)[0]
+        job_dir = os.path.dirname(path)
+        for name in os.listdir(job_dir):
+            if not name.startswith(key) and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(job_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _raise_if_purged(exc: FileNotFoundError, tmp: str) -> None:
+        # purge() removed the job directory, temporary file included
+        if exc.filename == tmp and not os.path.exists(tmp):
+            raise ArtifactPurged(f"Artifact {os.path.basename(tmp)} was purged while being written") from None
+
+    def put(self, job_id: str, digest: str, version: str, ext: str, write: Callable[[str], None]) -> str:
+        """Create an artifact by calling ``write(tmp_path)``; publishes it atomically.
+
+        Raises :class:`ArtifactPurged` when the job's artifacts are purged
+        before the new one is published.
+        """
+        path = self.path(job_id, digest, version, ext)
+        tmp = self._tmp_path(path)
+        try:
+            try:
+                write(tmp)
+            except FileNotFoundError as exc:
+                self._raise_if_purged(exc, tmp)
+                raise
+            self._publish(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    def get_or_create(self, job_id: str, digest: str, version: str, ext: str, write: Callable[[str], None]) -> str:
+        """Return the artifact, rendering it with ``write`` at most once at a time."""
+        path = self.get(job_id, digest, version, ext)
+        if path is not None:
+            return path
+        lock = self._locks[hash((job_id, digest, version, ext)) % _LOCK_STRIPES]
+        with lock:
+            return self.get(job_id, digest, version, ext) or self.put(job_id, digest, version, ext, write)
+
+    def tee(self, job_id: str, digest: str, version: str, ext: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yield ``chunks`` while writing them to the artifact.
+
+        The file is only published if the stream is consumed to the end; an
+        abandoned stream (client disconnect) leaves no artifact behind, and
+        neither does one whose job was purged meanwhile. The client still
+        receives the whole stream.
+        """
+        path = self.path(job_id, digest, version, ext)
+        tmp = self._tmp_path(path)
+        try:
+            with open(tmp, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    yield chunk
+            try:
+                self._publish(tmp, path)
+            except ArtifactPurged:
+                pass
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def purge(self, job_id: str) -> None:
+        shutil.rmtree(os.path.join(self.base_dir, job_id), ignore_errors=True)
+
+    def size_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.base_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+        return total
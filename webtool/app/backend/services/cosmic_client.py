@@ -1,10 +1,16 @@
 from __future__ import annotations
 
-import requests
+import os
+import threading
 import time
-from typing import Dict, List, Any, Optional
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 
+from .metrics import COSMIC_CACHE_HITS, COSMIC_CACHE_MISSES, COSMIC_CALLS, COSMIC_ERRORS
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,13 +20,23 @@ class COSMICClient:
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         self.base_url = "https://cancer.sanger.ac.uk/cosmic/api/v1"
-        self.session = requests.Session()
-        if api_key:
-            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
-        self.session.headers.update({
-            "User-Agent": "Cancer-Mutation-Analysis-Tool/1.0",
-            "Accept": "application/json"
-        })
+        self._session = None
+
+    @property
+    def session(self):
+        """HTTP session, created (and ``requests`` imported) on the first API call."""
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            if self.api_key:
+                session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+            session.headers.update({
+                "User-Agent": "Cancer-Mutation-Analysis-Tool/1.0",
+                "Accept": "application/json"
+            })
+            self._session = session
+        return self._session
     
     def search_mutations(self, gene: str, mutation: str = "", limit: int = 100) -> Dict[str, Any]:
         """Search for mutations in COSMIC database"""
@@ -105,6 +121,11 @@ class COSMICClient:
             return {"error": str(e), "results": []}
 
 
+def _stable_hash(value: str) -> int:
+    # hash() of a str changes between processes; mock ids must not (shards, batch workers)
+    return zlib.crc32(value.encode("utf-8"))
+
+
 # Mock COSMIC client for demo purposes (when API key is not available)
 class MockCOSMICClient(COSMICClient):
     """Mock COSMIC client that returns sample data for demonstration"""
@@ -114,7 +135,7 @@ class MockCOSMICClient(COSMICClient):
         return {
             "results": [
                 {
-                    "cosmic_id": f"COSM{12345 + hash(gene) % 1000}",
+                    "cosmic_id": f"COSM{12345 + _stable_hash(gene) % 1000}",
                     "gene": gene.upper(),
                     "mutation": mutation or "p.R175H",
                     "chromosome": "17",
@@ -140,7 +161,7 @@ class MockCOSMICClient(COSMICClient):
             "start": 7574000,
             "end": 7590000,
             "strand": "+",
-            "cosmic_id": f"GENE{hash(gene) % 10000}",
+            "cosmic_id": f"GENE{_stable_hash(gene) % 10000}",
             "mutations_count": 1250,
             "cancer_types": ["Breast", "Colon", "Lung", "Pancreas"],
             "source": "COSMIC (Mock Data)"
@@ -151,7 +172,7 @@ class MockCOSMICClient(COSMICClient):
         return {
             "results": [
                 {
-                    "cosmic_id": f"COSM{12345 + hash(f'{chromosome}{position}') % 1000}",
+                    "cosmic_id": f"COSM{12345 + _stable_hash(f'{chromosome}{position}') % 1000}",
                     "gene": "TP53",
                     "mutation": f"p.{ref}{position}{alt}",
                     "chromosome": chromosome,
@@ -193,7 +214,7 @@ class MockCOSMICClient(COSMICClient):
             "results": [
                 {
                     "cancer_type": cancer_type,
-                    "cosmic_id": f"CANCER{hash(cancer_type) % 1000}",
+                    "cosmic_id": f"CANCER{_stable_hash(cancer_type) % 1000}",
                     "mutations_count": 5000,
                     "genes_affected": 150,
                     "source": "COSMIC (Mock Data)"
@@ -204,9 +225,161 @@ class MockCOSMICClient(COSMICClient):
         }
 
 
-def get_cosmic_client(api_key: Optional[str] = None) -> COSMICClient:
-    """Factory function to get COSMIC client (real or mock)"""
-    if api_key:
-        return COSMICClient(api_key)
-    else:
-        return MockCOSMICClient()
+class COSMICCache:
+    """Thread-safe LRU cache with a per-entry TTL for COSMIC responses"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Tuple[Any, ...], value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class CachedCOSMICClient:
+    """Wraps a COSMIC client and memoizes successful lookups"""
+
+    def __init__(self, client: COSMICClient, cache: Optional[COSMICCache] = None):
+        self.client = client
+        self.cache = cache or COSMICCache()
+
+    def _cached(self, method: str, *args: Any) -> Dict[str, Any]:
+        key = (method, *args)
+        result = self.cache.get(key)
+        if result is not None:
+            COSMIC_CACHE_HITS.inc()
+            return result
+        COSMIC_CACHE_MISSES.inc()
+        COSMIC_CALLS.inc(method=method)
+        try:
+            result = getattr(self.client, method)(*args)
+        except Exception:
+            COSMIC_ERRORS.inc(method=method)
+            raise
+        # Errors are returned in-band by the client; never cache them
+        if "error" in result:
+            COSMIC_ERRORS.inc(method=method)
+        else:
+            self.cache.set(key, result)
+        return result
+
+    def search_mutations(self, gene: str, mutation: str = "", limit: int = 100) -> Dict[str, Any]:
+        return self._cached("search_mutations", gene.upper(), mutation, limit)
+
+    def get_gene_info(self, gene: str) -> Dict[str, Any]:
+        return self._cached("get_gene_info", gene.upper())
+
+    def search_by_coordinates(self, chromosome: str, position: int, ref: str, alt: str) -> Dict[str, Any]:
+        return self._cached("search_by_coordinates", chromosome, position, ref, alt)
+
+    def get_mutation_details(self, cosmic_id: str) -> Dict[str, Any]:
+        return self._cached("get_mutation_details", cosmic_id)
+
+    def search_cancer_types(self, cancer_type: str) -> Dict[str, Any]:
+        return self._cached("search_cancer_types", cancer_type)
+
+
+SEARCH_TYPES = ("gene", "mutation", "coordinates", "cancer_type")
+
+
+def search_key(search_type: str, query: str, gene: Optional[str] = None, chromosome: Optional[str] = None,
+               position: Optional[int] = None, ref: Optional[str] = None, alt: Optional[str] = None) -> str:
+    """Canonical key for a search, used to dedupe and label batch results"""
+    if search_type == "gene":
+        return f"gene:{query.strip().upper()}"
+    if search_type == "mutation":
+        return f"mutation:{(gene or query).strip().upper()}:{query.strip()}"
+    if search_type == "coordinates":
+        return f"coordinates:{chromosome}:{position}:{ref}>{alt}"
+    return f"{search_type}:{query.strip()}"
+
+
+def run_search(client: Any, search_type: str, query: str, gene: Optional[str] = None,
+               chromosome: Optional[str] = None, position: Optional[int] = None,
+               ref: Optional[str] = None, alt: Optional[str] = None) -> Dict[str, Any]:
+    """Dispatch a single search; raises ValueError for malformed queries"""
+    if search_type == "gene":
+        return client.get_gene_info(query)
+    if search_type == "mutation":
+        return client.search_mutations(gene or query, query)
+    if search_type == "coordinates":
+        if not all([chromosome, position, ref, alt]):
+            raise ValueError("Missing coordinate parameters")
+        return client.search_by_coordinates(chromosome, position, ref, alt)
+    if search_type == "cancer_type":
+        return client.search_cancer_types(query)
+    raise ValueError("Invalid search type")
+
+
+def run_search_batch(client: Any, queries: List[Dict[str, Any]], max_workers: int = 8) -> Dict[str, Any]:
+    """Dedupe queries by canonical key and resolve them concurrently
+
+    ``results`` and ``errors`` hold one entry per unique search; ``keys[i]``
+    is the canonical key of ``queries[i]``, so duplicates share an entry.
+    """
+    keys = [search_key(**q) for q in queries]
+    unique: Dict[str, Dict[str, Any]] = {}
+    for key, q in zip(keys, queries):
+        unique.setdefault(key, q)
+
+    def _resolve(item: Tuple[str, Dict[str, Any]]) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        key, q = item
+        try:
+            return key, run_search(client, **q), None
+        except Exception as e:  # noqa: BLE001
+            return key, None, str(e)
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    workers = max(1, min(max_workers, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, result, error in pool.map(_resolve, unique.items()):
+            if error is not None:
+                errors[key] = error
+            else:
+                results[key] = result
+    return {
+        "keys": keys, "results": results, "errors": errors, "num_queries": len(queries), "num_unique": len(unique),
+    }
+
+
+_clients: Dict[Optional[str], CachedCOSMICClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_cosmic_client(api_key: Optional[str] = None) -> CachedCOSMICClient:
+    """Factory function to get a shared, cached COSMIC client (real or mock)"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            base = COSMICClient(api_key) if api_key else MockCOSMICClient()
+            cache = COSMICCache(
+                max_entries=int(os.environ.get("COSMIC_CACHE_SIZE", "10000")),
+                ttl=float(os.environ.get("COSMIC_CACHE_TTL", "3600")),
+            )
+            client = _clients[api_key] = CachedCOSMICClient(base, cache)
+        return client
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterator, Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against ``etag``."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def etag_strong_match(header: Optional[str], etag: str) -> bool:
+    """Strong comparison of an ``If-Range`` header against ``etag`` (RFC 9110, 13.1.5).
+
+    ``If-Range`` holds one validator. A weak tag never matches, and neither
+    does ``*`` or a date (no ``Last-Modified`` is sent), so the full body is
+    served instead of a range.
+    """
+    if not header:
+        return False
+    tag = header.strip()
+    return not tag.startswith("W/") and not etag.startswith("W/") and tag == etag
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns None when there is no usable range (absent, malformed or a
+    multi-range request, which is answered with the full body). Raises
+    ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _iter_bytes(data: bytes, start: int, end: int) -> Iterator[bytes]:
+    view = memoryview(data)
+    for offset in range(start, end + 1, DOWNLOAD_CHUNK_SIZE):
+        yield bytes(view[offset:min(offset + DOWNLOAD_CHUNK_SIZE, end + 1)])
+
+
+def _iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def serve_download(
+    request: Request,
+    source: Union[bytes, str],
+    media_type: str,
+    filename: str,
+    etag: str,
+) -> Response:
+    """Serve bytes or a file as an attachment with ETag and single-range support."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "private, no-cache",
+    }
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or etag_strong_match(if_range, etag):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        status = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+
+    body = _iter_bytes(source, start, end) if isinstance(source, bytes) else _iter_file(source, start, end)
+    return StreamingResponse(body, status_code=status, media_type=media_type, headers=headers)
@@ -0,0 +1,501 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .serialization import dumps, loads
+from .storage import (
+    RESULT_SECTIONS,
+    VARIANT_COLUMNS,
+    LocalJSONStore,
+    _default_base_dir,
+    _key_index,
+    _split_payload,
+    section_row,
+)
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:  # noqa: BLE001
+    pa = None
+    pq = None
+
+# Hidden columns used to rebuild entries exactly; never returned by load_columns.
+_RAW_COLUMNS = ("extra", "data")
+
+
+class ParquetJobStore:
+    """Columnar job store: one directory of Parquet files per job.
+
+    Layout under ``<base_dir>/parquet/<job_id>/``::
+
+        meta.json          job metadata (filename, sha256, analysis_key, ...)
+        variants.parquet   idx + one column per variant field
+        scores.parquet     idx, variant_key + one float column per algorithm
+        ensemble.parquet   idx, variant_key + one float column per ensemble
+        annotations.parquet / clinical.parquet
+                           idx, variant_key, filterable summary columns and the
+                           full entry as JSON in ``data``
+
+    Files are written in row groups of ``row_group_size`` sorted by ``idx``,
+    so reads are memory-mapped, project only the requested columns and skip
+    row groups outside the requested index range.
+    """
+
+    ROW_GROUP_SIZE = 65536
+
+    def __init__(self, base_dir: Optional[str] = None, row_group_size: Optional[int] = None) -> None:
+        if pa is None:
+            raise RuntimeError("Parquet storage is disabled (pyarrow not installed).")
+        self.base_dir = os.path.abspath(base_dir or _default_base_dir())
+        self.root = os.path.join(self.base_dir, "parquet")
+        os.makedirs(self.root, exist_ok=True)
+        # Jobs written by the per-file JSON store are imported on first read.
+        self.legacy = LocalJSONStore(self.base_dir)
+        self.row_group_size = row_group_size or self.ROW_GROUP_SIZE
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _file(self, key: str, name: str) -> str:
+        return os.path.join(self._dir(key), name)
+
+    # Writes
+
+    def _write_atomic(self, path: str, write) -> None:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _write_table(self, key: str, section: str, table: "pa.Table") -> None:
+        self._write_atomic(
+            self._file(key, f"{section}.parquet"),
+            lambda tmp: pq.write_table(table, tmp, row_group_size=self.row_group_size, compression="zstd"),
+        )
+
+    def _write_meta(self, key: str, meta: Dict[str, Any]) -> None:
+        def write(tmp: str) -> None:
+            with open(tmp, "wb") as fh:
+                fh.write(dumps(meta))
+
+        self._write_atomic(self._file(key, "meta.json"), write)
+
+    @staticmethod
+    def _variants_table(variants: List[Dict[str, Any]]) -> "pa.Table":
+        columns: Dict[str, List[Any]] = {col: [] for col in ("idx",) + VARIANT_COLUMNS + ("extra",)}
+        for idx, v in enumerate(variants):
+            canonical = list(v) == list(VARIANT_COLUMNS) and all(
+                v[col] is None or (type(v[col]) is int if col == "pos" else isinstance(v[col], str))
+                for col in VARIANT_COLUMNS
+            )
+            columns["idx"].append(idx)
+            for col in VARIANT_COLUMNS:
+                columns[col].append(v.get(col) if canonical else None)
+            # Anything that does not fit the fixed schema is kept verbatim so
+            # variants (and the scores seeded from them) round-trip exactly.
+            columns["extra"].append(None if canonical else dumps(v))
+        schema = pa.schema(
+            [("idx", pa.int64())]
+            + [(col, pa.int64() if col == "pos" else pa.string()) for col in VARIANT_COLUMNS]
+            + [("extra", pa.binary())]
+        )
+        return pa.table(columns, schema=schema)
+
+    @staticmethod
+    def _section_table(section: str, items: Dict[str, Any], start: int = 0) -> "pa.Table":
+        rows = [section_row(section, _key_index(k, seq), k, v) for seq, (k, v) in enumerate(items.items(), start)]
+        names: Dict[str, None] = {"idx": None, "variant_key": None}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        fields = []
+        for name in names:
+            if name == "idx" or name == "num_therapies":
+                fields.append((name, pa.int64()))
+            elif name in (
+                "variant_key", "cosmic_id", "clinical_significance", "cancer_types", "mycancergenome_evidence", "confidence",
+            ):
+                fields.append((name, pa.string()))
+            elif name in ("cosmic_match", "actionable"):
+                fields.append((name, pa.bool_()))
+            else:
+                fields.append((name, pa.float64()))
+        columns = {name: [row.get(name) for row in rows] for name in names}
+        if section in ("annotations", "clinical"):
+            fields.append(("data", pa.binary()))
+            columns["data"] = [dumps(v) for v in items.values()]
+        table = pa.table(columns, schema=pa.schema(fields))
+        return table.sort_by("idx")
+
+    def _write_results(self, key: str, results: Dict[str, Any]) -> None:
+        for section in RESULT_SECTIONS:
+            self._write_table(key, section, self._section_table(section, results.get(section, {})))
+
+    def save(self, key: str, data: Any) -> None:
+        os.makedirs(self._dir(key), exist_ok=True)
+        previous = self.load_meta(key, import_legacy=False) or {}
+        variants = data.get("variants", [])
+        results = data.get("results")
+        self._write_table(key, "variants", self._variants_table(variants))
+        if results is not None:
+            self._write_results(key, results)
+        else:
+            for section in RESULT_SECTIONS:
+                path = self._file(key, f"{section}.parquet")
+                if os.path.exists(path):
+                    os.remove(path)
+        now = time.time()
+        meta = {
+            **_split_payload(data),
+            "num_variants": len(variants),
+            "has_results": results is not None,
+            "created_at": previous.get("created_at", now),
+            "updated_at": now,
+        }
+        self._write_meta(key, meta)
+
+    def save_results(self, key: str, results: Dict[str, Any], **meta: Any) -> None:
+        """Replace a job's results (and merge ``meta``) without rewriting its variants."""
+        current = self.load_meta(key)
+        if current is None:
+            self.save(key, {**meta, "variants": results.get("variants", []), "results": results})
+            return
+        self._write_results(key, results)
+        self._write_meta(key, {**current, **meta, "has_results": True, "updated_at": time.time()})
+
+    def results_writer(self, key: str) -> "ParquetResultsWriter":
+        """Writer that replaces a job's results chunk by chunk (see :class:`ParquetResultsWriter`)."""
+        return ParquetResultsWriter(self, key)
+
+    def delete(self, key: str) -> None:
+        shutil.rmtree(self._dir(key), ignore_errors=True)
+        # Otherwise a not-yet-imported legacy file would bring the job back.
+        self.legacy.delete(key)
+
+    def copy_job(self, key: str, new_key: str) -> bool:
+        """Copy a job, variants and results, to ``new_key``; False when ``key`` does not exist.
+
+        Files are only ever replaced, never modified, so they are hard-linked
+        (copied where links are not supported) and the copy takes no space.
+        """
+        meta = self.load_meta(key)
+        if meta is None:
+            return False
+        os.makedirs(self._dir(new_key), exist_ok=True)
+        for section in ("variants",) + RESULT_SECTIONS:
+            src = self._file(key, f"{section}.parquet")
+            dst = self._file(new_key, f"{section}.parquet")
+            try:
+                os.link(src, dst)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                shutil.copyfile(src, dst)
+        if self.load_meta(key, import_legacy=False) != meta:
+            # New results were committed while linking; keep only the variants
+            meta = {k: v for k, v in meta.items() if k not in ("analysis_key", "results_sha256", "stage_timings")}
+            meta["has_results"] = False
+            for section in RESULT_SECTIONS:
+                path = self._file(new_key, f"{section}.parquet")
+                if os.path.exists(path):
+                    os.remove(path)
+        now = time.time()
+        self._write_meta(new_key, {**meta, "created_at": now, "updated_at": now})
+        return True
+
+    def compact(self, key: str) -> Optional[int]:
+        """Drop derived results, keeping the uploaded variants.
+
+        Returns the job's size in bytes afterwards, or None when it had no results.
+        """
+        meta = self.load_meta(key, import_legacy=False)
+        if meta is None or not meta["has_results"]:
+            return None
+        meta.pop("analysis_key", None)
+        self._write_meta(key, {**meta, "has_results": False, "updated_at": time.time()})
+        for section in RESULT_SECTIONS:
+            path = self._file(key, f"{section}.parquet")
+            if os.path.exists(path):
+                os.remove(path)
+        return self._size(key)
+
+    def vacuum(self) -> None:
+        pass
+
+    def _size(self, key: str) -> int:
+        with os.scandir(self._dir(key)) as files:
+            return sum(f.stat().st_size for f in files)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        jobs = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                meta_path = os.path.join(entry.path, "meta.json")
+                if not entry.is_dir() or not os.path.exists(meta_path):
+                    continue
+                with open(meta_path, "rb") as fh:
+                    meta = loads(fh.read())
+                jobs.append({
+                    "job_id": entry.name,
+                    "size_bytes": self._size(entry.name),
+                    "created_at": meta.get("created_at", 0.0),
+                    "updated_at": meta.get("updated_at", 0.0),
+                    "accessed_at": max(os.stat(meta_path).st_atime, meta.get("updated_at", 0.0)),
+                    "has_results": bool(meta.get("has_results")),
+                })
+        return jobs
+
+    # Reads
+
+    def _read(
+        self,
+        key: str,
+        section: str,
+        columns: Optional[Sequence[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> "pa.Table":
+        path = self._file(key, f"{section}.parquet")
+        filters = []
+        if offset:
+            filters.append(("idx", ">=", offset))
+        if limit is not None:
+            filters.append(("idx", "<", offset + limit))
+        if columns is not None:
+            available = set(pq.read_schema(path, memory_map=True).names)
+            columns = [col for col in columns if col in available]
+        return pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+
+    def load_meta(self, key: str, import_legacy: bool = True) -> Optional[Dict[str, Any]]:
+        path = self._file(key, "meta.json")
+        if not os.path.exists(path):
+            if import_legacy:
+                payload = self.legacy.load(key)
+                if payload is not None:
+                    self.save(key, payload)
+                    return self.load_meta(key, import_legacy=False)
+            return None
+        with open(path, "rb") as fh:
+            meta = loads(fh.read())
+        # atime of meta.json records the last access for retention
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+        return meta
+
+    def _read_variants(self, key: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._to_variants(self._read(key, "variants", offset=offset, limit=limit))
+
+    @staticmethod
+    def _to_variants(table: "pa.Table") -> List[Dict[str, Any]]:
+        variants = []
+        for row in table.to_pylist():
+            extra = row.pop("extra")
+            if extra is not None:
+                variants.append(loads(extra))
+            else:
+                row.pop("idx")
+                variants.append(row)
+        return variants
+
+    def load_variants(self, key: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        if self.load_meta(key) is None:
+            return None
+        return self._read_variants(key, offset, limit)
+
+    def iter_variants(self, key: str, page_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """Variants in consecutive pages of at most ``page_size``, in one pass over the file."""
+        if self.load_meta(key) is None:
+            return
+        # Not memory-mapped: mapped pages would count towards RSS as the whole file is read
+        with pq.ParquetFile(self._file(key, "variants.parquet")) as pf:
+            for batch in pf.iter_batches(batch_size=page_size):
+                yield self._to_variants(pa.Table.from_batches([batch]))
+
+    def load_section(self, key: str, section: str, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        table = self._read(key, section, offset=offset, limit=limit)
+        keys = table.column("variant_key").to_pylist()
+        if section in ("annotations", "clinical"):
+            return {k: loads(data) for k, data in zip(keys, table.column("data").to_pylist())}
+        algos = [name for name in table.column_names if name not in ("idx", "variant_key")]
+        values = [table.column(name).to_pylist() for name in algos]
+        return {
+            k: {algo: col[i] for algo, col in zip(algos, values) if col[i] is not None}
+            for i, k in enumerate(keys)
+        }
+
+    def load_results(
+        self,
+        key: str,
+        sections: Sequence[str] = RESULT_SECTIONS,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        meta = self.load_meta(key)
+        if meta is None or not meta["has_results"]:
+            return None
+        out: Dict[str, Any] = {"variants": self._read_variants(key, offset, limit)}
+        for section in sections:
+            out[section] = self.load_section(key, section, offset, limit)
+        return out
+
+    def iter_results(self, key: str, page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Results in consecutive pages of ``page_size`` variants."""
+        meta = self.load_meta(key)
+        if meta is None or not meta["has_results"]:
+            return
+        for offset in range(0, meta["num_variants"], page_size):
+            page: Dict[str, Any] = {"variants": self._read_variants(key, offset, page_size)}
+            for section in RESULT_SECTIONS:
+                page[section] = self.load_section(key, section, offset, page_size)
+            yield page
+
+    def load_columns(
+        self,
+        key: str,
+        section: str,
+        columns: Optional[Sequence[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Selected columns of one section, read with projection and row-group pruning."""
+        meta = self.load_meta(key)
+        if meta is None or (section != "variants" and not meta["has_results"]):
+            return None
+        if section == "variants":
+            wanted = list(columns) if columns is not None else ["idx", *VARIANT_COLUMNS]
+            table = self._read(key, section, columns=[*wanted, "extra"], offset=offset, limit=limit)
+            out = {name: table.column(name).to_pylist() if name in table.column_names else [None] * table.num_rows
+                   for name in wanted}
+            # Non-canonical variants only live in ``extra``; fill them back in.
+            for i, extra in enumerate(table.column("extra").to_pylist()):
+                if extra is not None:
+                    variant = loads(extra)
+                    for name in wanted:
+                        if name != "idx":
+                            out[name][i] = variant.get(name)
+            return out
+        table = self._read(key, section, columns=columns, offset=offset, limit=limit)
+        names = list(columns) if columns is not None else [n for n in table.column_names if n not in _RAW_COLUMNS]
+        return {
+            name: table.column(name).to_pylist() if name in table.column_names else [None] * table.num_rows
+            for name in names
+        }
+
+    def load(self, key: str) -> Optional[Any]:
+        meta = self.load_meta(key)
+        if meta is None:
+            return None
+        payload = {k: v for k, v in meta.items() if k not in ("num_variants", "has_results", "created_at", "updated_at")}
+        variants = self._read_variants(key)
+        payload["variants"] = variants
+        if meta["has_results"]:
+            payload["results"] = {"variants": variants}
+            for section in RESULT_SECTIONS:
+                payload["results"][section] = self.load_section(key, section)
+        return payload
+
+
+class ParquetResultsWriter:
+    """Replaces a Parquet job's results chunk by chunk.
+
+    Each chunk is appended, per section, to a part file in a hidden
+    directory inside the job directory. A new part starts when a chunk's
+    columns differ, or after ``row_group_size`` rows, which bounds the
+    footer metadata a part writer keeps for its row groups. :meth:`commit` regroups the parts into new section
+    files with row groups of ``row_group_size`` (filling in columns that
+    only some chunks had) and swaps them in, so the previous results stay
+    readable until then and at most one row group is in memory at a time.
+    :meth:`abort` removes the parts.
+    """
+
+    def __init__(self, store: ParquetJobStore, key: str) -> None:
+        self.store = store
+        self.key = key
+        self.dir = store._file(key, f".stream-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir)
+        self.writers: Dict[str, Optional["pq.ParquetWriter"]] = dict.fromkeys(RESULT_SECTIONS)
+        self.parts: Dict[str, List[str]] = {section: [] for section in RESULT_SECTIONS}
+        self.part_rows: Dict[str, int] = dict.fromkeys(RESULT_SECTIONS, 0)
+
+    def write(self, offset: int, part: Dict[str, Any]) -> None:
+        for section in RESULT_SECTIONS:
+            table = self.store._section_table(section, part[section], offset)
+            if not table.num_rows:
+                continue
+            writer = self.writers[section]
+            if writer is not None and (
+                self.part_rows[section] >= self.store.row_group_size or not writer.schema.equals(table.schema)
+            ):
+                writer.close()
+                writer = None
+            if writer is None:
+                path = os.path.join(self.dir, f"{section}-{len(self.parts[section]):06d}.parquet")
+                writer = self.writers[section] = pq.ParquetWriter(path, table.schema, compression="zstd")
+                self.parts[section].append(path)
+                self.part_rows[section] = 0
+            writer.write_table(table)
+            self.part_rows[section] += table.num_rows
+
+    def _close_parts(self) -> None:
+        for section, writer in self.writers.items():
+            if writer is not None:
+                writer.close()
+                self.writers[section] = None
+
+    @staticmethod
+    def _conform(table: "pa.Table", schema: "pa.Schema") -> "pa.Table":
+        columns = [
+            table.column(field.name) if field.name in table.column_names else pa.nulls(table.num_rows, field.type)
+            for field in schema
+        ]
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    def _row_groups(self, parts: List[str], schema: "pa.Schema") -> Iterator["pa.Table"]:
+        """The parts' rows in tables of ``row_group_size`` (the last one may be shorter)."""
+        size = self.store.row_group_size
+        pending: List["pa.Table"] = []
+        rows = 0
+        for path in parts:
+            with pq.ParquetFile(path) as pf:
+                for batch in pf.iter_batches(batch_size=size):
+                    pending.append(self._conform(pa.Table.from_batches([batch]), schema))
+                    rows += batch.num_rows
+                    while rows >= size:
+                        table = pa.concat_tables(pending)
+                        yield table.slice(0, size)
+                        rest = table.slice(size)
+                        pending, rows = ([rest] if rest.num_rows else []), rest.num_rows
+        if rows:
+            yield pa.concat_tables(pending)
+
+    def commit(self, **meta: Any) -> None:
+        current = self.store.load_meta(self.key, import_legacy=False) or {}
+        self._close_parts()
+        finished = {}
+        for section in RESULT_SECTIONS:
+            parts = self.parts[section]
+            if parts:
+                schema = pa.unify_schemas([pq.read_schema(path) for path in parts])
+            else:
+                schema = self.store._section_table(section, {}).schema
+            path = os.path.join(self.dir, f"{section}.parquet")
+            with pq.ParquetWriter(path, schema, compression="zstd") as out:
+                for table in self._row_groups(parts, schema):
+                    out.write_table(table, row_group_size=self.store.row_group_size)
+            for part in parts:
+                os.remove(part)
+            finished[section] = path
+        for section, path in finished.items():
+            os.replace(path, self.store._file(self.key, f"{section}.parquet"))
+        self.store._write_meta(self.key, {**current, **meta, "has_results": True, "updated_at": time.time()})
+        self.abort()
+
+    def abort(self) -> None:
+        self._close_parts()
+        shutil.rmtree(self.dir, ignore_errors=True)
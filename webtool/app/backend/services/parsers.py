@@ -2,18 +2,17 @@ from typing import List, Dict, Any
 import io
 import csv
 import json
-import pandas as pd
 
-try:
-	from cyvcf2 import VCF  # type: ignore
-except Exception:  # noqa: BLE001
-	VCF = None
+# pandas and cyvcf2 are imported by the parsers that need them: most uploads
+# are CSV or JSON, and neither library is cheap to import.
 
 
 def parse_variant_file(filename: str, content: bytes) -> List[Dict[str, Any]]:
 	lower = filename.lower()
 	if lower.endswith(".vcf") or lower.endswith(".vcf.gz"):
-		if VCF is None:
+		try:
+			import cyvcf2  # type: ignore  # noqa: F401
+		except Exception:  # noqa: BLE001
 			raise RuntimeError("VCF parsing is disabled (cyvcf2 not installed). Please upload CSV/JSON.")
 		return _parse_vcf(content)
 	if lower.endswith(".csv"):
@@ -59,6 +58,8 @@ def _parse_json(content: bytes) -> List[Dict[str, Any]]:
 def _parse_excel(content: bytes) -> List[Dict[str, Any]]:
 	"""Parse Excel file (.xlsx) containing variant data"""
 	try:
+		import pandas as pd
+
 		# Read Excel file from bytes
 		excel_file = io.BytesIO(content)
 		df = pd.read_excel(excel_file, engine='openpyxl')
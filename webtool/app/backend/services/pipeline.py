@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .annotate import annotate_with_databases, clinical_actionability
+from .metrics import VARIANTS_PROCESSED, StageTimer
+from .scoring import run_ensemble_scores, run_scoring_algorithms
+from .serialization import dumps
+from .storage import RESULT_SECTIONS
+
+
+def analysis_key(analyses: List[str], options: Dict[str, Any]) -> str:
+    """Identity of an analysis request; stored results with the same key are reused."""
+    spec = {"analyses": sorted(set(analyses)), "options": options}
+    # Sorted keys, so the order options were given in does not change the key
+    return hashlib.sha256(dumps(spec, sort_keys=True)).hexdigest()
+
+
+def _score(part: Dict[str, Any], offset: int, analyses: List[str], options: Dict[str, Any]) -> None:
+    part["scores"] = run_scoring_algorithms(part["variants"], analyses, options, offset=offset)
+
+
+def _ensemble(part: Dict[str, Any], offset: int, analyses: List[str], options: Dict[str, Any]) -> None:
+    part["ensemble"] = run_ensemble_scores(part["scores"])
+
+
+def _annotate(part: Dict[str, Any], offset: int, analyses: List[str], options: Dict[str, Any]) -> None:
+    part["annotations"] = annotate_with_databases(part["variants"], offset=offset)
+
+
+def _clinical(part: Dict[str, Any], offset: int, analyses: List[str], options: Dict[str, Any]) -> None:
+    part["clinical"] = clinical_actionability(part["annotations"])
+
+
+# In order; each stage adds its section to a chunk's results, reading only
+# the chunk itself, so chunks can be in different stages at once.
+PIPELINE_STAGES: Tuple[Tuple[str, Callable[[Dict[str, Any], int, List[str], Dict[str, Any]], None]], ...] = (
+    ("scoring", _score),
+    ("ensemble", _ensemble),
+    ("annotate", _annotate),
+    ("clinical", _clinical),
+)
+
+
+def run_pipeline(
+    variants: List[Dict[str, Any]],
+    analyses: List[str],
+    options: Dict[str, Any],
+    offset: int = 0,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    """Scoring, ensemble, annotation and clinical rules for a run of variants.
+
+    ``offset`` is the job index of ``variants[0]``, so results for
+    consecutive chunks carry the same keys as a single run over the job.
+    Stage timings add up in ``timer``; without one they are recorded
+    for this call alone.
+    """
+    own_timer = timer is None
+    timer = timer or StageTimer()
+    part: Dict[str, Any] = {"variants": variants}
+    for name, stage in PIPELINE_STAGES:
+        with timer.stage(name):
+            stage(part, offset, analyses, options)
+    VARIANTS_PROCESSED.inc(len(variants))
+    if own_timer:
+        timer.finish()
+    return part
+
+
+def merge_results(into: Dict[str, Any], part: Dict[str, Any]) -> None:
+    """Append a chunk's results (from :func:`run_pipeline`) to ``into``."""
+    into.setdefault("variants", []).extend(part["variants"])
+    for section in RESULT_SECTIONS:
+        into.setdefault(section, {}).update(part[section])
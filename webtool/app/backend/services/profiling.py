@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_HEADER = "x-profile"
+UNASSIGNED = "_unassigned"
+TOP_FUNCTIONS = 50
+
+_SAFE_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+_current: contextvars.ContextVar[Optional["Capture"]] = contextvars.ContextVar("profile_capture", default=None)
+
+
+def tag_job(job_id: str) -> None:
+    """File the profile of the current request (if one is running) under ``job_id``."""
+    capture = _current.get()
+    if capture is not None:
+        capture.job_id = job_id
+
+
+def _frame_name(frame: Any) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _Sampler:
+    """Samples one thread's Python stack every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[Tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format (``a;b;c count``), for flamegraph.pl or speedscope."""
+        lines = [";".join(stack) + f" {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def top(self, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        samples = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": name,
+                "self_samples": own[name],
+                "total_samples": count,
+                "self_pct": round(100 * own[name] / samples, 2),
+                "total_pct": round(100 * count / samples, 2),
+            }
+            for name, count in sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))[:limit]
+        ]
+
+
+def _cprofile_top(profiler: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}:{name}",
+            "ncalls": ncalls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda row: row["tottime_s"], reverse=True)
+    return rows[:limit]
+
+
+class Capture:
+    """One profiled request: a stack sampler or cProfile on the request's thread."""
+
+    def __init__(self, mode: str, method: str, path: str, interval: float) -> None:
+        self.profile_id = uuid.uuid4().hex
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.job_id: Optional[str] = None
+        self.status: Optional[int] = None
+        self._sampler: Optional[_Sampler] = None
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self._t0
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "profile_id": self.profile_id,
+            "job_id": self.job_id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration, 6),
+        }
+        if self._sampler is not None:
+            out["interval_ms"] = self.interval * 1000
+            out["samples"] = sum(self._sampler.stacks.values())
+            out["top_functions"] = self._sampler.top()
+        else:
+            out["top_functions"] = _cprofile_top(self._profiler)
+        return out
+
+
+class ProfileStore:
+    """Captured profiles on disk, one directory per job.
+
+    Each profile is ``<profile_id>.json`` (request, timing and top functions)
+    plus ``<profile_id>.folded`` (collapsed stacks, sampling mode) or
+    ``<profile_id>.prof`` (a pstats dump, cProfile mode). Profiles of
+    requests that never named a job go under ``_unassigned``. Only the newest
+    ``max_profiles`` are kept.
+    """
+
+    FILES = {"stacks": ".folded", "pstats": ".prof"}
+
+    def __init__(self, base_dir: str, max_profiles: int = 200) -> None:
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id: Optional[str]) -> str:
+        job_id = job_id or UNASSIGNED
+        if not _SAFE_ID_RE.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return os.path.join(self.base_dir, job_id)
+
+    def save(self, capture: Capture) -> Dict[str, Any]:
+        summary = capture.summary()
+        job_dir = self._job_dir(capture.job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        base = os.path.join(job_dir, capture.profile_id)
+        if capture._sampler is not None:
+            with open(base + ".folded", "w", encoding="utf-8") as fh:
+                fh.write(capture._sampler.collapsed())
+        if capture._profiler is not None:
+            capture._profiler.dump_stats(base + ".prof")
+        # The summary goes last: list() only sees complete profiles
+        with open(base + ".json", "w", encoding="utf-8") as fh:
+            json.dump(summary, fh)
+        self._trim()
+        return summary
+
+    def _summaries(self) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(self.base_dir):
+            paths.extend(os.path.join(root, name) for name in files if name.endswith(".json"))
+        return paths
+
+    def _trim(self) -> None:
+        with self._lock:
+            paths = self._summaries()
+            if len(paths) <= self.max_profiles:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[: len(paths) - self.max_profiles]:
+                stem = path[: -len(".json")]
+                for ext in (".json", *self.FILES.values()):
+                    try:
+                        os.remove(stem + ext)
+                    except FileNotFoundError:
+                        pass
+
+    def list(self, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Profiles newest first, without their function tables."""
+        paths = self._summaries() if job_id is None else [
+            os.path.join(self._job_dir(job_id), name)
+            for name in (os.listdir(self._job_dir(job_id)) if os.path.isdir(self._job_dir(job_id)) else [])
+            if name.endswith(".json")
+        ]
+        out = []
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    summary = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            summary.pop("top_functions", None)
+            out.append(summary)
+        return sorted(out, key=lambda s: s["started_at"], reverse=True)
+
+    def _find(self, profile_id: str) -> Optional[str]:
+        if not _SAFE_ID_RE.match(profile_id):
+            return None
+        for name in os.listdir(self.base_dir):
+            stem = os.path.join(self.base_dir, name, profile_id)
+            if os.path.exists(stem + ".json"):
+                return stem
+        return None
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        stem = self._find(profile_id)
+        if stem is None:
+            return None
+        with open(stem + ".json", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def file(self, profile_id: str, kind: str) -> Optional[str]:
+        """Path of a profile's ``stacks`` or ``pstats`` file, if it has one."""
+        stem = self._find(profile_id)
+        if stem is None or kind not in self.FILES:
+            return None
+        path = stem + self.FILES[kind]
+        return path if os.path.exists(path) else None
+
+    def purge(self, job_id: str) -> None:
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+
+class ProfilingMiddleware:
+    """Profile individual requests on request.
+
+    A request to one of ``paths`` carrying an ``X-Profile: sample|cprofile``
+    header, or a ``?profile=sample|cprofile`` query parameter, runs under
+    the chosen profiler until its response body is sent (``1``/``true``
+    mean ``sample``). The profile is saved to ``store`` and its id returned
+    in an ``X-Profile-Id`` response header. Every other request only pays
+    for the path and header check.
+
+    Profilers follow the thread that handles the request, which for async
+    endpoints is the event loop: other requests interleaved at ``await``
+    points show up too, and work handed to worker threads (a streamed
+    report's chunks) does not. One request is profiled at a time; others
+    asking meanwhile get ``X-Profile-Id: busy`` and run unprofiled.
+    """
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, paths: Tuple[str, ...], interval: float = 0.005) -> None:
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    @staticmethod
+    def _mode(scope: Scope) -> Optional[str]:
+        value = None
+        for name, raw in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                value = raw.decode("latin-1")
+                break
+        if value is None and b"profile=" in scope.get("query_string", b""):
+            value = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [None])[0]
+        if value is None:
+            return None
+        value = value.strip().lower()
+        if value in ("1", "true", "yes"):
+            return "sample"
+        return value if value in PROFILE_MODES else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        mode = self._mode(scope) if scope["type"] == "http" and scope["path"] in self.paths else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, _with_header(send, "busy"))
+            return
+        capture = Capture(mode, scope["method"], scope["path"], self.interval)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                capture.status = message["status"]
+            await send(message)
+
+        token = _current.set(capture)
+        capture.start()
+        try:
+            await self.app(scope, receive, _with_header(send_wrapper, capture.profile_id))
+        finally:
+            capture.stop()
+            _current.reset(token)
+            self._busy.release()
+            try:
+                self.store.save(capture)
+            except Exception:  # noqa: BLE001
+                logger.exception("Could not save profile %s", capture.profile_id)
+
+
+def _with_header(send: Send, profile_id: str) -> Send:
+    async def wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+        await send(message)
+
+    return wrapper
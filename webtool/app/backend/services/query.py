@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .storage import CANCER_TYPE_SEPARATOR, VARIANT_COLUMNS
+
+MEAN_SCORE = "mean_score"
+# REVEL where a variant has it, else its mean score: what pathogenicity levels are read from
+LEVEL_SCORE = "level_score"
+DERIVED_SCORES = (MEAN_SCORE, LEVEL_SCORE)
+
+
+@dataclass
+class ScoreRange:
+    """Inclusive bounds on one score column; None leaves that side open."""
+
+    min: Optional[float] = None
+    max: Optional[float] = None
+    include_missing: bool = False
+    # Makes ``max`` exclusive, for adjacent ranges that must not share their boundary
+    max_exclusive: bool = False
+
+
+@dataclass
+class Query:
+    genes: Sequence[str] = ()
+    ranges: Dict[str, ScoreRange] = field(default_factory=dict)
+    # Any of these COSMIC cancer types; variants COSMIC lists none for match with ``cancer_types_include_missing``
+    cancer_types: Sequence[str] = ()
+    cancer_types_include_missing: bool = False
+    # Substring of the variant, protein change or COSMIC id
+    contains: Optional[str] = None
+    actionable: Optional[bool] = None
+    cosmic_match: Optional[bool] = None
+    sort_by: Optional[str] = None
+    descending: bool = False
+    offset: int = 0
+    limit: int = 100
+
+
+class JobIndex:
+    """Column arrays for one job's results, one entry per variant index.
+
+    Score columns are float arrays (NaN when a variant has no value) with a
+    precomputed ascending order, so a range is two binary searches. Genes and
+    COSMIC cancer types map to their sorted row numbers. A query narrows the
+    candidate rows with the most selective of these indexes and checks the
+    remaining filters only on those rows, so it costs O(matches) rather than
+    a pass over every variant.
+    """
+
+    def __init__(self, num_variants: int, text: Dict[str, np.ndarray], scores: Dict[str, np.ndarray],
+                 flags: Dict[str, np.ndarray], counts: Dict[str, np.ndarray]) -> None:
+        self.num_variants = num_variants
+        self.text = text
+        self.scores = scores
+        self.flags = flags
+        self.counts = counts
+        self.score_order: Dict[str, np.ndarray] = {}
+        self._sorted: Dict[str, Tuple[np.ndarray, int]] = {}
+        for name, col in scores.items():
+            # NaNs sort last; ``present`` marks where they start
+            order = np.argsort(col, kind="stable")
+            self.score_order[name] = order
+            self._sorted[name] = (col[order], int(np.count_nonzero(~np.isnan(col))))
+        gene_rows: Dict[str, List[int]] = {}
+        for row, gene in enumerate(text["gene"].tolist()):
+            gene_rows.setdefault(gene, []).append(row)
+        self.gene_rows = {gene: np.array(rows) for gene, rows in gene_rows.items()}
+        cancer_rows: Dict[str, List[int]] = {}
+        for row, cancers in enumerate(text["cancer_types"].tolist()):
+            for cancer in (cancers.split(CANCER_TYPE_SEPARATOR) if cancers else ()):
+                cancer_rows.setdefault(cancer.lower(), []).append(row)
+        self.cancer_rows = {cancer: np.array(rows) for cancer, rows in cancer_rows.items()}
+
+    @classmethod
+    def build(cls, store: Any, job_id: str, num_variants: int) -> "JobIndex":
+        def column(name: str, values: Dict[str, List[Any]], fill: Any, dtype: Any) -> np.ndarray:
+            out = np.full(num_variants, fill, dtype=dtype)
+            for idx, value in zip(values.get("idx", []), values.get(name, [])):
+                if value is not None and 0 <= idx < num_variants:
+                    out[idx] = value
+            return out
+
+        variants = store.load_columns(job_id, "variants", ("idx",) + VARIANT_COLUMNS) or {}
+        text: Dict[str, np.ndarray] = {
+            "gene": np.array([(g or "").upper() for g in variants.get("gene", [])], dtype=object),
+            "protein_change": np.array(variants.get("protein_change", []), dtype=object),
+            "variant": np.array(
+                [f"{c}:{p}{r}>{a}#{i}" for i, c, p, r, a in zip(
+                    variants.get("idx", []), variants.get("chrom", []), variants.get("pos", []),
+                    variants.get("ref", []), variants.get("alt", []))],
+                dtype=object,
+            ),
+        }
+        scores: Dict[str, np.ndarray] = {}
+        for section in ("scores", "ensemble"):
+            values = store.load_columns(job_id, section) or {}
+            for name in values:
+                if name not in ("idx", "variant_key"):
+                    scores[name] = column(name, values, np.nan, float)
+        if scores:
+            # Mean of every predictor and ensemble score a variant has
+            stacked = np.vstack(list(scores.values()))
+            present = ~np.isnan(stacked)
+            with np.errstate(invalid="ignore"):
+                scores[MEAN_SCORE] = np.where(present, stacked, 0.0).sum(axis=0) / present.sum(axis=0)
+            revel = scores.get("REVEL")
+            scores[LEVEL_SCORE] = scores[MEAN_SCORE] if revel is None else np.where(np.isnan(revel), scores[MEAN_SCORE], revel)
+        annotations = store.load_columns(job_id, "annotations") or {}
+        clinical = store.load_columns(job_id, "clinical") or {}
+        for name in ("cosmic_id", "clinical_significance", "cancer_types", "mycancergenome_evidence"):
+            text[name] = column(name, annotations, None, object)
+        flags = {
+            "cosmic_match": column("cosmic_match", annotations, False, bool),
+            "actionable": column("actionable", clinical, False, bool),
+        }
+        counts = {"num_therapies": column("num_therapies", clinical, 0, int)}
+        return cls(num_variants, text, scores, flags, counts)
+
+    def _range_bounds(self, name: str, bounds: ScoreRange) -> Tuple[int, int]:
+        values, present = self._sorted[name]
+        lo = 0 if bounds.min is None else int(np.searchsorted(values[:present], bounds.min, side="left"))
+        side = "left" if bounds.max_exclusive else "right"
+        hi = present if bounds.max is None else int(np.searchsorted(values[:present], bounds.max, side=side))
+        return lo, max(lo, hi)
+
+    def _range_size(self, name: str, bounds: ScoreRange) -> int:
+        lo, hi = self._range_bounds(name, bounds)
+        missing = self.num_variants - self._sorted[name][1] if bounds.include_missing else 0
+        return hi - lo + missing
+
+    def _range_rows(self, name: str, bounds: ScoreRange) -> np.ndarray:
+        lo, hi = self._range_bounds(name, bounds)
+        rows = self.score_order[name][lo:hi]
+        if bounds.include_missing:
+            rows = np.concatenate([rows, self.score_order[name][self._sorted[name][1]:]])
+        return np.sort(rows)
+
+    def _matches(self, rows: np.ndarray, name: str, bounds: ScoreRange) -> np.ndarray:
+        values = self.scores[name][rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if bounds.min is not None:
+            keep &= values >= bounds.min
+        if bounds.max is not None:
+            keep &= (values < bounds.max) if bounds.max_exclusive else (values <= bounds.max)
+        if bounds.include_missing:
+            keep |= np.isnan(values)
+        return keep
+
+    def match(self, query: Query) -> np.ndarray:
+        """Row numbers passing the query's filters, in variant order."""
+        unknown = [name for name in query.ranges if name not in self.scores]
+        if unknown:
+            raise ValueError(f"Unknown score column(s): {', '.join(unknown)}")
+
+        # Candidates come from the gene or cancer type index, else from the narrowest score range
+        ranges = dict(query.ranges)
+        genes = {g.strip().upper() for g in query.genes if g.strip()}
+        cancers = {c.strip().lower() for c in query.cancer_types if c.strip()}
+        if cancers:
+            parts = [self.cancer_rows.get(c) for c in cancers]
+            if query.cancer_types_include_missing:
+                parts.append(np.flatnonzero([types is None for types in self.text["cancer_types"].tolist()]))
+            cancer_rows = self._union(parts)
+        if genes:
+            rows = self._union([self.gene_rows.get(g) for g in genes])
+            if cancers:
+                rows = np.intersect1d(rows, cancer_rows)
+        elif cancers:
+            rows = cancer_rows
+        elif ranges:
+            name = min(ranges, key=lambda n: self._range_size(n, ranges[n]))
+            rows = self._range_rows(name, ranges.pop(name))
+        else:
+            rows = np.arange(self.num_variants)
+
+        keep = np.ones(len(rows), dtype=bool)
+        for name, bounds in ranges.items():
+            keep &= self._matches(rows, name, bounds)
+        if query.actionable is not None:
+            keep &= self.flags["actionable"][rows] == query.actionable
+        if query.cosmic_match is not None:
+            keep &= self.flags["cosmic_match"][rows] == query.cosmic_match
+        if query.contains:
+            found = np.zeros(len(rows), dtype=bool)
+            for name in ("variant", "protein_change", "cosmic_id"):
+                values = self.text[name][rows]
+                found |= np.fromiter(
+                    (value is not None and query.contains in str(value) for value in values), dtype=bool, count=len(rows)
+                )
+            keep &= found
+        return rows[keep]
+
+    @staticmethod
+    def _union(parts: Sequence[Optional[np.ndarray]]) -> np.ndarray:
+        parts = [part for part in parts if part is not None and len(part)]
+        return np.unique(np.concatenate(parts)) if parts else np.array([], dtype=int)
+
+    def search(self, query: Query) -> Tuple[int, np.ndarray]:
+        """Total number of matches and the requested page of row numbers."""
+        sortable = {**self.scores, **self.text, **self.flags, **self.counts}
+        if query.sort_by is not None and query.sort_by not in sortable:
+            raise ValueError(f"Unknown sort column: {query.sort_by}")
+        rows = self.match(query)
+        if query.sort_by is not None:
+            rows = self._sorted_rows(rows, sortable[query.sort_by], query.descending)
+        return len(rows), rows[query.offset:query.offset + query.limit]
+
+    def aggregate(self, rows: np.ndarray, bins: int = 50, top_genes: int = 30, sample: int = 0) -> Dict[str, Any]:
+        """Plot-ready summaries of ``rows``: score histograms and a gene x score heatmap.
+
+        Histograms share one set of bin edges covering [0, 1] and any scores
+        outside it. The heatmap holds mean scores for the ``top_genes`` genes
+        with the most rows. With ``sample``, at most that many evenly spaced
+        rows (every ``step``-th, in variant order) are included with their
+        scores. Output size depends on ``bins``, ``top_genes`` and
+        ``sample``, not on the number of variants.
+        """
+        names = [name for name in self.scores if name not in DERIVED_SCORES]
+        values = {name: self.scores[name][rows] for name in names}
+        present = [col[~np.isnan(col)] for col in values.values()]
+        low = min([0.0] + [float(col.min()) for col in present if len(col)])
+        high = max([1.0] + [float(col.max()) for col in present if len(col)])
+        edges = np.linspace(low, high, bins + 1)
+        histograms = {}
+        for name, col in values.items():
+            col = col[~np.isnan(col)]
+            histograms[name] = {
+                "counts": np.histogram(col, bins=edges)[0].tolist(),
+                "count": int(len(col)),
+                "missing": int(len(rows) - len(col)),
+                "mean": float(col.mean()) if len(col) else None,
+                "median": float(np.median(col)) if len(col) else None,
+            }
+
+        genes, inverse, counts = np.unique(self.text["gene"][rows], return_inverse=True, return_counts=True)
+        top = np.argsort(-counts, kind="stable")[:top_genes]
+        means = []
+        for name, col in values.items():
+            valid = ~np.isnan(col)
+            sums = np.bincount(inverse[valid], weights=col[valid], minlength=len(genes))
+            hits = np.bincount(inverse[valid], minlength=len(genes))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = sums / hits
+            means.append([None if np.isnan(m) else float(m) for m in mean[top]])
+        out: Dict[str, Any] = {
+            "total": int(len(rows)),
+            "edges": edges.tolist(),
+            "histograms": histograms,
+            "heatmap": {
+                "genes": [str(g) for g in genes[top]],
+                "counts": counts[top].tolist(),
+                "columns": names,
+                "mean": means,
+            },
+        }
+        if sample:
+            step = max(-(-len(rows) // sample), 1)
+            out["sample"] = {"step": step, "rows": self.rows(rows[::step], ["variant"] + names)}
+        return out
+
+    @staticmethod
+    def _sorted_rows(rows: np.ndarray, column: np.ndarray, descending: bool) -> np.ndarray:
+        values = column[rows]
+        if values.dtype == object:
+            values = np.array(["" if v is None else str(v) for v in values], dtype=str)
+        if descending:
+            # Stable descending: ties keep ascending row order
+            order = len(values) - 1 - np.argsort(values[::-1], kind="stable")[::-1]
+        else:
+            order = np.argsort(values, kind="stable")
+        if values.dtype.kind == "f":
+            # Missing scores always go last, whatever the direction
+            missing = np.isnan(values[order])
+            order = np.concatenate([order[~missing], order[missing]])
+        return rows[order]
+
+    def rows(self, rows: np.ndarray, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        arrays = {**self.text, **self.scores, **self.flags, **self.counts}
+        names = list(columns) if columns else list(arrays)
+        unknown = [name for name in names if name not in arrays]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+        out = []
+        for row in rows.tolist():
+            item: Dict[str, Any] = {"idx": row}
+            for name in names:
+                value = arrays[name][row]
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                item[name] = value.item() if isinstance(value, np.generic) else value
+            out.append(item)
+        return out
+
+
+class JobIndexCache:
+    """LRU of built :class:`JobIndex` objects keyed by job id and results digest."""
+
+    def __init__(self, max_entries: int = 8) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[str, str], JobIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per index being built, so different jobs build in parallel
+        self._building: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get(self, store: Any, job_id: str, digest: str, num_variants: int) -> JobIndex:
+        key = (job_id, digest)
+        with self._lock:
+            index = self._data.get(key)
+            if index is not None:
+                self._data.move_to_end(key)
+                return index
+            build_lock = self._building.setdefault(key, threading.Lock())
+        # One build per key; a concurrent request for the same index waits for it
+        with build_lock:
+            try:
+                with self._lock:
+                    index = self._data.get(key)
+                if index is not None:
+                    return index
+                index = JobIndex.build(store, job_id, num_variants)
+                with self._lock:
+                    for stale in [k for k in self._data if k[0] == job_id and k != key]:
+                        del self._data[stale]
+                    self._data[key] = index
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.max_entries:
+                        self._data.popitem(last=False)
+                return index
+            finally:
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+
+    def invalidate(self, job_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k[0] == job_id]:
+                del self._data[key]
+
+
+# Created on import, so concurrent first queries share one cache
+_index_cache = JobIndexCache(max_entries=int(os.environ.get("QUERY_INDEX_CACHE_SIZE", "8")))
+
+
+def get_index_cache() -> JobIndexCache:
+    return _index_cache
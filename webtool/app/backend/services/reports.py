@@ -1,59 +1,576 @@
 from __future__ import annotations
 
 import io
+import os
+import sys
 import base64
-from typing import Dict, Any
-from jinja2 import Template
-import pandas as pd
+import contextlib
+import hashlib
+import itertools
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, IO, Iterable, Iterator, List, Optional, Tuple, Union
 
-try:
-    from weasyprint import HTML  # type: ignore
-except Exception:  # noqa: BLE001
-    HTML = None
+from .annotate import _vk
+from .scoring import ALGORITHMS, ENSEMBLE, _variant_key
+
+# jinja2, openpyxl, WeasyPrint and pypdf are imported on first use: together
+# they take longer to import than the rest of the backend, and a process that
+# serves no reports (or only one format) should not pay for them.
+
+
+@lru_cache(maxsize=None)
+def _weasyprint_html() -> Any:
+    """WeasyPrint's ``HTML`` class, or None when WeasyPrint is unavailable."""
+    try:
+        from weasyprint import HTML  # type: ignore
+    except Exception:  # noqa: BLE001
+        return None
+    return HTML
+
+
+@lru_cache(maxsize=None)
+def _pypdf() -> Tuple[Any, Any]:
+    """pypdf's ``(PdfReader, PdfWriter)``, or ``(None, None)``."""
+    try:
+        from pypdf import PdfReader, PdfWriter  # type: ignore
+    except Exception:  # noqa: BLE001
+        return None, None
+    return PdfReader, PdfWriter
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+REPORT_TEMPLATES = ("report.html.j2", "report_part.html.j2", "report_macros.html.j2")
+HTML_CHUNK_SIZE = 64 * 1024
+
+
+def _format_score(value: Any) -> str:
+    return f"{value:.3f}" if isinstance(value, (int, float)) else ""
+
+
+# Templates are compiled once and kept in the environment's cache; with
+# auto_reload off, later lookups do not even stat the template files.
+@lru_cache(maxsize=None)
+def _env() -> Any:
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(["html", "j2"]),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.filters["score"] = _format_score
+    return env
+
+
+# Bump when report output changes without a template edit (row layout, Excel sheets).
+REPORT_LAYOUT_VERSION = 1
+
+
+def _template_version() -> str:
+    hasher = hashlib.sha256(str(REPORT_LAYOUT_VERSION).encode())
+    for name in REPORT_TEMPLATES:
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as fh:
+            hasher.update(fh.read())
+    return hasher.hexdigest()[:12]
+
+
+# Part of every cached report's key; templates are not reloaded at runtime,
+# so the version is fixed for the life of the process.
+TEMPLATE_VERSION = _template_version()
+
+
+def load_templates() -> None:
+    """Compile all report templates up front (called in the background at startup)."""
+    for name in REPORT_TEMPLATES:
+        _env().get_template(name)
+
+
+def report_rows(results: Dict[str, Any], offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """One flat row per variant, joining scores, annotations and clinical data."""
+    scores = results.get("scores", {})
+    ensemble = results.get("ensemble", {})
+    annotations = results.get("annotations", {})
+    clinical = results.get("clinical", {})
+    for i, v in enumerate(results.get("variants", [])):
+        idx = offset + i
+        score_key = _variant_key(v, idx)
+        ann_key = _vk(v, idx)
+        ann = annotations.get(ann_key, {})
+        clin = clinical.get(ann_key, {})
+        yield {
+            "variant": score_key,
+            "gene": v.get("gene"),
+            "protein_change": v.get("protein_change"),
+            "scores": scores.get(score_key, {}),
+            "ensemble": ensemble.get(score_key, {}),
+            "cosmic_id": ann.get("COSMIC", {}).get("id"),
+            "clinvar": ann.get("ClinVar", {}).get("clinical_significance"),
+            "actionable": clin.get("actionable", False),
+            "therapies": [t.get("drug") for t in clin.get("therapies", [])],
+        }
+
+
+def _paged_rows(pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    offset = 0
+    for page in pages:
+        yield from report_rows(page, offset)
+        offset += len(page.get("variants", []))
+
+
+def stream_html_report(pages: Iterable[Dict[str, Any]], num_variants: int) -> Iterator[str]:
+    """Render the HTML report incrementally.
+
+    ``pages`` are consecutive slices of the results (as returned by a store's
+    ``iter_results``), so only one page is held in memory at a time. Output is
+    coalesced into chunks of about ``HTML_CHUNK_SIZE`` characters.
+    """
+    template = _env().get_template("report.html.j2")
+    stream = template.generate(
+        rows=_paged_rows(pages),
+        num_variants=num_variants,
+        algorithms=ALGORITHMS,
+        ensembles=ENSEMBLE,
+    )
+    buf: List[str] = []
+    size = 0
+    for piece in stream:
+        buf.append(piece)
+        size += len(piece)
+        if size >= HTML_CHUNK_SIZE:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
 
 
 def generate_html_report(results: Dict[str, Any]) -> str:
-    tpl = Template(
-        """
-        <html>
-        <head><meta charset='utf-8'><title>Mutation Report</title></head>
-        <body>
-            <h1>Mutation Report</h1>
-            <h2>Summary</h2>
-            <p>{{ results.variants | length }} variants processed.</p>
-            <h2>Scores</h2>
-            <pre>{{ results.scores | tojson(indent=2) }}</pre>
-            <h2>Ensemble</h2>
-            <pre>{{ results.ensemble | tojson(indent=2) }}</pre>
-            <h2>Annotations</h2>
-            <pre>{{ results.annotations | tojson(indent=2) }}</pre>
-            <h2>Clinical</h2>
-            <pre>{{ results.clinical | tojson(indent=2) }}</pre>
-        </body>
-        </html>
-        """
+    return "".join(stream_html_report([results], len(results.get("variants", []))))
+
+
+def pdf_available() -> bool:
+    """Whether WeasyPrint can be imported (imports it on the first call)."""
+    return _weasyprint_html() is not None
+
+
+PDF_MEDIA_TYPE = "application/pdf"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# Variants per printed page, and pages per part handed to one PDF worker.
+PDF_ROWS_PER_PAGE = int(os.environ.get("PDF_ROWS_PER_PAGE", "40"))
+PDF_PAGES_PER_PART = int(os.environ.get("PDF_PAGES_PER_PART", "25"))
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(os.cpu_count() or 1)))
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(cancel_futures=True)
+            _pdf_pool = None
+
+
+def _render_pdf_part(html: str) -> bytes:
+    return _weasyprint_html()(string=html).write_pdf()
+
+
+def _pdf_part_html(
+    pages: Iterable[Dict[str, Any]], num_variants: int, rows_per_part: int, rows_per_page: int
+) -> Iterator[str]:
+    """HTML documents for consecutive parts of the report, ``rows_per_part`` variants each.
+
+    The first part carries the title and summary, the last one the clinical
+    totals, which are only known once every row has been seen.
+    """
+    template = _env().get_template("report_part.html.j2")
+    stats = {"actionable": 0, "matched": 0}
+
+    def counted(rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for row in rows:
+            stats["actionable"] += bool(row["actionable"])
+            stats["matched"] += bool(row["cosmic_id"])
+            yield row
+
+    def render(rows: List[Dict[str, Any]], first: bool, last: bool) -> str:
+        return template.render(
+            rows=rows,
+            first=first,
+            stats=stats if last else None,
+            num_variants=num_variants,
+            rows_per_page=rows_per_page,
+            algorithms=ALGORITHMS,
+            ensembles=ENSEMBLE,
+        )
+
+    rows = counted(_paged_rows(pages))
+    parts = iter(lambda: list(itertools.islice(rows, rows_per_part)), [])
+    pending = next(parts, [])
+    first = True
+    for part in parts:
+        yield render(pending, first, False)
+        pending, first = part, False
+    yield render(pending, first, True)
+
+
+def _rendered_parts(htmls: Iterable[str], workers: int) -> Iterator[bytes]:
+    """PDF bytes for each part, in order; at most ``2 * workers`` parts are in flight."""
+    if workers <= 1:
+        for html in htmls:
+            yield _render_pdf_part(html)
+        return
+    pool = _get_pdf_pool()
+    inflight: deque = deque()
+    for html in htmls:
+        inflight.append(pool.submit(_render_pdf_part, html))
+        if len(inflight) >= 2 * workers:
+            yield inflight.popleft().result()
+    while inflight:
+        yield inflight.popleft().result()
+
+
+class _PdfConcatenator:
+    """Concatenates PDF documents into ``out``, writing each one's objects as it is added.
+
+    pypdf's ``PdfWriter`` keeps the merged document in memory until it is
+    written. Here each part is read with ``PdfReader``, the objects its
+    pages and outline use are renumbered and written straight to ``out``,
+    and the reader is dropped. Only object offsets, page references and
+    the outline's top-level items are kept until :meth:`close` writes the
+    page tree, the outline root, the catalog and the cross-reference table.
+    """
+
+    # Written by close(), once every page is known
+    CATALOG, PAGES, OUTLINES = 1, 2, 3
+
+    def __init__(self, out: IO[bytes]) -> None:
+        from pypdf import generic  # type: ignore
+
+        self.generic = generic
+        self.out = out
+        self.pos = 0
+        self.offsets: List[int] = [0] * (self.OUTLINES + 1)
+        self.kids: List[int] = []
+        self.outline: List[Tuple[int, Any]] = []
+        self.info: Optional[int] = None
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.pos += len(data)
+
+    def _reserve(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def _ref(self, num: int) -> Any:
+        return self.generic.IndirectObject(num, 0, None)
+
+    def _write_object(self, num: int, obj: Any) -> None:
+        buf = io.BytesIO()
+        buf.write(f"{num} 0 obj\n".encode())
+        obj.write_to_stream(buf)
+        buf.write(b"\nendobj\n")
+        self.offsets[num] = self.pos
+        self._write(buf.getvalue())
+
+    def add(self, data: bytes) -> None:
+        PdfReader, _ = _pypdf()
+        g = self.generic
+        reader = PdfReader(io.BytesIO(data))
+        renumbered: Dict[int, int] = {}
+        pending: deque = deque()
+
+        def rewrite(obj: Any) -> Any:
+            """``obj`` with references to this part's objects renumbered (queuing them)."""
+            if isinstance(obj, g.IndirectObject):
+                if obj.pdf is not reader:
+                    return obj  # already renumbered
+                num = renumbered.get(obj.idnum)
+                if num is None:
+                    num = renumbered[obj.idnum] = self._reserve()
+                    pending.append((obj.idnum, num))
+                return self._ref(num)
+            if isinstance(obj, g.DictionaryObject):
+                if isinstance(obj, g.StreamObject):
+                    # write_to_stream sets /Length from the data
+                    obj.pop("/Length", None)
+                for key in list(obj):
+                    obj[key] = rewrite(obj.raw_get(key))
+                return obj
+            if isinstance(obj, g.ArrayObject):
+                return g.ArrayObject(rewrite(item) for item in list.__iter__(obj))
+            return obj
+
+        def drain() -> None:
+            while pending:
+                idnum, num = pending.popleft()
+                self._write_object(num, rewrite(reader.get_object(idnum)))
+
+        # Top-level outline items are relinked across parts, so they are written by close()
+        outlines = reader.trailer["/Root"].get("/Outlines")
+        top: List[Any] = []
+        if outlines is not None:
+            item = outlines.get_object().get("/First")
+            while item is not None:
+                renumbered[item.idnum] = self._reserve()
+                top.append(item)
+                item = item.get_object().get("/Next")
+
+        # reader.pages carries inherited attributes (MediaBox, Resources) on each page. Pages are
+        # numbered first, so references to them from other pages do not pull in the old page tree
+        pages = list(reader.pages)
+        for page in pages:
+            page[g.NameObject("/Parent")] = self._ref(self.PAGES)
+            renumbered[page.indirect_reference.idnum] = self._reserve()
+        for page in pages:
+            num = renumbered[page.indirect_reference.idnum]
+            self.kids.append(num)
+            self._write_object(num, rewrite(page))
+            drain()
+        for item in top:
+            entry = item.get_object()
+            for key in ("/Parent", "/Prev", "/Next"):
+                entry.pop(key, None)
+            self.outline.append((renumbered[item.idnum], rewrite(entry)))
+        if self.info is None and "/Info" in reader.trailer:
+            self.info = rewrite(reader.trailer.raw_get("/Info")).idnum
+        drain()
+
+    def close(self) -> None:
+        g = self.generic
+        name = g.NameObject
+        count = 0
+        items = [num for num, _ in self.outline]
+        for i, (num, entry) in enumerate(self.outline):
+            entry[name("/Parent")] = self._ref(self.OUTLINES)
+            if i:
+                entry[name("/Prev")] = self._ref(items[i - 1])
+            if i + 1 < len(items):
+                entry[name("/Next")] = self._ref(items[i + 1])
+            self._write_object(num, entry)
+            count += 1 + max(int(entry.get("/Count", 0)), 0)
+        self.outline = []
+        self._write_object(self.PAGES, g.DictionaryObject({
+            name("/Type"): name("/Pages"),
+            name("/Kids"): g.ArrayObject(self._ref(num) for num in self.kids),
+            name("/Count"): g.NumberObject(len(self.kids)),
+        }))
+        outlines = g.DictionaryObject({name("/Type"): name("/Outlines"), name("/Count"): g.NumberObject(count)})
+        catalog = g.DictionaryObject({name("/Type"): name("/Catalog"), name("/Pages"): self._ref(self.PAGES)})
+        if items:
+            outlines[name("/First")] = self._ref(items[0])
+            outlines[name("/Last")] = self._ref(items[-1])
+            catalog[name("/Outlines")] = self._ref(self.OUTLINES)
+        self._write_object(self.OUTLINES, outlines)
+        self._write_object(self.CATALOG, catalog)
+
+        xref = self.pos
+        lines = [f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n"]
+        lines.extend(f"{offset:010d} 00000 n \n" for offset in self.offsets[1:])
+        trailer = f"trailer\n<< /Size {len(self.offsets)} /Root {self.CATALOG} 0 R"
+        if self.info is not None:
+            trailer += f" /Info {self.info} 0 R"
+        lines.append(f"{trailer} >>\nstartxref\n{xref}\n%%EOF\n")
+        self._write("".join(lines).encode())
+
+
+def write_pdf_report(
+    pages: Iterable[Dict[str, Any]],
+    target: Union[str, IO[bytes]],
+    num_variants: int,
+    rows_per_page: int = PDF_ROWS_PER_PAGE,
+    pages_per_part: int = PDF_PAGES_PER_PART,
+    workers: int = PDF_WORKERS,
+) -> None:
+    """Render the PDF report in parts across a process pool and concatenate them.
+
+    Parts of ``rows_per_page * pages_per_part`` variants are laid out by
+    WeasyPrint in worker processes while the parent reads further pages from
+    the store, so large reports use every core and no single process lays out
+    the whole document. Each part is appended to ``target`` as it arrives
+    (see :class:`_PdfConcatenator`). Without pypdf to read parts, the report
+    is rendered as one document in this process.
+    """
+    if not pdf_available():
+        raise RuntimeError("PDF export requires WeasyPrint")
+    _, PdfWriter = _pypdf()
+    rows_per_part = max(rows_per_page * pages_per_part, 1)
+    if PdfWriter is None:
+        rows_per_part, workers = sys.maxsize, 1
+    htmls = _pdf_part_html(pages, num_variants, rows_per_part, rows_per_page)
+    parts = _rendered_parts(htmls, workers)
+
+    if PdfWriter is None:
+        data = next(parts)
+        if isinstance(target, str):
+            with open(target, "wb") as fh:
+                fh.write(data)
+        else:
+            target.write(data)
+        return
+    with contextlib.ExitStack() as stack:
+        out = stack.enter_context(open(target, "wb")) if isinstance(target, str) else target
+        pdf = _PdfConcatenator(out)
+        for data in parts:
+            pdf.add(data)
+        pdf.close()
+
+
+def render_pdf_report(results: Dict[str, Any]) -> Tuple[bytes, str]:
+    """PDF bytes and their media type (HTML stands in when WeasyPrint is unavailable)."""
+    if not pdf_available():
+        return generate_html_report(results).encode("utf-8"), "text/html"
+    buf = io.BytesIO()
+    write_pdf_report([results], buf, len(results.get("variants", [])))
+    return buf.getvalue(), PDF_MEDIA_TYPE
+
+
+EXCEL_MAX_ROWS = 1_048_576  # per sheet, including the header row
+
+
+class _SplitSheet:
+    """Write-only sheet that continues on "<title> (2)", ... at Excel's row limit."""
+
+    def __init__(self, workbook: Any, title: str, header: List[str], max_rows: int) -> None:
+        self.workbook = workbook
+        self.title = title
+        self.header = header
+        self.max_rows = max_rows
+        self.parts = 0
+        self.rows = max_rows  # forces a sheet on the first append
+        self.ws: Any = None
+
+    def append(self, row: List[Any]) -> None:
+        if self.rows >= self.max_rows:
+            self.parts += 1
+            name = self.title if self.parts == 1 else f"{self.title} ({self.parts})"
+            self.ws = self.workbook.create_sheet(name)
+            self.ws.append(self.header)
+            self.rows = 1
+        self.ws.append(row)
+        self.rows += 1
+
+    def ensure(self) -> None:
+        """Create the (header-only) sheet if nothing was written."""
+        if self.ws is None:
+            self.parts = 1
+            self.ws = self.workbook.create_sheet(self.title)
+            self.ws.append(self.header)
+
+
+def write_excel_report(pages: Iterable[Dict[str, Any]], target: Any, max_rows: int = EXCEL_MAX_ROWS) -> None:
+    """Stream results into a multi-sheet workbook at ``target`` (path or file object).
+
+    Uses openpyxl's write-only mode, so rows go straight to per-sheet temporary
+    files and memory stays flat regardless of the number of variants. Sheets
+    that would exceed ``max_rows`` continue on numbered sheets.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    variants_sheet = _SplitSheet(wb, "Variants", ["Index", "Chrom", "Pos", "Ref", "Alt", "Gene", "Protein change"], max_rows)
+    scores_sheet = _SplitSheet(wb, "Scores", ["Variant", *ALGORITHMS], max_rows)
+    ensemble_sheet = _SplitSheet(wb, "Ensemble", ["Variant", *ENSEMBLE], max_rows)
+    annotations_sheet = _SplitSheet(
+        wb, "Annotations",
+        ["Variant", "COSMIC match", "COSMIC ID", "Frequency", "Cancer types", "Pathogenicity", "ClinVar significance"],
+        max_rows,
+    )
+    clinical_sheet = _SplitSheet(
+        wb, "Clinical Therapies",
+        ["Variant", "Actionable", "Confidence", "Drug", "Status", "Indication"],
+        max_rows,
     )
-    return tpl.render(results=results)
+
+    offset = 0
+    for page in pages:
+        variants = page.get("variants", [])
+        for i, v in enumerate(variants):
+            variants_sheet.append([offset + i, *(v.get(col) for col in ("chrom", "pos", "ref", "alt", "gene", "protein_change"))])
+        for key, algos in page.get("scores", {}).items():
+            scores_sheet.append([key, *(algos.get(a) for a in ALGORITHMS)])
+        for key, algos in page.get("ensemble", {}).items():
+            ensemble_sheet.append([key, *(algos.get(a) for a in ENSEMBLE)])
+        for key, ann in page.get("annotations", {}).items():
+            cosmic = ann.get("COSMIC", {})
+            annotations_sheet.append([
+                key,
+                bool(cosmic.get("match")),
+                cosmic.get("id"),
+                cosmic.get("frequency"),
+                ", ".join(cosmic.get("cancer_types", [])),
+                cosmic.get("pathogenicity"),
+                ann.get("ClinVar", {}).get("clinical_significance"),
+            ])
+        for key, clin in page.get("clinical", {}).items():
+            therapies = clin.get("therapies") or [{}]
+            for therapy in therapies:
+                clinical_sheet.append([
+                    key,
+                    bool(clin.get("actionable")),
+                    clin.get("confidence"),
+                    therapy.get("drug"),
+                    therapy.get("status"),
+                    therapy.get("indication"),
+                ])
+        offset += len(variants)
+
+    sheets = (variants_sheet, scores_sheet, ensemble_sheet, annotations_sheet, clinical_sheet)
+    for sheet in sheets:
+        sheet.ensure()
+    # Continuation sheets were created as rows arrived; keep each section together.
+    ordered = sorted(wb.worksheets, key=lambda ws: [s.title for s in sheets].index(ws.title.split(" (")[0]))
+    for position, ws in enumerate(ordered):
+        wb.move_sheet(ws.title, offset=position - wb.index(ws))
+    wb.save(target)
+
+
+def render_excel_report(results: Dict[str, Any]) -> bytes:
+    buf = io.BytesIO()
+    write_excel_report([results], buf)
+    return buf.getvalue()
 
 
 def generate_pdf_report(results: Dict[str, Any]) -> str:
-    html = generate_html_report(results)
-    if HTML is None:
-        # Fallback: return HTML base64 as a stand-in
-        return base64.b64encode(html.encode("utf-8")).decode("utf-8")
-    pdf_bytes = HTML(string=html).write_pdf()
+    pdf_bytes, _ = render_pdf_report(results)
     return base64.b64encode(pdf_bytes).decode("utf-8")
 
 
 def generate_excel_report(results: Dict[str, Any]) -> str:
-    rows = []
-    for var_key, algos in results.get("scores", {}).items():
-        base_row = {"variant": var_key}
-        for algo, val in algos.items():
-            base_row[algo] = val
-        rows.append(base_row)
-    df = pd.DataFrame(rows)
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Scores")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+    return base64.b64encode(render_excel_report(results)).decode("utf-8")
+
+
+def report_ext(fmt: str) -> str:
+    """File type a report format is rendered as: without WeasyPrint, PDFs are served as HTML."""
+    return "html" if fmt == "pdf" and not pdf_available() else fmt
+
+
+def write_report(
+    ext: str, pages: Iterable[Dict[str, Any]], path: str, num_variants: int, pdf_workers: int = PDF_WORKERS
+) -> None:
+    """Render paged results to ``path`` as an ``html``, ``pdf`` or ``xlsx`` report."""
+    if ext == "xlsx":
+        write_excel_report(pages, path)
+    elif ext == "pdf":
+        write_pdf_report(pages, path, num_variants, workers=pdf_workers)
+    else:
+        with open(path, "wb") as fh:
+            fh.writelines(chunk.encode("utf-8") for chunk in stream_html_report(pages, num_variants))
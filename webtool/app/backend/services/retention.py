@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+
+@dataclass
+class RetentionPolicy:
+    """When jobs are compacted (results dropped) or removed.
+
+    All ages are measured from the job's last access. A value of 0 disables
+    the corresponding rule; every rule is off unless configured.
+    """
+
+    ttl_seconds: float = 0.0
+    compact_after_seconds: float = 0.0
+    quota_bytes: int = 0
+    hot_seconds: float = 3600.0
+    sweep_interval_seconds: float = 3600.0
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            ttl_seconds=float(os.environ.get("JOB_TTL_DAYS", "0")) * DAY,
+            compact_after_seconds=float(os.environ.get("JOB_COMPACT_AFTER_DAYS", "0")) * DAY,
+            quota_bytes=int(float(os.environ.get("STORAGE_QUOTA_MB", "0")) * 1024 * 1024),
+            hot_seconds=float(os.environ.get("JOB_HOT_SECONDS", "3600")),
+            sweep_interval_seconds=float(os.environ.get("STORAGE_SWEEP_INTERVAL", "3600")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any rule can compact or remove a job."""
+        return bool(self.ttl_seconds or self.compact_after_seconds or self.quota_bytes)
+
+
+class RetentionManager:
+    """Applies a :class:`RetentionPolicy` to a job store.
+
+    The store must provide ``list_jobs``, ``compact`` (returning the job's
+    new size, or None when it had no results), ``delete`` and ``vacuum``.
+    Rendered reports in ``artifacts`` (an ``ArtifactStore``) are removed
+    along with the results they were rendered from, and request
+    profiles in ``profiles`` (a ``ProfileStore``) with the job. Jobs
+    accessed within ``hot_seconds`` are never touched, so a quota overrun
+    caused only by active jobs is reported rather than fixed.
+    """
+
+    def __init__(
+        self, store: Any, policy: Optional[RetentionPolicy] = None, artifacts: Any = None, profiles: Any = None
+    ) -> None:
+        self.store = store
+        self.artifacts = artifacts
+        self.profiles = profiles
+        self.policy = policy or RetentionPolicy.from_env()
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def stats(self) -> Dict[str, Any]:
+        jobs = self.store.list_jobs()
+        now = time.time()
+        total = sum(j["size_bytes"] for j in jobs)
+        hot = [j for j in jobs if now - j["accessed_at"] < self.policy.hot_seconds]
+        largest = sorted(jobs, key=lambda j: j["size_bytes"], reverse=True)[:10]
+        return {
+            "backend": type(self.store).__name__,
+            "num_jobs": len(jobs),
+            "total_bytes": total,
+            "quota_bytes": self.policy.quota_bytes or None,
+            "hot_jobs": len(hot),
+            "oldest_access": min((j["accessed_at"] for j in jobs), default=None),
+            "artifact_bytes": self.artifacts.size_bytes() if self.artifacts is not None else None,
+            "largest_jobs": [{"job_id": j["job_id"], "size_bytes": j["size_bytes"]} for j in largest],
+            "policy": asdict(self.policy),
+            "last_sweep": self.last_sweep,
+        }
+
+    def _delete(self, job_id: str) -> None:
+        self.store.delete(job_id)
+        if self.artifacts is not None:
+            self.artifacts.purge(job_id)
+        if self.profiles is not None:
+            self.profiles.purge(job_id)
+
+    def _compact(self, job_id: str) -> Optional[int]:
+        """Compact a job; its size afterwards, or None when there was nothing to drop."""
+        if self.artifacts is not None:
+            self.artifacts.purge(job_id)
+        return self.store.compact(job_id)
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """One retention pass: expire, compact idle jobs, then enforce the quota."""
+        with self._lock:
+            now = time.time() if now is None else now
+            policy = self.policy
+            started = time.perf_counter()
+            removed: List[str] = []
+            compacted: List[str] = []
+
+            jobs = sorted(self.store.list_jobs(), key=lambda j: j["accessed_at"])
+            live: List[Dict[str, Any]] = []
+            for job in jobs:
+                idle = now - job["accessed_at"]
+                if idle < policy.hot_seconds:
+                    live.append(job)
+                elif policy.ttl_seconds and idle >= policy.ttl_seconds:
+                    self._delete(job["job_id"])
+                    removed.append(job["job_id"])
+                elif policy.compact_after_seconds and idle >= policy.compact_after_seconds and job.get("has_results", True):
+                    size = self._compact(job["job_id"])
+                    if size is not None:
+                        compacted.append(job["job_id"])
+                        job = {**job, "size_bytes": size, "compacted": True}
+                    live.append(job)
+                else:
+                    live.append(job)
+
+            if policy.quota_bytes:
+                total = sum(j["size_bytes"] for j in live)
+                # Least recently used first; results go before whole jobs.
+                for job in live:
+                    if total <= policy.quota_bytes:
+                        break
+                    if now - job["accessed_at"] < policy.hot_seconds or job.get("compacted"):
+                        continue
+                    size = self._compact(job["job_id"]) if job.get("has_results", True) else None
+                    if size is not None:
+                        compacted.append(job["job_id"])
+                        total -= job["size_bytes"] - size
+                        job["size_bytes"] = size
+                for job in live:
+                    if total <= policy.quota_bytes:
+                        break
+                    if now - job["accessed_at"] < policy.hot_seconds or job["job_id"] in removed:
+                        continue
+                    self._delete(job["job_id"])
+                    removed.append(job["job_id"])
+                    total -= job["size_bytes"]
+
+            if removed or compacted:
+                self.store.vacuum()
+            self.last_sweep = {
+                "at": now,
+                "duration_seconds": round(time.perf_counter() - started, 4),
+                "removed": len(removed),
+                "compacted": len(compacted),
+            }
+            if removed or compacted:
+                logger.info("Storage sweep removed %d and compacted %d jobs", len(removed), len(compacted))
+            return {**self.last_sweep, "removed_jobs": removed, "compacted_jobs": compacted}
+
+    def start(self) -> None:
+        """Run :meth:`sweep` periodically in a daemon thread, if any rule is enabled."""
+        if not self.policy.enabled or self.policy.sweep_interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.policy.sweep_interval_seconds):
+            try:
+                self.sweep()
+            except Exception:  # noqa: BLE001
+                logger.exception("Storage sweep failed")
@@ -6,10 +6,11 @@ ENSEMBLE = ["REVEL", "MetaLR"]
 
 
 def run_scoring_algorithms(
-	variants: List[Dict[str, Any]], analyses: List[str], options: Dict[str, Any]
+	variants: List[Dict[str, Any]], analyses: List[str], options: Dict[str, Any], offset: int = 0
 ) -> Dict[str, Dict[str, float]]:
+	"""Scores keyed by variant; ``offset`` is the index of ``variants[0]`` in the job."""
 	scores: Dict[str, Dict[str, float]] = {}
-	for idx, variant in enumerate(variants):
+	for idx, variant in enumerate(variants, start=offset):
 		key = _variant_key(variant, idx)
 		scores[key] = {}
 		for algo in ALGORITHMS:
@@ -41,5 +42,5 @@ def _variant_key(variant: Dict[str, Any], idx: int) -> str:
 
 
 def _stable_random_number(seed: str) -> float:
-	random.seed(seed)
-	return round(random.random(), 4)
+	# A private generator per call: reseeding the shared one races between threads
+	return round(random.Random(seed).random(), 4)
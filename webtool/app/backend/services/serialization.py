@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from starlette.responses import Response  # what fastapi.responses re-exports, without importing FastAPI
+
+# NaN/inf become null, numpy arrays and scalars are encoded natively and
+# integer dict keys (e.g. positions) are allowed, mirroring what pandas-derived
+# payloads contain.
+_DUMP_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not know (sets, pandas/numpy leftovers)."""
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """Serialize ``data`` to compact UTF-8 JSON bytes, optionally with dict keys sorted."""
+    option = _DUMP_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _DUMP_OPTIONS
+    return orjson.dumps(data, default=_default, option=option)
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse JSON bytes or text."""
+    return orjson.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered through :func:`dumps`.
+
+    Returning this directly from an endpoint also skips FastAPI's
+    ``jsonable_encoder`` pass, which dominates serialization time for large
+    ``/analyze`` payloads.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,509 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .metrics import StageTimer
+from .pipeline import analysis_key, merge_results, run_pipeline
+from .serialization import dumps, loads
+from .storage import RESULT_SECTIONS
+from .streaming import ResultsDigest
+
+logger = logging.getLogger(__name__)
+
+# Largest shard; a chromosome with more variants is split into position ranges
+SHARD_MAX_VARIANTS = int(os.environ.get("SHARD_MAX_VARIANTS", "50000"))
+# A claimed shard whose worker stops renewing its lease goes back to the queue
+SHARD_LEASE_SECONDS = float(os.environ.get("SHARD_LEASE_SECONDS", "120"))
+SHARD_MAX_ATTEMPTS = int(os.environ.get("SHARD_MAX_ATTEMPTS", "3"))
+PLAN_PAGE_SIZE = 50000
+# Most job rows a worker reads at once, spanning a shard's runs and the rows between them
+LOAD_WINDOW = 20000
+# Variants per chunk the merge appends to the job's results writer
+MERGE_CHUNK_SIZE = 5000
+
+Runs = List[Tuple[int, int]]
+
+
+def _chrom_order(chrom: Any) -> Tuple[int, Any]:
+    name = str(chrom or "")
+    if name.lower().startswith("chr"):
+        name = name[3:]
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+
+def index_runs(indices: Sequence[int]) -> Runs:
+    """Sorted indices as half-open ``(start, stop)`` runs of consecutive values."""
+    runs: Runs = []
+    for idx in sorted(indices):
+        if runs and runs[-1][1] == idx:
+            runs[-1] = (runs[-1][0], idx + 1)
+        else:
+            runs.append((idx, idx + 1))
+    return runs
+
+
+def plan_shards(chroms: Sequence[Any], positions: Sequence[Any], max_variants: int = SHARD_MAX_VARIANTS) -> List[Dict[str, Any]]:
+    """Split a job's variants by chromosome, and large chromosomes by position.
+
+    Takes the job's ``chrom`` and ``pos`` columns and returns shards in
+    chromosome order as ``{"shard", "region", "num_variants", "runs"}``,
+    where ``runs`` are the job indices of the shard's variants as
+    ``(start, stop)`` ranges. Every variant is in exactly one shard.
+    """
+    by_chrom: Dict[str, List[int]] = {}
+    for idx, chrom in enumerate(chroms):
+        by_chrom.setdefault(str(chrom if chrom is not None else "?"), []).append(idx)
+    shards: List[Dict[str, Any]] = []
+    for chrom in sorted(by_chrom, key=_chrom_order):
+        indices = by_chrom[chrom]
+        if len(indices) > max_variants:
+            indices = sorted(indices, key=lambda i: (positions[i] if isinstance(positions[i], int) else -1, i))
+        for start in range(0, len(indices), max(max_variants, 1)):
+            part = indices[start:start + max_variants]
+            region = chrom
+            if len(part) < len(by_chrom[chrom]):
+                known = [positions[i] for i in part if isinstance(positions[i], int)]
+                region = f"{chrom}:{min(known)}-{max(known)}" if known else chrom
+            shards.append({"shard": len(shards), "region": region, "num_variants": len(part), "runs": index_runs(part)})
+    return shards
+
+
+def merge_order(shard_runs: Sequence[Tuple[int, Runs]]) -> List[Tuple[int, int, int]]:
+    """Every shard's runs as ``(start, stop, shard)``, in job index order.
+
+    A shard's part file holds one record per run, in the shard's run order,
+    so reading the next record of each shard in this order yields the job's
+    results in index order.
+    """
+    return sorted((start, stop, shard) for shard, runs in shard_runs for start, stop in runs)
+
+
+class ShardQueue:
+    """Work queue of analysis shards in a SQLite database on a shared filesystem.
+
+    Workers on any number of processes or nodes :meth:`claim` shards under a
+    lease, renew it while working and :meth:`complete` or :meth:`fail` them;
+    a shard whose lease runs out (its worker died) is handed out again, up
+    to ``max_attempts`` times. Shard results are files under ``parts_dir``.
+    The filesystem must support SQLite's locking (local disks and most
+    cluster filesystems do; some NFS setups do not).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS shard_jobs (
+        job_id TEXT PRIMARY KEY,
+        analysis_key TEXT NOT NULL,
+        analyses TEXT NOT NULL,
+        options TEXT NOT NULL,
+        state TEXT NOT NULL,
+        num_shards INTEGER NOT NULL,
+        submitted_at REAL NOT NULL,
+        finished_at REAL,
+        results_sha256 TEXT,
+        error TEXT
+    );
+    CREATE TABLE IF NOT EXISTS shards (
+        job_id TEXT NOT NULL,
+        shard INTEGER NOT NULL,
+        region TEXT NOT NULL,
+        num_variants INTEGER NOT NULL,
+        runs TEXT NOT NULL,
+        state TEXT NOT NULL,
+        worker TEXT,
+        lease_until REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        seconds REAL,
+        stage_timings TEXT,
+        error TEXT,
+        PRIMARY KEY (job_id, shard)
+    );
+    CREATE INDEX IF NOT EXISTS shards_state ON shards (state, lease_until);
+    """
+
+    def __init__(self, base_dir: str, lease_seconds: float = SHARD_LEASE_SECONDS,
+                 max_attempts: int = SHARD_MAX_ATTEMPTS) -> None:
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.path = os.path.join(self.base_dir, "shards.sqlite3")
+        self.parts_dir = os.path.join(self.base_dir, "shards")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def part_path(self, job_id: str, shard: int) -> str:
+        return os.path.join(self.parts_dir, job_id, f"{shard:06d}.jsonl")
+
+    def shard_runs(self, job_id: str) -> List[Tuple[int, Runs]]:
+        """``(shard, runs)`` for each of a job's shards."""
+        rows = self._conn().execute("SELECT shard, runs FROM shards WHERE job_id = ? ORDER BY shard", (job_id,))
+        return [(shard, [tuple(r) for r in loads(runs)]) for shard, runs in rows]
+
+    def submit(self, job_id: str, analyses: List[str], options: Dict[str, Any], key: str,
+               shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Queue a job's shards; a job already queued with the same analysis key is not queued twice."""
+        with self._tx() as conn:
+            row = conn.execute("SELECT analysis_key, state FROM shard_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None and row[1] in ("queued", "merging"):
+                if row[0] != key:
+                    raise RuntimeError("A different sharded analysis is already running for this job")
+            else:
+                shutil.rmtree(os.path.join(self.parts_dir, job_id), ignore_errors=True)
+                conn.execute("DELETE FROM shards WHERE job_id = ?", (job_id,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO shard_jobs (job_id, analysis_key, analyses, options, state, num_shards, "
+                    "submitted_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (job_id, key, dumps(analyses), dumps(options), len(shards), time.time()),
+                )
+                conn.executemany(
+                    "INSERT INTO shards (job_id, shard, region, num_variants, runs, state) VALUES (?, ?, ?, ?, ?, 'pending')",
+                    [(job_id, s["shard"], s["region"], s["num_variants"], dumps(s["runs"])) for s in shards],
+                )
+        return self.status(job_id)
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Lease the next pending (or abandoned) shard to ``worker``, oldest job first."""
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT s.job_id, s.shard, s.region, s.runs, s.attempts, j.analyses, j.options FROM shards s "
+                "JOIN shard_jobs j ON j.job_id = s.job_id "
+                "WHERE s.state = 'pending' OR (s.state = 'running' AND s.lease_until < ?) "
+                "ORDER BY j.submitted_at, s.shard LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, shard, region, runs, attempts, analyses, options = row
+            if attempts >= self.max_attempts:
+                self._fail_job(conn, job_id, shard, f"shard {shard} ({region}) abandoned {attempts} times")
+                return None
+            conn.execute(
+                "UPDATE shards SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND shard = ?",
+                (worker, now + self.lease_seconds, job_id, shard),
+            )
+        return {
+            "job_id": job_id, "shard": shard, "region": region, "runs": [tuple(r) for r in loads(runs)],
+            "analyses": loads(analyses), "options": loads(options), "worker": worker,
+        }
+
+    def renew(self, task: Dict[str, Any]) -> bool:
+        """Extend a claimed shard's lease; False if it was handed to another worker meanwhile."""
+        cur = self._conn().execute(
+            "UPDATE shards SET lease_until = ? WHERE job_id = ? AND shard = ? AND worker = ? AND state = 'running'",
+            (time.time() + self.lease_seconds, task["job_id"], task["shard"], task["worker"]),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, task: Dict[str, Any], seconds: float, stage_timings: Dict[str, float]) -> bool:
+        """Mark a shard done; True when it was the job's last one and the caller should merge."""
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE shards SET state = 'done', seconds = ?, stage_timings = ?, lease_until = NULL "
+                "WHERE job_id = ? AND shard = ? AND worker = ? AND state = 'running'",
+                (seconds, dumps(stage_timings), task["job_id"], task["shard"], task["worker"]),
+            )
+            if cur.rowcount != 1:
+                return False
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM shards WHERE job_id = ? AND state != 'done'", (task["job_id"],)
+            ).fetchone()[0]
+            if remaining:
+                return False
+            cur = conn.execute(
+                "UPDATE shard_jobs SET state = 'merging' WHERE job_id = ? AND state = 'queued'", (task["job_id"],)
+            )
+            return cur.rowcount == 1
+
+    def fail(self, task: Dict[str, Any], error: str) -> None:
+        """Return a failed shard to the queue, or fail the job once it has used its attempts."""
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM shards WHERE job_id = ? AND shard = ? AND worker = ? AND state = 'running'",
+                (task["job_id"], task["shard"], task["worker"]),
+            ).fetchone()
+            if row is None:
+                return
+            if row[0] >= self.max_attempts:
+                self._fail_job(conn, task["job_id"], task["shard"], error)
+            else:
+                conn.execute(
+                    "UPDATE shards SET state = 'pending', worker = NULL, lease_until = NULL, error = ? "
+                    "WHERE job_id = ? AND shard = ?",
+                    (error, task["job_id"], task["shard"]),
+                )
+
+    def _fail_job(self, conn: sqlite3.Connection, job_id: str, shard: int, error: str) -> None:
+        conn.execute(
+            "UPDATE shards SET state = 'failed', lease_until = NULL, error = ? WHERE job_id = ? AND shard = ?",
+            (error, job_id, shard),
+        )
+        conn.execute("UPDATE shards SET state = 'cancelled' WHERE job_id = ? AND state = 'pending'", (job_id,))
+        conn.execute(
+            "UPDATE shard_jobs SET state = 'failed', error = ?, finished_at = ? WHERE job_id = ?",
+            (f"shard {shard}: {error}", time.time(), job_id),
+        )
+
+    def finish(self, job_id: str, results_sha256: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record the outcome of a job's merge."""
+        self._conn().execute(
+            "UPDATE shard_jobs SET state = ?, results_sha256 = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            ("failed" if error else "done", results_sha256, error, time.time(), job_id),
+        )
+        if error is None:
+            shutil.rmtree(os.path.join(self.parts_dir, job_id), ignore_errors=True)
+
+    def shard_timings(self, job_id: str) -> List[Dict[str, float]]:
+        rows = self._conn().execute(
+            "SELECT stage_timings FROM shards WHERE job_id = ? ORDER BY shard", (job_id,)
+        )
+        return [loads(timings) for (timings,) in rows if timings]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        job = conn.execute(
+            "SELECT state, num_shards, submitted_at, finished_at, results_sha256, error, analysis_key "
+            "FROM shard_jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if job is None:
+            return None
+        shards = [
+            {
+                "shard": shard, "region": region, "num_variants": n, "state": state, "worker": worker,
+                "attempts": attempts, "seconds": seconds, "error": error,
+            }
+            for shard, region, n, state, worker, attempts, seconds, error in conn.execute(
+                "SELECT shard, region, num_variants, state, worker, attempts, seconds, error FROM shards "
+                "WHERE job_id = ? ORDER BY shard",
+                (job_id,),
+            )
+        ]
+        counts: Dict[str, int] = {}
+        for shard in shards:
+            counts[shard["state"]] = counts.get(shard["state"], 0) + 1
+        state, num_shards, submitted_at, finished_at, results_sha256, error, analysis_key = job
+        return {
+            "job_id": job_id, "state": state, "analysis_key": analysis_key, "num_shards": num_shards,
+            "shard_states": counts, "submitted_at": submitted_at, "finished_at": finished_at,
+            "results_sha256": results_sha256, "error": error, "shards": shards,
+        }
+
+
+def submit_sharded(queue: ShardQueue, store: Any, job_id: str, analyses: List[str], options: Dict[str, Any],
+                   max_variants: int = SHARD_MAX_VARIANTS) -> Dict[str, Any]:
+    """Plan a stored job's shards from its ``chrom``/``pos`` columns and queue them."""
+    meta = store.load_meta(job_id)
+    if meta is None:
+        raise LookupError(f"job {job_id} not found")
+    columns = store.load_columns(job_id, "variants", ["chrom", "pos"])
+    if columns is None:
+        # The JSON and SQLite stores read columns from results; page through the variants instead
+        columns = {"chrom": [], "pos": []}
+        for offset in range(0, meta["num_variants"], PLAN_PAGE_SIZE):
+            for variant in store.load_variants(job_id, offset=offset, limit=PLAN_PAGE_SIZE):
+                columns["chrom"].append(variant.get("chrom"))
+                columns["pos"].append(variant.get("pos"))
+    shards = plan_shards(columns["chrom"], columns["pos"], max_variants)
+    return queue.submit(job_id, analyses, options, analysis_key(analyses, options), shards)
+
+
+def _load_windows(runs: Runs, max_span: int = LOAD_WINDOW) -> Iterator[Tuple[int, int, Runs]]:
+    """Group runs into ``(start, stop, runs)`` index windows of at most ``max_span`` variants.
+
+    Chromosomes are interleaved in some files, which leaves a shard with
+    many short runs; each window is read from the store in one call.
+    """
+    group: Runs = []
+    for run in runs:
+        if group and run[1] - group[0][0] > max_span:
+            yield group[0][0], group[-1][1], group
+            group = []
+        group.append(run)
+    if group:
+        yield group[0][0], group[-1][1], group
+
+
+@contextmanager
+def _part_writer(path: str) -> Iterator[Any]:
+    """A shard's part file, one JSON record per line; it appears only once complete."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            yield fh
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ShardWorker:
+    """Claims shards from a :class:`ShardQueue` and runs the pipeline on them.
+
+    Each shard's results are written run by run to its part file. The
+    worker that finishes a job's last shard merges the part files, in job
+    index order and a chunk at a time, into ``store``'s results writer, so
+    the results are saved as a regular analysis without holding the job in
+    memory.
+    """
+
+    def __init__(self, queue: ShardQueue, store: Any, artifacts: Any = None, worker_id: Optional[str] = None) -> None:
+        self.queue = queue
+        self.store = store
+        self.artifacts = artifacts
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def run_shard(self, task: Dict[str, Any]) -> None:
+        timer = StageTimer()
+        t0 = time.perf_counter()
+        stop = threading.Event()
+
+        def keep_lease() -> None:
+            while not stop.wait(self.queue.lease_seconds / 3):
+                if not self.queue.renew(task):
+                    logger.warning("Lost the lease on shard %s of job %s", task["shard"], task["job_id"])
+                    return
+
+        renewer = threading.Thread(target=keep_lease, name="shard-lease", daemon=True)
+        renewer.start()
+        try:
+            with _part_writer(self.queue.part_path(task["job_id"], task["shard"])) as out:
+                for window_start, window_stop, runs in _load_windows(task["runs"]):
+                    with timer.stage("load"):
+                        window = self.store.load_variants(
+                            task["job_id"], offset=window_start, limit=window_stop - window_start
+                        )
+                    for start, stop_idx in runs:
+                        variants = window[start - window_start:stop_idx - window_start]
+                        results = run_pipeline(variants, task["analyses"], task["options"], offset=start, timer=timer)
+                        with timer.stage("shard_write"):
+                            out.write(dumps({"offset": start, **results}) + b"\n")
+                    del window
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Shard %s of job %s failed", task["shard"], task["job_id"])
+            self.queue.fail(task, f"{type(exc).__name__}: {exc}")
+            return
+        finally:
+            stop.set()
+            renewer.join()
+            timer.finish()
+        if self.queue.complete(task, time.perf_counter() - t0, timer.rounded()):
+            self.merge(task["job_id"])
+
+    def merge(self, job_id: str) -> None:
+        status = self.queue.status(job_id)
+        timer = StageTimer()
+        digest = ResultsDigest()
+        writer = self.store.results_writer(job_id)
+        parts: Dict[int, Any] = {}
+        try:
+            order = merge_order(self.queue.shard_runs(job_id))
+            remaining: Dict[int, int] = {}
+            for _, _, shard in order:
+                remaining[shard] = remaining.get(shard, 0) + 1
+            chunk: Dict[str, Any] = {}
+            chunk_offset = 0
+
+            def flush() -> None:
+                with timer.stage("hash"):
+                    digest.add(chunk)
+                with timer.stage("store_write"):
+                    writer.write(chunk_offset, chunk)
+
+            for start, stop, shard in order:
+                with timer.stage("merge"):
+                    if shard not in parts:
+                        parts[shard] = open(self.queue.part_path(job_id, shard), "rb")
+                    record = loads(parts[shard].readline())
+                    if record.pop("offset", None) != start or len(record["variants"]) != stop - start:
+                        raise RuntimeError(f"part file of shard {shard} does not match its runs at {start}")
+                    remaining[shard] -= 1
+                    if not remaining[shard]:
+                        parts.pop(shard).close()
+                    if not chunk:
+                        chunk_offset = start
+                    merge_results(chunk, record)
+                    del record
+                if len(chunk["variants"]) >= MERGE_CHUNK_SIZE:
+                    flush()
+                    chunk = {}
+            if chunk:
+                flush()
+            with timer.stage("hash"):
+                results_sha256 = digest.hexdigest()
+            # Job timings: shard stages summed over all workers, plus the merge
+            totals: Dict[str, float] = {}
+            for timings in self.queue.shard_timings(job_id):
+                for name, seconds in timings.items():
+                    totals[name] = totals.get(name, 0.0) + seconds
+            totals.update(timer.timings)
+            meta = self.store.load_meta(job_id) or {}
+            with timer.stage("store_write"):
+                writer.commit(
+                    analysis_key=status["analysis_key"], results_sha256=results_sha256,
+                    stage_timings={name: round(seconds, 6) for name, seconds in totals.items()},
+                )
+            if self.artifacts is not None and meta.get("results_sha256") != results_sha256:
+                self.artifacts.purge(job_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Merging shards of job %s failed", job_id)
+            writer.abort()
+            self.queue.finish(job_id, error=f"merge: {type(exc).__name__}: {exc}")
+            return
+        finally:
+            for fh in parts.values():
+                fh.close()
+            digest.close()
+            timer.finish()
+        self.queue.finish(job_id, results_sha256=results_sha256)
+
+    def work(self, idle_exit: Optional[float] = None, poll_interval: float = 1.0,
+             stop: Optional[threading.Event] = None) -> int:
+        """Process shards until ``stop`` is set, or the queue stays empty for ``idle_exit`` seconds.
+
+        Returns the number of shards processed.
+        """
+        stop = stop or threading.Event()
+        done = 0
+        idle_since = time.monotonic()
+        while not stop.is_set():
+            task = self.queue.claim(self.worker_id)
+            if task is None:
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    break
+                stop.wait(poll_interval)
+                continue
+            self.run_shard(task)
+            done += 1
+            idle_since = time.monotonic()
+        return done
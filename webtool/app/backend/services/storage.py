@@ -1,13 +1,145 @@
 from __future__ import annotations
 
 import os
-import json
-from typing import Any, Optional
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .serialization import dumps, loads
+
+RESULT_SECTIONS = ("scores", "ensemble", "annotations", "clinical")
+# Namespace for content-addressed job ids: the first upload of a file gets its
+# content id, later identical uploads copy that job (see ``copy_job``).
+UPLOAD_NAMESPACE = uuid.UUID("6f1c9a52-3d0e-4b8a-9d4f-2a7e5c1b8e90")
+
+
+def upload_job_id(filename: str, digest: str) -> str:
+    """Job id of an uploaded file, from its name and SHA-256 hex digest."""
+    # The extension picks the parser, so it is part of the job identity.
+    ext = os.path.splitext(filename.lower().removesuffix(".gz"))[1]
+    return str(uuid.uuid5(UPLOAD_NAMESPACE, f"{ext}:{digest}"))
+
+
+def _default_base_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "..", "data")
+
+
+def _key_index(variant_key: str, default: int) -> int:
+    """Variant index encoded in result keys as ``...#<idx>``."""
+    _, sep, tail = variant_key.rpartition("#")
+    if sep and tail.isdigit():
+        return int(tail)
+    return default
+
+
+def _split_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if k not in ("variants", "results")}
+
+
+VARIANT_COLUMNS = ("chrom", "pos", "ref", "alt", "gene", "protein_change")
+COLUMN_SECTIONS = ("variants",) + RESULT_SECTIONS
+# Joins a variant's COSMIC cancer types into one annotations column
+CANCER_TYPE_SEPARATOR = "; "
+
+
+def section_row(section: str, idx: int, variant_key: Optional[str], value: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one variant or result entry into a row of scalar columns.
+
+    Score sections are already flat (one column per algorithm); nested
+    annotation and clinical entries are reduced to their filterable fields.
+    """
+    if section == "variants":
+        return {"idx": idx, **{col: value.get(col) for col in VARIANT_COLUMNS}}
+    row: Dict[str, Any] = {"idx": idx, "variant_key": variant_key}
+    if section in ("scores", "ensemble"):
+        row.update(value)
+    elif section == "annotations":
+        cosmic = value.get("COSMIC", {})
+        row["cosmic_match"] = bool(cosmic.get("match"))
+        row["cosmic_id"] = cosmic.get("id")
+        row["clinical_significance"] = value.get("ClinVar", {}).get("clinical_significance")
+        row["cancer_types"] = CANCER_TYPE_SEPARATOR.join(cosmic.get("cancer_types") or []) or None
+        row["mycancergenome_evidence"] = value.get("MyCancerGenome", {}).get("evidence")
+    elif section == "clinical":
+        row["actionable"] = bool(value.get("actionable"))
+        row["confidence"] = value.get("confidence")
+        row["num_therapies"] = len(value.get("therapies", []))
+    return row
+
+
+def rows_to_columns(rows: Iterable[Dict[str, Any]], columns: Optional[Sequence[str]] = None) -> Dict[str, List[Any]]:
+    """Pivot flattened rows into ``{column: values}``; all columns when ``columns`` is None.
+
+    Rows are consumed one at a time, so a generator never has to be held in full.
+    """
+    if columns is not None:
+        out = {col: [] for col in columns}
+        for row in rows:
+            for col, values in out.items():
+                values.append(row.get(col))
+        return out
+    out: Dict[str, List[Any]] = {}
+    count = 0
+    for row in rows:
+        for col in row:
+            if col not in out:
+                out[col] = [None] * count
+        for col, values in out.items():
+            values.append(row.get(col))
+        count += 1
+    return out
+
+
+def _section_rows(section: str, results: Dict[str, Any], offset: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    if section == "variants":
+        return [section_row(section, offset + i, None, v) for i, v in enumerate(results["variants"])]
+    return [
+        section_row(section, _key_index(k, seq), k, v)
+        for seq, (k, v) in enumerate(results.get(section, {}).items())
+    ]
+
+
+def _page(items: Dict[str, Any], offset: int, limit: Optional[int]) -> Dict[str, Any]:
+    end = None if limit is None else offset + limit
+    return {
+        k: v
+        for seq, (k, v) in enumerate(items.items())
+        if offset <= _key_index(k, seq) and (end is None or _key_index(k, seq) < end)
+    }
+
+
+class BufferedResultsWriter:
+    """Results writer for stores that can only save results whole.
+
+    Chunks (``run_pipeline`` output, in job order) are collected in memory
+    and saved with ``save_results`` on :meth:`commit`, so unlike the
+    incremental writers memory grows with the job.
+    """
+
+    def __init__(self, store: Any, key: str) -> None:
+        self.store = store
+        self.key = key
+        self.results: Dict[str, Any] = {"variants": [], **{section: {} for section in RESULT_SECTIONS}}
+
+    def write(self, offset: int, part: Dict[str, Any]) -> None:
+        self.results["variants"].extend(part["variants"])
+        for section in RESULT_SECTIONS:
+            self.results[section].update(part[section])
+
+    def commit(self, **meta: Any) -> None:
+        self.store.save_results(self.key, self.results, **meta)
+        self.abort()
+
+    def abort(self) -> None:
+        self.results = {}
 
 
 class LocalJSONStore:
     def __init__(self, base_dir: Optional[str] = None) -> None:
-        self.base_dir = base_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "..", "data")
+        self.base_dir = base_dir or _default_base_dir()
         self.base_dir = os.path.abspath(self.base_dir)
         os.makedirs(self.base_dir, exist_ok=True)
 
@@ -17,12 +149,625 @@ class LocalJSONStore:
 
     def save(self, key: str, data: Any) -> None:
         path = self._path(key)
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(data, fh)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(dumps(data))
+        os.replace(tmp, path)
 
     def load(self, key: str) -> Optional[Any]:
         path = self._path(key)
         if not os.path.exists(path):
             return None
-        with open(path, "r", encoding="utf-8") as fh:
-            return json.load(fh)
+        with open(path, "rb") as fh:
+            data = loads(fh.read())
+        # atime records the last access for retention, independent of mount options
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+        return data
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def copy_job(self, key: str, new_key: str) -> bool:
+        """Copy a job, variants and results, to ``new_key``; False when ``key`` does not exist."""
+        payload = self.load(key)
+        if payload is None:
+            return False
+        self.save(new_key, payload)
+        return True
+
+    def compact(self, key: str) -> Optional[int]:
+        """Drop derived results, keeping the uploaded variants.
+
+        Returns the job's size in bytes afterwards, or None when it had no results.
+        """
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        payload = self.load(key)
+        if payload is None or "results" not in payload:
+            # load() marked an access; restore it so the check does not reset the idle time
+            os.utime(path, (st.st_atime, st.st_mtime))
+            return None
+        payload.pop("results")
+        payload.pop("analysis_key", None)
+        self.save(key, payload)
+        # Keep the access times retention measures idleness from
+        os.utime(path, (st.st_atime, st.st_mtime))
+        return os.path.getsize(path)
+
+    def vacuum(self) -> None:
+        pass
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        jobs = []
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                jobs.append({
+                    "job_id": entry.name[: -len(".json")],
+                    "size_bytes": st.st_size,
+                    "created_at": min(st.st_ctime, st.st_mtime),
+                    "updated_at": st.st_mtime,
+                    "accessed_at": max(st.st_atime, st.st_mtime),
+                })
+        return jobs
+
+    # Partial access. The JSON layout has no finer granularity than a whole
+    # job, so these read the file once and slice.
+
+    def load_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        payload = self.load(key)
+        if payload is None:
+            return None
+        meta = _split_payload(payload)
+        meta["num_variants"] = len(payload.get("variants", []))
+        meta["has_results"] = "results" in payload
+        return meta
+
+    def load_variants(self, key: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        payload = self.load(key)
+        if payload is None:
+            return None
+        variants = payload.get("variants", [])
+        return variants[offset:] if limit is None else variants[offset:offset + limit]
+
+    def iter_variants(self, key: str, page_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """Variants in consecutive pages of ``page_size``, sliced from one read of the file."""
+        variants = self.load_variants(key) or []
+        for offset in range(0, len(variants), page_size):
+            yield variants[offset:offset + page_size]
+
+    def load_results(
+        self,
+        key: str,
+        sections: Sequence[str] = RESULT_SECTIONS,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        payload = self.load(key)
+        if payload is None or "results" not in payload:
+            return None
+        results = payload["results"]
+        variants = results.get("variants", payload.get("variants", []))
+        out: Dict[str, Any] = {"variants": variants[offset:] if limit is None else variants[offset:offset + limit]}
+        for section in sections:
+            out[section] = _page(results.get(section, {}), offset, limit)
+        return out
+
+    def save_results(self, key: str, results: Dict[str, Any], **meta: Any) -> None:
+        payload = self.load(key) or {}
+        payload.update(meta)
+        payload["results"] = results
+        self.save(key, payload)
+
+    def results_writer(self, key: str) -> "BufferedResultsWriter":
+        """Writer for results computed in chunks; the file is rewritten whole on commit."""
+        return BufferedResultsWriter(self, key)
+
+    def iter_results(self, key: str, page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Results in consecutive pages. The whole file is read anyway, so one page."""
+        results = self.load_results(key)
+        if results is not None:
+            yield results
+
+    def load_columns(
+        self,
+        key: str,
+        section: str,
+        columns: Optional[Sequence[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Selected columns of one section for a range of variant indices."""
+        sections = () if section == "variants" else (section,)
+        results = self.load_results(key, sections=sections, offset=offset, limit=limit)
+        if results is None:
+            return None
+        return rows_to_columns(_section_rows(section, results, offset, limit), columns)
+
+
+class SQLiteJobStore:
+    """Transactional job store backed by one embedded SQLite database.
+
+    Jobs, variants and each result section live in separate tables so that
+    ``/analyze`` can write results without rewriting the variants, and
+    ``/report`` or paginated reads fetch only the rows they need. WAL mode and
+    a busy timeout make it safe to share between uvicorn workers.
+
+    Job payloads keep the ``LocalJSONStore`` shape: ``variants`` and
+    ``results`` are decomposed into rows, every other key is job metadata.
+    ``results["variants"]`` is assumed to be the job's variant list.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        meta BLOB NOT NULL,
+        num_variants INTEGER NOT NULL DEFAULT 0,
+        has_results INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        accessed_at REAL NOT NULL DEFAULT 0,
+        variants_bytes INTEGER NOT NULL DEFAULT 0,
+        results_bytes INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS variants (
+        job_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, idx)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS scores (
+        job_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        variant_key TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, kind, idx)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS annotations (
+        job_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        variant_key TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, idx)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS clinical (
+        job_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        variant_key TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, idx)
+    ) WITHOUT ROWID;
+    """
+
+    # section -> (table, kind); ``kind`` distinguishes rows sharing a table
+    _SECTION_TABLES = {
+        "scores": ("scores", "scores"),
+        "ensemble": ("scores", "ensemble"),
+        "annotations": ("annotations", None),
+        "clinical": ("clinical", None),
+    }
+
+    def __init__(self, base_dir: Optional[str] = None, filename: str = "jobs.sqlite3") -> None:
+        self.base_dir = os.path.abspath(base_dir or _default_base_dir())
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.path = os.path.join(self.base_dir, filename)
+        # Jobs written by the previous per-file store are imported on first read.
+        self.legacy = LocalJSONStore(self.base_dir)
+        self._local = threading.local()
+        conn = self._conn()
+        # Only takes effect for a new database; lets sweeps return freed pages.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.executescript(self.SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("accessed_at REAL", "variants_bytes INTEGER", "results_bytes INTEGER"):
+            if column.split()[0] not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} NOT NULL DEFAULT 0")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Writes
+
+    def _write_variants(self, conn: sqlite3.Connection, key: str, variants: Iterable[Dict[str, Any]]) -> int:
+        """Replace a job's variant rows; returns the bytes written."""
+        size = 0
+
+        def rows():
+            nonlocal size
+            for idx, v in enumerate(variants):
+                data = dumps(v)
+                size += len(data)
+                yield key, idx, data
+
+        conn.execute("DELETE FROM variants WHERE job_id = ?", (key,))
+        conn.executemany("INSERT INTO variants (job_id, idx, data) VALUES (?, ?, ?)", rows())
+        return size
+
+    def _write_results(self, conn: sqlite3.Connection, key: str, results: Dict[str, Any]) -> int:
+        """Replace a job's result rows; returns the bytes written."""
+        self._delete_results(conn, key)
+        return self._insert_results(conn, key, results)
+
+    def _insert_results(self, conn: sqlite3.Connection, key: str, results: Dict[str, Any], start: int = 0) -> int:
+        """Add result rows for variants from index ``start``; returns the bytes written."""
+        size = 0
+
+        def rows(kind: Optional[str], items):
+            nonlocal size
+            for seq, (k, v) in enumerate(items, start):
+                data = dumps(v)
+                size += len(data) + len(k)
+                prefix = (key,) if kind is None else (key, kind)
+                yield (*prefix, _key_index(k, seq), k, data)
+
+        for section, (table, kind) in self._SECTION_TABLES.items():
+            items = results.get(section, {}).items()
+            if kind is None:
+                conn.executemany(
+                    f"INSERT INTO {table} (job_id, idx, variant_key, data) VALUES (?, ?, ?, ?)",
+                    rows(kind, items),
+                )
+            else:
+                conn.executemany(
+                    f"INSERT INTO {table} (job_id, kind, idx, variant_key, data) VALUES (?, ?, ?, ?, ?)",
+                    rows(kind, items),
+                )
+        return size
+
+    def _delete_results(self, conn: sqlite3.Connection, key: str) -> None:
+        for table in ("scores", "annotations", "clinical"):
+            conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (key,))
+
+    def _upsert_job(self, conn: sqlite3.Connection, key: str, meta: Dict[str, Any], **columns: Any) -> None:
+        now = time.time()
+        sets = ", ".join(f"{col} = excluded.{col}" for col in columns)
+        names = "".join(f", {col}" for col in columns)
+        marks = "".join(", ?" for _ in columns)
+        conn.execute(
+            f"INSERT INTO jobs (job_id, meta, created_at, updated_at, accessed_at{names}) VALUES (?, ?, ?, ?, ?{marks}) "
+            f"ON CONFLICT(job_id) DO UPDATE SET meta = excluded.meta, updated_at = excluded.updated_at, "
+            f"accessed_at = excluded.accessed_at{', ' + sets if sets else ''}",
+            (key, dumps(meta), now, now, now, *columns.values()),
+        )
+
+    def save(self, key: str, data: Any) -> None:
+        variants = data.get("variants", [])
+        results = data.get("results")
+        with self._tx() as conn:
+            variants_bytes = self._write_variants(conn, key, variants)
+            if results is not None:
+                results_bytes = self._write_results(conn, key, results)
+            else:
+                results_bytes = 0
+                self._delete_results(conn, key)
+            self._upsert_job(
+                conn, key, _split_payload(data),
+                num_variants=len(variants), has_results=int(results is not None),
+                variants_bytes=variants_bytes, results_bytes=results_bytes,
+            )
+
+    def save_results(self, key: str, results: Dict[str, Any], **meta: Any) -> None:
+        """Replace a job's results (and merge ``meta``) without touching its variants."""
+        with self._tx() as conn:
+            row = conn.execute("SELECT meta FROM jobs WHERE job_id = ?", (key,)).fetchone()
+            merged = {**(loads(row[0]) if row else {}), **meta}
+            results_bytes = self._write_results(conn, key, results)
+            self._upsert_job(conn, key, merged, has_results=1, results_bytes=results_bytes)
+
+    def results_writer(self, key: str) -> "SQLiteResultsWriter":
+        """Writer that replaces a job's results chunk by chunk (see :class:`SQLiteResultsWriter`)."""
+        return SQLiteResultsWriter(self, key)
+
+    def delete(self, key: str) -> None:
+        with self._tx() as conn:
+            for table in ("jobs", "variants", "scores", "annotations", "clinical"):
+                conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (key,))
+            # Rows left staged by a streaming analysis that never finished
+            # (an id range, so the primary key is used; "." sorts right after "-")
+            for table in ("scores", "annotations", "clinical"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE job_id > ? AND job_id < ?", (f"{key}/stream-", f"{key}/stream.")
+                )
+        # Otherwise a not-yet-imported legacy file would bring the job back.
+        self.legacy.delete(key)
+
+    def copy_job(self, key: str, new_key: str) -> bool:
+        """Copy a job, variants and results, to ``new_key`` in one transaction.
+
+        Rows are copied inside the database, without decoding them. Returns
+        False when ``key`` does not exist.
+        """
+        if self.load_meta(key) is None:
+            return False
+        now = time.time()
+        with self._tx() as conn:
+            copied = conn.execute(
+                "INSERT INTO jobs (job_id, meta, num_variants, has_results, created_at, updated_at, accessed_at, "
+                "variants_bytes, results_bytes) SELECT ?, meta, num_variants, has_results, ?, ?, ?, "
+                "variants_bytes, results_bytes FROM jobs WHERE job_id = ?",
+                (new_key, now, now, now, key),
+            ).rowcount
+            if not copied:
+                return False
+            conn.execute(
+                "INSERT INTO variants (job_id, idx, data) SELECT ?, idx, data FROM variants WHERE job_id = ?",
+                (new_key, key),
+            )
+            conn.execute(
+                "INSERT INTO scores (job_id, kind, idx, variant_key, data) "
+                "SELECT ?, kind, idx, variant_key, data FROM scores WHERE job_id = ?",
+                (new_key, key),
+            )
+            for table in ("annotations", "clinical"):
+                conn.execute(
+                    f"INSERT INTO {table} (job_id, idx, variant_key, data) "
+                    f"SELECT ?, idx, variant_key, data FROM {table} WHERE job_id = ?",
+                    (new_key, key),
+                )
+        return True
+
+    def compact(self, key: str) -> Optional[int]:
+        """Drop derived results, keeping the uploaded variants.
+
+        Returns the job's size in bytes afterwards, or None when it had no results.
+        """
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT meta, variants_bytes FROM jobs WHERE job_id = ? AND has_results = 1", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            meta = loads(row[0])
+            meta.pop("analysis_key", None)
+            self._delete_results(conn, key)
+            conn.execute(
+                "UPDATE jobs SET meta = ?, has_results = 0, results_bytes = 0 WHERE job_id = ?",
+                (dumps(meta), key),
+            )
+        return row[1]
+
+    def vacuum(self) -> None:
+        """Return pages freed by deletes to the filesystem."""
+        self._conn().execute("PRAGMA incremental_vacuum")
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT job_id, variants_bytes + results_bytes, created_at, updated_at, accessed_at, has_results FROM jobs"
+        )
+        return [
+            {
+                "job_id": job_id,
+                "size_bytes": size,
+                "created_at": created,
+                "updated_at": updated,
+                "accessed_at": max(accessed, updated),
+                "has_results": bool(has_results),
+            }
+            for job_id, size, created, updated, accessed, has_results in rows
+        ]
+
+    # Reads
+
+    def _import_legacy(self, key: str) -> bool:
+        payload = self.legacy.load(key)
+        if payload is None:
+            return False
+        self.save(key, payload)
+        return True
+
+    ACCESS_RESOLUTION = 60.0
+
+    def _touch(self, key: str, accessed_at: float) -> None:
+        # Throttled so that hot reads do not turn into a write per request:
+        # even an UPDATE matching no rows takes the write lock.
+        now = time.time()
+        if accessed_at >= now - self.ACCESS_RESOLUTION:
+            return
+        self._conn().execute(
+            "UPDATE jobs SET accessed_at = ? WHERE job_id = ? AND accessed_at < ?",
+            (now, key, now - self.ACCESS_RESOLUTION),
+        )
+
+    def load_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT meta, num_variants, has_results, accessed_at FROM jobs WHERE job_id = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return self.load_meta(key) if self._import_legacy(key) else None
+        self._touch(key, row[3])
+        meta = loads(row[0])
+        meta["num_variants"] = row[1]
+        meta["has_results"] = bool(row[2])
+        return meta
+
+    def _read_variants(self, key: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT data FROM variants WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+            (key, offset, -1 if limit is None else limit),
+        )
+        return [loads(data) for (data,) in rows]
+
+    def load_variants(self, key: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        if self.load_meta(key) is None:
+            return None
+        return self._read_variants(key, offset, limit)
+
+    def iter_variants(self, key: str, page_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """Variants in consecutive pages of ``page_size``."""
+        meta = self.load_meta(key)
+        if meta is None:
+            return
+        for offset in range(0, meta["num_variants"], page_size):
+            yield self._read_variants(key, offset, page_size)
+
+    def load_section(self, key: str, section: str, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        table, kind = self._SECTION_TABLES[section]
+        where = "job_id = ? AND idx >= ?"
+        params: List[Any] = [key, offset]
+        if kind is not None:
+            where += " AND kind = ?"
+            params.append(kind)
+        if limit is not None:
+            where += " AND idx < ?"
+            params.append(offset + limit)
+        rows = self._conn().execute(f"SELECT variant_key, data FROM {table} WHERE {where} ORDER BY idx", params)
+        return {k: loads(data) for k, data in rows}
+
+    def load_results(
+        self,
+        key: str,
+        sections: Sequence[str] = RESULT_SECTIONS,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        meta = self.load_meta(key)
+        if meta is None or not meta["has_results"]:
+            return None
+        return self._read_results(key, self._read_variants(key, offset, limit), sections, offset, limit)
+
+    def iter_results(self, key: str, page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Results in consecutive pages of ``page_size`` variants."""
+        meta = self.load_meta(key)
+        if meta is None or not meta["has_results"]:
+            return
+        for offset in range(0, meta["num_variants"], page_size):
+            yield self._read_results(key, self._read_variants(key, offset, page_size), offset=offset, limit=page_size)
+
+    def _read_results(
+        self,
+        key: str,
+        variants: List[Dict[str, Any]],
+        sections: Sequence[str] = RESULT_SECTIONS,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"variants": variants}
+        for section in sections:
+            out[section] = self.load_section(key, section, offset, limit)
+        return out
+
+    def load_columns(
+        self,
+        key: str,
+        section: str,
+        columns: Optional[Sequence[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Selected columns of one section for a range of variant indices.
+
+        Rows are read from the section's table and reduced one at a time, so
+        only the returned columns are held in memory, never the full results.
+        """
+        meta = self.load_meta(key)
+        if meta is None or not meta["has_results"]:
+            return None
+        if section == "variants":
+            table, kind = "variants", None
+        else:
+            table, kind = self._SECTION_TABLES[section]
+        where = "job_id = ? AND idx >= ?"
+        params: List[Any] = [key, offset]
+        if kind is not None:
+            where += " AND kind = ?"
+            params.append(kind)
+        if limit is not None:
+            where += " AND idx < ?"
+            params.append(offset + limit)
+        key_column = "NULL" if section == "variants" else "variant_key"
+        cursor = self._conn().execute(f"SELECT idx, {key_column}, data FROM {table} WHERE {where} ORDER BY idx", params)
+        return rows_to_columns(
+            (section_row(section, idx, variant_key, loads(data)) for idx, variant_key, data in cursor), columns
+        )
+
+    def load(self, key: str) -> Optional[Any]:
+        meta = self.load_meta(key)
+        if meta is None:
+            return None
+        has_results = meta.pop("has_results")
+        meta.pop("num_variants")
+        variants = self._read_variants(key)
+        payload = {**meta, "variants": variants}
+        if has_results:
+            payload["results"] = self._read_results(key, variants)
+        return payload
+
+
+class SQLiteResultsWriter:
+    """Replaces a SQLite job's results chunk by chunk.
+
+    Each :meth:`write` inserts one chunk's rows, in its own transaction,
+    under a staging id that no reader asks for, so nothing is held in
+    memory between chunks and the previous results stay readable.
+    :meth:`commit` swaps the staged rows in for them in one transaction;
+    :meth:`abort` removes the staged rows and leaves the job as it was.
+    """
+
+    def __init__(self, store: SQLiteJobStore, key: str) -> None:
+        self.store = store
+        self.key = key
+        # Never a job id, so readers do not see the rows until they are swapped in
+        self.staging = f"{key}/stream-{uuid.uuid4().hex}"
+        self.results_bytes = 0
+
+    def write(self, offset: int, part: Dict[str, Any]) -> None:
+        with self.store._tx() as conn:
+            self.results_bytes += self.store._insert_results(conn, self.staging, part, offset)
+
+    def commit(self, **meta: Any) -> None:
+        with self.store._tx() as conn:
+            self.store._delete_results(conn, self.key)
+            for table in ("scores", "annotations", "clinical"):
+                conn.execute(f"UPDATE {table} SET job_id = ? WHERE job_id = ?", (self.key, self.staging))
+            row = conn.execute("SELECT meta FROM jobs WHERE job_id = ?", (self.key,)).fetchone()
+            merged = {**(loads(row[0]) if row else {}), **meta}
+            self.store._upsert_job(conn, self.key, merged, has_results=1, results_bytes=self.results_bytes)
+
+    def abort(self) -> None:
+        with self.store._tx() as conn:
+            self.store._delete_results(conn, self.staging)
+
+
+def get_store(backend: Optional[str] = None, base_dir: Optional[str] = None) -> Any:
+    """Job store selected by ``JOB_STORE``: ``sqlite`` (default), ``json`` or ``parquet``."""
+    backend = (backend or os.environ.get("JOB_STORE", "sqlite")).lower()
+    base_dir = base_dir or os.environ.get("JOB_STORE_DIR")
+    if backend == "json":
+        return LocalJSONStore(base_dir)
+    if backend == "sqlite":
+        return SQLiteJobStore(base_dir)
+    if backend == "parquet":
+        from .parquet_store import ParquetJobStore
+
+        return ParquetJobStore(base_dir)
+    raise ValueError(f"Unknown job store backend: {backend}")
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import VARIANTS_PROCESSED, StageTimer
+from .pipeline import PIPELINE_STAGES
+from .serialization import dumps
+from .storage import RESULT_SECTIONS
+
+# Variants per chunk, and chunks each stage may queue ahead of the next one.
+# Peak memory scales with chunks in flight; small chunks cost no throughput.
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", "1000"))
+STREAM_QUEUE_DEPTH = int(os.environ.get("STREAM_QUEUE_DEPTH", "2"))
+# How often blocked stages check whether another stage failed
+_POLL_SECONDS = 0.1
+_SPOOL_BLOCK = 1 << 20
+_DONE = object()
+
+
+class ResultsDigest:
+    """``sha256(dumps(results))`` of results that arrive one chunk at a time.
+
+    Chunks must be added in job order. Variants are hashed as they come;
+    the serialized result sections are spooled to temporary files and
+    hashed in document order by :meth:`hexdigest`, so memory does not grow
+    with the job.
+    """
+
+    def __init__(self) -> None:
+        self._sha = hashlib.sha256(b'{"variants":[')
+        self._started = {name: False for name in ("variants",) + RESULT_SECTIONS}
+        self._spools = {section: tempfile.TemporaryFile() for section in RESULT_SECTIONS}
+
+    def _append(self, name: str, body: bytes, write: Callable[[bytes], Any]) -> None:
+        if not body:
+            return
+        if self._started[name]:
+            write(b",")
+        write(body)
+        self._started[name] = True
+
+    def add(self, part: Dict[str, Any]) -> None:
+        # Without their enclosing brackets, chunks concatenate into the full document
+        self._append("variants", dumps(part["variants"])[1:-1], self._sha.update)
+        for section, spool in self._spools.items():
+            self._append(section, dumps(part[section])[1:-1], spool.write)
+
+    def hexdigest(self) -> str:
+        sha = self._sha.copy()
+        sha.update(b"]")
+        for section, spool in self._spools.items():
+            sha.update(b',"' + section.encode() + b'":{')
+            spool.seek(0)
+            for block in iter(lambda: spool.read(_SPOOL_BLOCK), b""):
+                sha.update(block)
+            spool.seek(0, os.SEEK_END)
+            sha.update(b"}")
+        sha.update(b"}")
+        return sha.hexdigest()
+
+    def close(self) -> None:
+        for spool in self._spools.values():
+            spool.close()
+
+
+def stream_pipeline(
+    chunks: Iterable[Tuple[int, List[Dict[str, Any]]]],
+    analyses: List[str],
+    options: Dict[str, Any],
+    sink: Callable[[int, Dict[str, Any]], None],
+    queue_depth: int = STREAM_QUEUE_DEPTH,
+    timer: Optional[StageTimer] = None,
+) -> int:
+    """Run ``(offset, variants)`` chunks through the pipeline stages concurrently.
+
+    Reading ``chunks``, each of ``PIPELINE_STAGES`` and ``sink(offset,
+    part)`` run in their own threads (the sink in the caller's), connected
+    by queues of ``queue_depth`` chunks. A stage blocks while the next one's
+    queue is full, so at most about ``(stages + 1) * (queue_depth + 1)``
+    chunks are in memory however large the job is. ``part`` is the chunk's
+    :func:`run_pipeline` output; ``sink`` gets parts in job order. The
+    first error in any thread stops the others and is re-raised here.
+    Returns the number of variants processed.
+
+    Stage timings in ``timer`` are per stage, so with stages overlapping
+    they add up to more than the wall time.
+    """
+    timer = timer or StageTimer()
+    queues: List[queue.Queue] = [queue.Queue(maxsize=max(1, queue_depth)) for _ in range(len(PIPELINE_STAGES) + 1)]
+    failed = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(q: queue.Queue, item: Any) -> bool:
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q: queue.Queue) -> Any:
+        while not failed.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def read() -> None:
+        pages: Iterator[Tuple[int, List[Dict[str, Any]]]] = iter(chunks)
+        while True:
+            with timer.stage("load"):
+                chunk = next(pages, None)
+            if chunk is None:
+                break
+            offset, variants = chunk
+            if not put(queues[0], (offset, {"variants": variants})):
+                return
+        put(queues[0], _DONE)
+
+    def process(name: str, stage: Callable[..., None], inbox: queue.Queue, outbox: queue.Queue) -> None:
+        while True:
+            item = get(inbox)
+            if item is _DONE:
+                break
+            offset, part = item
+            with timer.stage(name):
+                stage(part, offset, analyses, options)
+            if not put(outbox, item):
+                return
+        put(outbox, _DONE)
+
+    def guarded(target: Callable[..., None], *args: Any) -> Callable[[], None]:
+        def run() -> None:
+            try:
+                target(*args)
+            except BaseException as exc:  # noqa: BLE001  (re-raised by the caller)
+                errors.append(exc)
+                failed.set()
+
+        return run
+
+    threads = [threading.Thread(target=guarded(read), name="stream-read", daemon=True)]
+    for i, (name, stage) in enumerate(PIPELINE_STAGES):
+        threads.append(threading.Thread(
+            target=guarded(process, name, stage, queues[i], queues[i + 1]), name=f"stream-{name}", daemon=True,
+        ))
+    for thread in threads:
+        thread.start()
+
+    processed = 0
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _DONE:
+                break
+            offset, part = item
+            VARIANTS_PROCESSED.inc(len(part["variants"]))
+            sink(offset, part)
+            processed += len(part["variants"])
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return processed
+
+
+def _offsets(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    offset = 0
+    for variants in pages:
+        yield offset, variants
+        offset += len(variants)
+
+
+def stream_analysis(
+    store: Any,
+    job_id: str,
+    analyses: List[str],
+    options: Dict[str, Any],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    queue_depth: int = STREAM_QUEUE_DEPTH,
+    timer: Optional[StageTimer] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    **meta: Any,
+) -> str:
+    """Analyze a stored job in bounded memory, writing results as chunks finish.
+
+    Variants are read from the store ``chunk_size`` at a time, run through
+    :func:`stream_pipeline` and appended to the store's results writer; the
+    results become visible (replacing any previous ones) when the last chunk
+    is committed, with ``results_sha256``, ``stage_timings`` and ``meta``.
+    ``on_progress(processed)`` runs after each chunk is written. Returns
+    the results' SHA-256, the same as hashing the output of
+    :func:`run_pipeline` over the whole job.
+    """
+    if store.load_meta(job_id) is None:
+        raise LookupError(f"job {job_id} not found")
+    timer = timer or StageTimer()
+    digest = ResultsDigest()
+    writer = store.results_writer(job_id)
+
+    def sink(offset: int, part: Dict[str, Any]) -> None:
+        with timer.stage("hash"):
+            digest.add(part)
+        with timer.stage("store_write"):
+            writer.write(offset, part)
+        if on_progress is not None:
+            on_progress(offset + len(part["variants"]))
+
+    try:
+        stream_pipeline(
+            _offsets(store.iter_variants(job_id, page_size=chunk_size)), analyses, options, sink, queue_depth, timer
+        )
+        with timer.stage("hash"):
+            results_sha256 = digest.hexdigest()
+        with timer.stage("store_write"):
+            writer.commit(results_sha256=results_sha256, stage_timings=timer.rounded(), **meta)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        digest.close()
+    return results_sha256
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+STRUCTURE_FORMATS = {"cif": "chemical/x-mmcif", "pdb": "chemical/x-pdb"}
+DEFAULT_MIRROR = "https://files.rcsb.org/download"
+
+_PDB_ID_RE = re.compile(r"^[0-9][A-Za-z0-9]{3}$")
+_CIF_TOKEN_RE = re.compile(r"'(?:[^']|'(?=\S))*'(?=\s|$)|\"(?:[^\"]|\"(?=\S))*\"(?=\s|$)|\S+")
+_LOCK_STRIPES = 16
+
+# mmCIF items read to build the residue index (None: every item)
+_INDEX_ITEMS = {
+    "_struct_ref": None,
+    "_struct_ref_seq": None,
+    "_entity_src_gen": None,
+    "_atom_site": ("label_seq_id", "auth_seq_id", "auth_asym_id", "label_comp_id", "pdbx_PDB_ins_code",
+                   "pdbx_PDB_model_num"),
+}
+
+
+class StructureNotFound(LookupError):
+    pass
+
+
+def normalize_pdb_id(pdb_id: str) -> str:
+    if not _PDB_ID_RE.match(pdb_id or ""):
+        raise ValueError(f"Invalid PDB ID: {pdb_id!r}")
+    return pdb_id.upper()
+
+
+def _cif_tokens(text: str) -> Iterator[str]:
+    """Raw mmCIF tokens; quoted values keep their quotes, text fields start with ';'."""
+    lines = iter(text.splitlines())
+    for line in lines:
+        if line.startswith(";"):
+            parts = [line[1:]]
+            for cont in lines:
+                if cont.startswith(";"):
+                    break
+                parts.append(cont)
+            yield ";" + "\n".join(parts)
+            continue
+        if line.startswith("#"):
+            continue
+        yield from _CIF_TOKEN_RE.findall(line)
+
+
+def _cif_value(token: str) -> Optional[str]:
+    if token[0] in "'\";":
+        return token[1:-1] if token[0] != ";" else token[1:].strip()
+    return None if token in (".", "?") else token
+
+
+def read_cif_tables(
+    text: str, categories: Dict[str, Optional[Sequence[str]]]
+) -> Dict[str, List[Dict[str, Optional[str]]]]:
+    """Rows of the wanted categories (``"_atom_site"`` etc.) of an mmCIF file.
+
+    ``categories`` maps each category to the items to keep, or None for all
+    of them. Handles both ``loop_`` tables and single-row key/value blocks;
+    other categories are skipped without being stored.
+    """
+    wanted = set(categories)
+    tables: Dict[str, List[Dict[str, Optional[str]]]] = {name: [] for name in wanted}
+    single: Dict[str, Dict[str, Optional[str]]] = {}
+    tokens = _cif_tokens(text)
+    token = next(tokens, None)
+    while token is not None:
+        if token == "loop_":
+            headers: List[str] = []
+            token = next(tokens, None)
+            while token is not None and token.startswith("_"):
+                headers.append(token)
+                token = next(tokens, None)
+            category = headers[0].split(".", 1)[0] if headers else ""
+            keep = category in wanted
+            if keep:
+                names = [h.split(".", 1)[1] for h in headers]
+                items = categories[category]
+                columns = [(i, name) for i, name in enumerate(names) if items is None or name in items]
+            row: List[str] = []
+            while token is not None and not (token.startswith("_") or token == "loop_" or token.startswith("data_")):
+                if keep:
+                    row.append(token)
+                    if len(row) == len(headers):
+                        tables[category].append({name: _cif_value(row[i]) for i, name in columns})
+                        row = []
+                token = next(tokens, None)
+            continue
+        if token.startswith("_"):
+            value = next(tokens, None)
+            category, _, item = token.partition(".")
+            if category in wanted and value is not None:
+                single.setdefault(category, {})[item] = _cif_value(value)
+        token = next(tokens, None)
+    for category, fields in single.items():
+        tables[category].append(fields)
+    return tables
+
+
+def build_residue_index(pdb_id: str, text: str) -> Dict[str, Any]:
+    """Map UniProt positions to the residues that model them, from an mmCIF file.
+
+    Returns ``{"pdb_id", "chains": {chain: [accession]}, "genes": {gene:
+    [accession]}, "uniprot": {accession: {position: [[chain, resi, icode,
+    resname]]}}}``. Only residues present in the first model are listed, so a
+    position in a disordered loop has no entry.
+    """
+    tables = read_cif_tables(text, _INDEX_ITEMS)
+
+    # Observed residues of model 1: (chain, label_seq_id) -> [resi, icode, resname]
+    observed: Dict[tuple, List[Any]] = {}
+    first_model = None
+    for atom in tables["_atom_site"]:
+        model = atom.get("pdbx_PDB_model_num")
+        if first_model is None:
+            first_model = model
+        if model != first_model or atom.get("label_seq_id") is None:
+            continue
+        key = (atom["auth_asym_id"], atom["label_seq_id"])
+        if key not in observed:
+            try:
+                resi = int(atom["auth_seq_id"])
+            except (TypeError, ValueError):
+                continue
+            observed[key] = [resi, atom.get("pdbx_PDB_ins_code") or "", atom.get("label_comp_id")]
+
+    refs = {
+        row["id"]: row["pdbx_db_accession"]
+        for row in tables["_struct_ref"]
+        if row.get("db_name") == "UNP" and row.get("pdbx_db_accession")
+    }
+    genes: Dict[str, List[str]] = {}
+    ref_entities = {row.get("id"): row.get("entity_id") for row in tables["_struct_ref"]}
+    entity_genes: Dict[str, List[str]] = {}
+    for row in tables["_entity_src_gen"]:
+        names = [g.strip().upper() for g in (row.get("pdbx_gene_src_gene") or "").split(",") if g.strip()]
+        entity_genes.setdefault(row.get("entity_id"), []).extend(names)
+
+    chains: Dict[str, List[str]] = {}
+    uniprot: Dict[str, Dict[str, List[List[Any]]]] = {}
+    for row in tables["_struct_ref_seq"]:
+        accession = refs.get(row.get("ref_id"))
+        chain = row.get("pdbx_strand_id")
+        try:
+            seq_beg, db_beg, db_end = int(row["seq_align_beg"]), int(row["db_align_beg"]), int(row["db_align_end"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if accession is None or chain is None:
+            continue
+        if accession not in chains.setdefault(chain, []):
+            chains[chain].append(accession)
+        positions = uniprot.setdefault(accession, {})
+        for position in range(db_beg, db_end + 1):
+            residue = observed.get((chain, str(seq_beg + position - db_beg)))
+            if residue is not None:
+                positions.setdefault(str(position), []).append([chain] + residue)
+        for gene in entity_genes.get(ref_entities.get(row.get("ref_id")), []):
+            if accession not in genes.setdefault(gene, []):
+                genes[gene].append(accession)
+    return {"pdb_id": pdb_id, "chains": chains, "genes": genes, "uniprot": uniprot}
+
+
+class StructureStore:
+    """PDB/mmCIF files cached on disk, with a residue index per structure.
+
+    Files are fetched once from ``mirror`` (RCSB by default, or an internal
+    mirror) and then served locally; with ``offline`` set nothing is fetched
+    and only files already in ``base_dir`` are available. The residue index
+    (see :func:`build_residue_index`) is built from the mmCIF file when it is
+    first fetched, stored next to it as JSON and kept in a small in-memory LRU.
+    """
+
+    def __init__(self, base_dir: str, mirror: str = DEFAULT_MIRROR, offline: bool = False,
+                 max_indexes: int = 32, timeout: float = 30.0) -> None:
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.mirror = mirror.rstrip("/")
+        self.offline = offline
+        self.max_indexes = max_indexes
+        self.timeout = timeout
+        self._session: Any = None
+        self._indexes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    @property
+    def session(self) -> Any:
+        """HTTP session for the mirror, created (and ``requests`` imported) on the first download."""
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            session.headers.update({"User-Agent": "Cancer-Mutation-Analysis-Tool/1.0"})
+            self._session = session
+        return self._session
+
+    def path(self, pdb_id: str, fmt: str) -> str:
+        return os.path.join(self.base_dir, f"{pdb_id}.{fmt}")
+
+    def _index_path(self, pdb_id: str) -> str:
+        return os.path.join(self.base_dir, f"{pdb_id}.residues.json")
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _fetch(self, pdb_id: str, fmt: str) -> bytes:
+        if self.offline:
+            raise StructureNotFound(f"Structure {pdb_id} is not in the local cache")
+        resp = self.session.get(f"{self.mirror}/{pdb_id}.{fmt}", timeout=self.timeout)
+        if resp.status_code == 404:
+            raise StructureNotFound(f"Structure {pdb_id} ({fmt}) not found")
+        resp.raise_for_status()
+        return resp.content
+
+    def get(self, pdb_id: str, fmt: str = "cif") -> str:
+        """Local path of the structure file, fetching it on first use."""
+        pdb_id = normalize_pdb_id(pdb_id)
+        if fmt not in STRUCTURE_FORMATS:
+            raise ValueError(f"Unsupported structure format: {fmt}")
+        path = self.path(pdb_id, fmt)
+        if os.path.exists(path):
+            return path
+        with self._locks[hash(pdb_id) % _LOCK_STRIPES]:
+            if not os.path.exists(path):
+                data = self._fetch(pdb_id, fmt)
+                self._write(path, data)
+                if fmt == "cif":
+                    self._save_index(pdb_id, data.decode("utf-8", errors="replace"))
+        return path
+
+    def _save_index(self, pdb_id: str, text: str) -> Dict[str, Any]:
+        index = build_residue_index(pdb_id, text)
+        self._write(self._index_path(pdb_id), json.dumps(index, separators=(",", ":")).encode())
+        return index
+
+    def residue_index(self, pdb_id: str) -> Dict[str, Any]:
+        pdb_id = normalize_pdb_id(pdb_id)
+        with self._lock:
+            index = self._indexes.get(pdb_id)
+            if index is not None:
+                self._indexes.move_to_end(pdb_id)
+                return index
+        path = self.get(pdb_id, "cif")
+        try:
+            with open(self._index_path(pdb_id), "rb") as fh:
+                index = json.load(fh)
+        except FileNotFoundError:
+            # mmCIF copied into the cache by hand: index it now
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                index = self._save_index(pdb_id, fh.read())
+        with self._lock:
+            self._indexes[pdb_id] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def residues(self, pdb_id: str, gene: Optional[str] = None, uniprot: Optional[str] = None,
+                 position: Optional[int] = None) -> Dict[str, Any]:
+        """The residue index, narrowed to a gene or accession and optionally one position."""
+        index = self.residue_index(pdb_id)
+        mapping = index["uniprot"]
+        accessions = list(mapping)
+        if uniprot:
+            accessions = [a for a in accessions if a == uniprot.upper()]
+        if gene:
+            accessions = [a for a in accessions if a in index["genes"].get(gene.upper(), [])]
+        out = {}
+        for accession in accessions:
+            positions = mapping[accession]
+            if position is not None:
+                positions = {str(position): positions[str(position)]} if str(position) in positions else {}
+            out[accession] = positions
+        return {"pdb_id": index["pdb_id"], "chains": index["chains"], "genes": index["genes"], "uniprot": out}
+
+    def prefetch(self, pdb_ids: Sequence[str]) -> None:
+        for pdb_id in pdb_ids:
+            try:
+                self.residue_index(pdb_id)
+            except Exception:  # noqa: BLE001
+                logger.warning("Could not prefetch structure %s", pdb_id, exc_info=True)
+
+    def cached_ids(self) -> List[str]:
+        return sorted({name.split(".", 1)[0] for name in os.listdir(self.base_dir) if not name.endswith(".tmp")})
+
+
+def get_structure_store(base_dir: str) -> StructureStore:
+    return StructureStore(
+        base_dir,
+        mirror=os.environ.get("PDB_MIRROR_URL", DEFAULT_MIRROR),
+        offline=os.environ.get("STRUCTURE_OFFLINE", "").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,169 @@
+"""Sharded analysis: split a job by chromosome and run the shards on many workers.
+
+Shards are queued in ``<store dir>/shards.sqlite3``. Any number of ``work``
+processes, on this machine or on other nodes that mount the same store
+directory, claim them, and the last one to finish merges the results into
+the job store, where the API serves them as a regular analysis.
+
+Run from ``webtool/`` (``--store``/``--store-dir`` default to ``JOB_STORE``/``JOB_STORE_DIR``)::
+
+    python -m app.backend.sharded submit <job_id> --max-shard-variants 50000
+    python -m app.backend.sharded work --idle-exit 60        # on each node
+    python -m app.backend.sharded status <job_id>
+
+    # Everything on one machine, with local processes standing in for nodes
+    python -m app.backend.sharded run cohort.vcf --workers 4 --verify
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from .services.artifacts import ArtifactStore
+from .services.parsers import parse_variant_file
+from .services.pipeline import run_pipeline
+from .services.serialization import dumps
+from .services.shards import SHARD_MAX_VARIANTS, ShardQueue, ShardWorker, submit_sharded
+from .services.storage import get_store, upload_job_id
+
+WEBTOOL_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _open(args: argparse.Namespace):
+    store = get_store(args.store, args.store_dir)
+    return store, ShardQueue(store.base_dir)
+
+
+def _print_status(status: Dict[str, Any]) -> None:
+    shards = ", ".join(f"{n} {state}" for state, n in sorted(status["shard_states"].items()))
+    print(f"{status['job_id']}: {status['state']} ({status['num_shards']} shards: {shards})")
+    if status["error"]:
+        print(f"  error: {status['error']}")
+
+
+def _submit(args: argparse.Namespace) -> int:
+    store, queue = _open(args)
+    status = submit_sharded(queue, store, args.job_id, args.analyses, args.options, args.max_shard_variants)
+    _print_status(status)
+    for shard in status["shards"]:
+        print(f"  {shard['shard']:>5}  {shard['region']:<28} {shard['num_variants']:>10,} variants")
+    return 0
+
+
+def _work(args: argparse.Namespace) -> int:
+    store, queue = _open(args)
+    artifacts = ArtifactStore(os.path.join(store.base_dir, "artifacts"))
+    worker = ShardWorker(queue, store, artifacts, worker_id=args.worker_id)
+    done = worker.work(idle_exit=args.idle_exit, poll_interval=args.poll_interval)
+    print(f"{worker.worker_id}: processed {done} shards")
+    return 0
+
+
+def _status(args: argparse.Namespace) -> int:
+    _, queue = _open(args)
+    status = queue.status(args.job_id)
+    if status is None:
+        print(f"{args.job_id}: no sharded analysis")
+        return 1
+    if args.json:
+        print(json.dumps(status, indent=2))
+    else:
+        _print_status(status)
+    return 0 if status["state"] != "failed" else 1
+
+
+def _run(args: argparse.Namespace) -> int:
+    store, queue = _open(args)
+    with open(args.file, "rb") as fh:
+        content = fh.read()
+    digest = hashlib.sha256(content).hexdigest()
+    name = os.path.basename(args.file)
+    job_id = upload_job_id(name, digest)
+    if store.load_meta(job_id) is None:
+        store.save(job_id, {"filename": name, "sha256": digest, "variants": parse_variant_file(name, content)})
+    del content
+
+    t0 = time.perf_counter()
+    status = submit_sharded(queue, store, job_id, args.analyses, args.options, args.max_shard_variants)
+    print(f"Job {job_id}: {status['num_shards']} shards on {args.workers} worker processes")
+    cmd = [sys.executable, "-m", "app.backend.sharded", "--store", args.store or os.environ.get("JOB_STORE", "sqlite"),
+           "--store-dir", store.base_dir, "work", "--idle-exit", "2", "--poll-interval", "0.2"]
+    workers = [
+        subprocess.Popen(cmd + ["--worker-id", f"local-{i}"], cwd=WEBTOOL_DIR, stdout=subprocess.DEVNULL)
+        for i in range(args.workers)
+    ]
+    while True:
+        status = queue.status(job_id)
+        if status["state"] in ("done", "failed") or all(w.poll() is not None for w in workers):
+            break
+        time.sleep(0.2)
+    for w in workers:
+        w.wait()
+    elapsed = time.perf_counter() - t0
+    status = queue.status(job_id)
+    _print_status(status)
+    meta = store.load_meta(job_id)
+    print(f"{meta['num_variants']:,} variants in {elapsed:.1f} s ({meta['num_variants'] / elapsed:,.0f} variants/s)")
+    if status["state"] != "done":
+        return 1
+
+    if args.verify:
+        results = run_pipeline(store.load_variants(job_id), args.analyses, args.options)
+        expected = hashlib.sha256(dumps(results)).hexdigest()
+        match = expected == status["results_sha256"]
+        print(f"Unsharded run {'matches' if match else 'DIFFERS'}: {expected}")
+        return 0 if match else 1
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", default=None, choices=["sqlite", "json", "parquet"], help="job store backend")
+    parser.add_argument("--store-dir", default=None, help="job store directory (shared by all nodes)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def analysis_options(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--analyses", default="all", type=lambda s: [a.strip() for a in s.split(",") if a.strip()])
+        sub.add_argument("--options", default={}, type=json.loads, help="analysis options as JSON")
+        sub.add_argument("--max-shard-variants", type=int, default=SHARD_MAX_VARIANTS)
+
+    sub = commands.add_parser("submit", help="queue the shards of a stored job")
+    sub.add_argument("job_id")
+    analysis_options(sub)
+    sub.set_defaults(handler=_submit)
+
+    sub = commands.add_parser("work", help="process shards from the queue")
+    sub.add_argument("--worker-id", default=None, help="default: host:pid")
+    sub.add_argument("--idle-exit", type=float, default=None, help="exit after this many idle seconds")
+    sub.add_argument("--poll-interval", type=float, default=1.0)
+    sub.set_defaults(handler=_work)
+
+    sub = commands.add_parser("status", help="progress of a sharded job")
+    sub.add_argument("job_id")
+    sub.add_argument("--json", action="store_true")
+    sub.set_defaults(handler=_status)
+
+    sub = commands.add_parser("run", help="upload a file and run it sharded on local worker processes")
+    sub.add_argument("file")
+    sub.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    sub.add_argument("--verify", action="store_true", help="check the merge against an unsharded run")
+    analysis_options(sub)
+    sub.set_defaults(handler=_run)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        return args.handler(args)
+    except (LookupError, RuntimeError) as exc:
+        parser.error(str(exc))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
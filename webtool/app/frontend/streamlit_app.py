@@ -1,11 +1,32 @@
 import json
-import base64
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 import plotly.express as px
 import py3Dmol
 
 API_BASE = "http://127.0.0.1:8000"
+# Most variants the Scores tab plots one by one; above it the tab plots an evenly
+# spaced sample of this many next to server-side aggregates.
+PLOT_MAX_VARIANTS = int(os.environ.get("PLOT_MAX_VARIANTS", "2000"))
+FILTER_ALGORITHMS = ["SIFT", "PolyPhen-2", "PROVEAN", "MutationAssessor"]
+FILTER_ENSEMBLES = ["REVEL", "MetaLR"]
+# Backend score column averaging every score a variant has
+MEAN_SCORE = "mean_score"
+# Backend score column with REVEL, or the mean score where REVEL is missing
+LEVEL_SCORE = "level_score"
+VARIANT_PAGE_SIZE = 100
+# Minimum seconds between full-page refreshes with partial results
+ANALYSIS_RENDER_INTERVAL = 5.0
+# COSMIC search responses are reused across sessions for this many seconds
+COSMIC_CACHE_TTL = float(os.environ.get("COSMIC_UI_CACHE_TTL", "600"))
+COSMIC_CACHE_SIZE = int(os.environ.get("COSMIC_UI_CACHE_SIZE", "512"))
 
 st.set_page_config(page_title="Cancer Mutation Analysis", layout="wide")
 
@@ -65,10 +86,224 @@ st.markdown("""
 
 if "job_id" not in st.session_state:
 	st.session_state.job_id = None
-if "results" not in st.session_state:
-	st.session_state.results = None
+if "num_variants" not in st.session_state:
+	st.session_state.num_variants = 0
 if "analyses" not in st.session_state:
 	st.session_state.analyses = ["all"]
+if "analysis_pending" not in st.session_state:
+	st.session_state.analysis_pending = False
+if "analysis_ready" not in st.session_state:
+	st.session_state.analysis_ready = False
+if "analysis_processed" not in st.session_state:
+	st.session_state.analysis_processed = 0
+
+
+@st.cache_resource
+def _http() -> requests.Session:
+	"""One pooled HTTP session per Streamlit server, shared by all reruns and sessions."""
+	session = requests.Session()
+	retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+	adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+	return session
+
+
+class _SearchCache:
+	"""TTL + LRU cache of COSMIC search responses with hit/miss counters."""
+
+	def __init__(self, ttl: float, max_entries: int):
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is not None and time.monotonic() - entry[0] < self.ttl:
+				self._data.move_to_end(key)
+				self.hits += 1
+				return entry[1]
+			if entry is not None:
+				del self._data[key]
+			self.misses += 1
+			return None
+
+	def put(self, key, value) -> None:
+		with self._lock:
+			self._data[key] = (time.monotonic(), value)
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+			self.hits = self.misses = 0
+
+	def stats(self) -> dict:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._data),
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": self.hits / lookups if lookups else 0.0,
+			}
+
+
+@st.cache_resource
+def _cosmic_cache() -> _SearchCache:
+	"""Shared by all sessions, so one user's search warms it for everyone."""
+	return _SearchCache(COSMIC_CACHE_TTL, COSMIC_CACHE_SIZE)
+
+
+def _cosmic_search(payload: dict) -> dict:
+	"""POST ``payload`` to /cosmic/search, answering repeats from the cache.
+
+	Gene symbols are matched case-insensitively, as the backend does. Lookups
+	that come back with an error (e.g. unknown gene) are not cached.
+	"""
+	normalized = {name: value for name, value in payload.items() if value not in (None, "")}
+	if normalized.get("gene"):
+		normalized["gene"] = str(normalized["gene"]).upper()
+	if normalized.get("search_type") == "gene":
+		normalized["query"] = str(normalized.get("query", "")).upper()
+	key = json.dumps(normalized, sort_keys=True)
+
+	cache = _cosmic_cache()
+	data = cache.get(key)
+	if data is not None:
+		return data
+	resp = _http().post(f"{API_BASE}/cosmic/search", json=payload, timeout=30)
+	resp.raise_for_status()
+	data = resp.json()
+	results = data.get("results")
+	if not (isinstance(results, dict) and "error" in results):
+		cache.put(key, data)
+	return data
+
+
+def _start_analysis(uploaded_file) -> None:
+	"""Upload a file and queue its analysis on the backend; returns without waiting for it."""
+	files = {"file": (uploaded_file.name, uploaded_file.read(), uploaded_file.type or "application/octet-stream")}
+	resp = _http().post(f"{API_BASE}/upload", files=files, timeout=300)
+	resp.raise_for_status()
+	data = resp.json()
+	st.session_state.job_id = data["job_id"]
+	st.session_state.num_variants = data["num_variants"]
+	st.success(f"✅ Uploaded {data['num_variants']} variants")
+
+	req = {"analyses": st.session_state.get("analyses", ["all"]), "options": {}}
+	resp2 = _http().post(f"{API_BASE}/jobs/{st.session_state.job_id}/analyze", json=req, timeout=30)
+	resp2.raise_for_status()
+	st.session_state.analysis_ready = False
+	st.session_state.analysis_pending = True
+	st.session_state.analysis_processed = 0
+	st.session_state.analysis_rendered_at = 0.0
+	st.info("⏳ Analysis started; analyzed variants appear below as they are computed.")
+
+
+@st.fragment(run_every=1.0)
+def _analysis_progress() -> None:
+	"""Poll a running analysis and show its progress.
+
+	Runs as a fragment, so polling reruns only this block. Results stay on
+	the backend: the tabs query them, so the whole page is refreshed when
+	the analysis completes, and at most every ANALYSIS_RENDER_INTERVAL
+	seconds while it makes progress (for the Variants tab preview).
+	"""
+	if not st.session_state.analysis_pending:
+		return
+	try:
+		resp = _http().get(f"{API_BASE}/jobs/{st.session_state.job_id}/analysis", timeout=30)
+		resp.raise_for_status()
+		status = resp.json()
+	except Exception as e:  # noqa: BLE001
+		st.error(f"❌ Error: {str(e)}")
+		return
+	if status["state"] == "failed":
+		st.session_state.analysis_pending = False
+		st.error(f"❌ Analysis failed: {status['error']}")
+		return
+
+	total = status["total"] or 0
+	advanced = status["processed"] != st.session_state.analysis_processed
+	st.session_state.analysis_processed = status["processed"]
+	st.progress(
+		status["processed"] / total if total else 0.0,
+		text=f"Analyzing… {status['processed']:,} of {total:,} variants processed",
+	)
+	if status["state"] == "done":
+		st.session_state.analysis_pending = False
+		st.session_state.analysis_ready = True
+		st.session_state.num_variants = total
+		st.rerun()
+	elif advanced and time.monotonic() - st.session_state.analysis_rendered_at >= ANALYSIS_RENDER_INTERVAL:
+		st.session_state.analysis_rendered_at = time.monotonic()
+		st.rerun()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _job_post(job_id: str, analyses: tuple, endpoint: str, body: str) -> dict:
+	"""POST a JSON ``body`` to /jobs/{job_id}/{endpoint}.
+
+	Only called for finished analyses. A job's results depend only on its
+	file and ``analyses``, so responses are cached per job, analyses and body.
+	"""
+	resp = _http().post(
+		f"{API_BASE}/jobs/{job_id}/{endpoint}", data=body, headers={"Content-Type": "application/json"}, timeout=60,
+	)
+	resp.raise_for_status()
+	return resp.json()
+
+
+def _job_request(endpoint: str, query: dict) -> dict:
+	"""``query`` against the current job's results, through the response cache."""
+	return _job_post(st.session_state.job_id, tuple(st.session_state.analyses), endpoint, json.dumps(query, sort_keys=True))
+
+
+def _filter_query() -> dict:
+	"""The sidebar filters as a backend query."""
+	genes = [g.strip() for g in gene_filter.split(",") if g.strip()]
+	score_column = MEAN_SCORE if selected_algo_for_filter == "auto" else selected_algo_for_filter
+	return {
+		"genes": genes,
+		"ranges": {score_column: {"min": score_min, "max": score_max, "include_missing": True}},
+		"sort_by": score_column,
+		"descending": True,
+	}
+
+
+def _query_variants(offset: int, limit: int, **overrides) -> dict:
+	"""Filtered variants ``[offset, offset + limit)``, filtered and sorted by the backend."""
+	query = {**_filter_query(), "offset": offset, "limit": limit, **overrides}
+	return _job_request("query", query)
+
+
+def _page_input(total: int, key: str) -> int:
+	num_pages = max((total - 1) // VARIANT_PAGE_SIZE + 1, 1)
+	return int(st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1, key=key)) - 1
+
+
+def _aggregate_scores(bins: int = 50, top_genes: int = 30, sample: int = PLOT_MAX_VARIANTS) -> dict:
+	"""Histograms, gene x score means and an evenly spaced sample of the filtered variants, computed by the backend."""
+	query = {**_filter_query(), "bins": bins, "top_genes": top_genes, "sample": sample}
+	return _job_request("aggregate", query)
+
+
+def _analysis_page(offset: int, limit: int):
+	"""Variants analyzed so far in ``[offset, offset + limit)``, or None when the backend has none to show yet."""
+	resp = _http().get(
+		f"{API_BASE}/jobs/{st.session_state.job_id}/analysis",
+		params={"offset": offset, "limit": limit},
+		timeout=30,
+	)
+	resp.raise_for_status()
+	return resp.json().get("results")
 
 with st.sidebar:
 	st.markdown("### 🔧 Interactive Analysis")
@@ -130,16 +365,14 @@ with st.sidebar:
 						st.success(f"✅ Analyzing HGVSp: {hgvsp_input}")
 					elif chromosome and position and ref_allele and alt_allele:
 						# Coordinate-based search
-						resp = requests.post(f"{API_BASE}/cosmic/search", json={
+						coord_data = _cosmic_search({
 							"search_type": "coordinates",
 							"query": f"{chromosome}:{position}{ref_allele}>{alt_allele}",
 							"chromosome": chromosome,
 							"position": position,
 							"ref": ref_allele,
 							"alt": alt_allele
-						}, timeout=30)
-						resp.raise_for_status()
-						coord_data = resp.json()
+						})
 						
 						if coord_data.get("results"):
 							mutation_info = coord_data["results"][0]
@@ -156,12 +389,10 @@ with st.sidebar:
 							st.error("❌ No mutation found at these coordinates")
 					else:
 						# Gene-based search
-						resp = requests.post(f"{API_BASE}/cosmic/search", json={
+						gene_data = _cosmic_search({
 							"search_type": "gene",
 							"query": gene_input
-						}, timeout=30)
-						resp.raise_for_status()
-						gene_data = resp.json()
+						})
 						
 						if "error" not in gene_data["results"]:
 							gene_info = gene_data["results"]
@@ -267,29 +498,18 @@ with st.sidebar:
 		if st.button("🚀 Upload & Analyze", use_container_width=True, key="sidebar_analyze"):
 			with st.spinner("Processing..."):
 				try:
-					files = {"file": (uploaded_file.name, uploaded_file.read(), uploaded_file.type or "application/octet-stream")}
-					resp = requests.post(f"{API_BASE}/upload", files=files, timeout=60)
-					resp.raise_for_status()
-					data = resp.json()
-					st.session_state.job_id = data["job_id"]
-					st.success(f"✅ Uploaded {data['num_variants']} variants")
-					
-					with st.spinner("Running analysis..."):
-						req = {"job_id": st.session_state.job_id, "analyses": st.session_state.get("analyses", ["all"]), "options": {}}
-						resp2 = requests.post(f"{API_BASE}/analyze", json=req, timeout=120)
-						resp2.raise_for_status()
-						st.session_state.results = resp2.json()
-						st.success("✅ Analysis completed!")
+					_start_analysis(uploaded_file)
 				except Exception as e:  # noqa: BLE001
 					st.error(f"❌ Error: {str(e)}")
 	
 	st.markdown("#### 🔍 Filter Settings")
 	gene_filter = st.text_input("**Gene Filter**", value="", help="Comma-separated gene names (e.g., TP53,BRCA1)")
 	selected_algo_for_filter = st.selectbox("**Score Algorithm**", ["auto", "SIFT", "PolyPhen-2", "PROVEAN", "MutationAssessor", "REVEL", "MetaLR"], help="Algorithm for score filtering")
+	score_min, score_max = st.slider("**Score Range**", 0.0, 1.0, (0.0, 1.0), 0.01, help="Keep variants whose score for the selected algorithm falls in this range")
 	
 	# Calculate Button
 	if st.button("🧮 Calculate", use_container_width=True, type="primary"):
-		if st.session_state.results:
+		if st.session_state.analysis_ready:
 			st.success("✅ Calculation completed! Check the tabs below for results.")
 			# Force refresh of the filtered results
 			st.rerun()
@@ -314,12 +534,10 @@ with search_tab1:
     if gene_search_btn and gene_query:
         with st.spinner("Searching COSMIC..."):
             try:
-                resp = requests.post(f"{API_BASE}/cosmic/search", json={
+                data = _cosmic_search({
                     "search_type": "gene",
                     "query": gene_query
-                }, timeout=30)
-                resp.raise_for_status()
-                data = resp.json()
+                })
                 if "error" not in data["results"]:
                     gene_info = data["results"]
                     st.success(f"✅ Found gene: {gene_info.get('gene', 'Unknown')}")
@@ -350,13 +568,11 @@ with search_tab2:
     if mutation_search_btn and mutation_query:
         with st.spinner("Searching COSMIC..."):
             try:
-                resp = requests.post(f"{API_BASE}/cosmic/search", json={
+                data = _cosmic_search({
                     "search_type": "mutation",
                     "query": mutation_query,
                     "gene": mutation_gene
-                }, timeout=30)
-                resp.raise_for_status()
-                data = resp.json()
+                })
                 if "error" not in data["results"]:
                     mutations = data["results"].get("results", [])
                     if mutations:
@@ -394,16 +610,14 @@ with search_tab3:
     if coord_search_btn and all([coord_chr, coord_pos, coord_ref, coord_alt]):
         with st.spinner("Searching COSMIC..."):
             try:
-                resp = requests.post(f"{API_BASE}/cosmic/search", json={
+                data = _cosmic_search({
                     "search_type": "coordinates",
                     "query": f"{coord_chr}:{coord_pos}",
                     "chromosome": coord_chr,
                     "position": coord_pos,
                     "ref": coord_ref,
                     "alt": coord_alt
-                }, timeout=30)
-                resp.raise_for_status()
-                data = resp.json()
+                })
                 if "error" not in data["results"]:
                     mutations = data["results"].get("results", [])
                     if mutations:
@@ -435,12 +649,10 @@ with search_tab4:
     if cancer_search_btn and cancer_query:
         with st.spinner("Searching COSMIC..."):
             try:
-                resp = requests.post(f"{API_BASE}/cosmic/search", json={
+                data = _cosmic_search({
                     "search_type": "cancer_type",
                     "query": cancer_query
-                }, timeout=30)
-                resp.raise_for_status()
-                data = resp.json()
+                })
                 if "error" not in data["results"]:
                     cancers = data["results"].get("results", [])
                     if cancers:
@@ -486,53 +698,51 @@ with cc5:
 	calc_btn = st.button("Calculate", use_container_width=True)
 
 
-def _classify_level(score: float) -> str:
-	if score is None:
-		return "Unknown"
-	if score >= 0.8:
-		return "Destructive"
-	if score >= 0.5:
-		return "Moderate Destructive"
-	return "Little Destructive"
+# Bounds on LEVEL_SCORE per level: >= 0.8, [0.5, 0.8), < 0.5
+PATHO_LEVEL_RANGES = {
+	"Destructive": {"min": 0.8, "max": None},
+	"Moderate Destructive": {"min": 0.5, "max": 0.8, "max_exclusive": True},
+	"Little Destructive": {"min": None, "max": 0.5, "max_exclusive": True},
+}
 
 if calc_btn:
-	if not st.session_state.results:
+	if not st.session_state.analysis_ready:
 		st.warning("Run analysis first to calculate.")
+		st.session_state.pop("clinical_query", None)
 	else:
-		res = st.session_state.results
-		scores = res.get("scores", {})
-		ensemble = res.get("ensemble", {})
-		annotations = res.get("annotations", {})
-
-		rows = []
-		for key, entry in scores.items():
-			# Filter by cancer type (from annotations via COSMIC cancer_types)
-			ann = annotations.get(key, {}).get("COSMIC", {})
-			cancers = ann.get("cancer_types", [])
-			if cancer_type_sel and cancers and (cancer_type_sel not in cancers):
-				continue
-			# Filter by gene id
-			if gene_id_input:
-				if gene_id_input.upper() not in key.upper():
-					continue
-			# Filter by mutation location string match (key contains chrom:posref>alt)
-			if mutation_loc_input:
-				if mutation_loc_input not in key and mutation_loc_input not in json.dumps(annotations.get(key, {})):
-					continue
-			# Use ensemble REVEL if available for classification fallback
-			ev = ensemble.get(key, {}).get("REVEL")
-			label = _classify_level(ev if ev is not None else (sum(entry.values())/len(entry) if entry else 0))
-			if label != patho_level:
-				continue
-			row = {"variant": key, "level": label, "REVEL": ev}
-			row.update(entry)
-			rows.append(row)
+		# Every criterion is applied by the backend; variants COSMIC lists no cancer types for are kept
+		st.session_state.clinical_query = {
+			"genes": [gene_id_input.strip()] if gene_id_input.strip() else [],
+			"cancer_types": [cancer_type_sel],
+			"cancer_types_include_missing": True,
+			"contains": mutation_loc_input.strip() or None,
+			"ranges": {LEVEL_SCORE: PATHO_LEVEL_RANGES[patho_level]},
+			"sort_by": LEVEL_SCORE,
+			"descending": True,
+			"level": patho_level,
+		}
 
-		if rows:
-			st.success(f"Found {len(rows)} variant(s) matching criteria")
+# Kept across reruns, so paging through the matches does not need another Calculate
+clinical_query = st.session_state.get("clinical_query") if st.session_state.analysis_ready else None
+if clinical_query:
+	query = {k: v for k, v in clinical_query.items() if k != "level"}
+	try:
+		total = _job_request("query", {**query, "offset": 0, "limit": 1, "columns": ["variant"]})["total"]
+		if total:
+			st.success(f"Found {total:,} variant(s) matching criteria")
+			page = _page_input(total, "clinical_page")
+			data = _job_request("query", {**query, "offset": page * VARIANT_PAGE_SIZE, "limit": VARIANT_PAGE_SIZE})
+			rows = []
+			for item in data["rows"]:
+				row = {"variant": item["variant"], "gene": item["gene"], "level": clinical_query["level"], "REVEL": item.get("REVEL")}
+				row.update({algo: item[algo] for algo in FILTER_ALGORITHMS if algo in item})
+				row["cancer_types"] = item["cancer_types"]
+				rows.append(row)
 			st.dataframe(rows, use_container_width=True, hide_index=True)
 		else:
 			st.warning("No variants matched the selected criteria.")
+	except Exception as e:  # noqa: BLE001
+		st.error(f"❌ Error: {str(e)}")
 
 st.markdown("---")
 
@@ -550,64 +760,51 @@ with col_actions:
 		if st.button("🚀 Upload & Analyze", use_container_width=True, type="primary"):
 			with st.spinner("Processing file..."):
 				try:
-					files = {"file": (uploaded.name, uploaded.read(), uploaded.type or "application/octet-stream")}
-					resp = requests.post(f"{API_BASE}/upload", files=files, timeout=60)
-					resp.raise_for_status()
-					data = resp.json()
-					st.session_state.job_id = data["job_id"]
-					st.success(f"✅ Uploaded {data['num_variants']} variants")
-					
-					with st.spinner("Running analysis..."):
-						req = {"job_id": st.session_state.job_id, "analyses": st.session_state.get("analyses", ["all"]), "options": {}}
-						resp2 = requests.post(f"{API_BASE}/analyze", json=req, timeout=120)
-						resp2.raise_for_status()
-						st.session_state.results = resp2.json()
-						st.success("✅ Analysis completed!")
+					_start_analysis(uploaded)
 				except Exception as e:  # noqa: BLE001
 					st.error(f"❌ Error: {str(e)}")
 
 
-def _filtered_results(results):
-	if not results:
-		return None
-	genes = [g.strip().upper() for g in gene_filter.split(",") if g.strip()]
-	# Build variant meta map from results.variants (list of dicts) to keys used in scores
-	variant_list = results.get("variants", [])
-	key_to_gene = {}
-	for idx, v in enumerate(variant_list):
-		key = f"{v.get('chrom','chr?')}:{v.get('pos','?')}{v.get('ref','?')}>{v.get('alt','?')}#{idx}"
-		key_to_gene[key] = (v.get("gene") or "").upper()
-	# Apply filters on scores or ensemble
-	scores = results.get("scores", {})
-	ensemble = results.get("ensemble", {})
-	def pass_score(k: str, entry: dict) -> bool:
-		algo = selected_algo_for_filter
-		val = None
-		if algo in {"REVEL", "MetaLR"}:
-			val = ensemble.get(k, {}).get(algo)
-		elif algo == "auto":
-			vals = list(entry.values()) + list(ensemble.get(k, {}).values())
-			val = sum(vals) / len(vals) if vals else None
-		else:
-			val = entry.get(algo)
-		if val is None:
-			return True
-		return (val >= score_min) and (val <= score_max)
-
-	filtered_keys = []
-	for k, entry in scores.items():
-		if genes and key_to_gene.get(k, "") not in genes:
-			continue
-		if not pass_score(k, entry):
-			continue
-		filtered_keys.append(k)
+_analysis_progress()
 
-	return {
-		"scores": {k: scores[k] for k in filtered_keys},
-		"ensemble": {k: ensemble.get(k, {}) for k in filtered_keys},
-		"annotations": {k: results.get("annotations", {}).get(k, {}) for k in filtered_keys},
-		"variants": [v for idx, v in enumerate(variant_list) if f"{v.get('chrom','chr?')}:{v.get('pos','?')}{v.get('ref','?')}>{v.get('alt','?')}#{idx}" in filtered_keys],
-	}
+
+ANNOTATION_COLUMNS = [
+	"variant", "gene", "protein_change", "cosmic_match", "cosmic_id", "clinical_significance",
+	"mycancergenome_evidence", "actionable", "num_therapies",
+]
+
+
+def _render_dashboard() -> None:
+	"""Counts and the top-scoring variants of the filtered results, from /query."""
+	# Scored variants are the matches that have a mean score
+	scored_query = _filter_query()
+	bounds = scored_query["ranges"].get(MEAN_SCORE, {})
+	scored_query["ranges"][MEAN_SCORE] = {**bounds, "include_missing": False}
+	top = _query_variants(0, 5, sort_by=MEAN_SCORE, descending=True, columns=["variant", MEAN_SCORE])
+	num_scored = _query_variants(0, 1, ranges=scored_query["ranges"], columns=["variant"])["total"]
+	num_vars = top["total"]
+
+	col1, col2, col3, col4 = st.columns(4)
+	with col1:
+		st.metric("📊 Total Variants", st.session_state.num_variants)
+	with col2:
+		st.metric("🔍 Filtered Variants", num_vars)
+	with col3:
+		algo_count = len([a for a in st.session_state.get("analyses", ["all"]) if a != "all"]) or 4
+		st.metric("⚙️ Algorithms", algo_count)
+	with col4:
+		st.metric("📈 Scored Variants", num_scored)
+
+	if num_vars > 0:
+		st.markdown("### 🎯 Quick Insights")
+		# Show top scoring variants
+		scores_data = [row for row in top["rows"] if row[MEAN_SCORE] is not None]
+		if scores_data:
+			st.markdown("**Top 5 Highest Scoring Variants:**")
+			for i, item in enumerate(scores_data, 1):
+				st.write(f"{i}. {item['variant']}: {item[MEAN_SCORE]:.3f}")
+	else:
+		st.warning("No variants match the current filters. Adjust filters in the sidebar.")
 
 
 tab_dashboard, tab_variants, tab_scores, tab_ann, tab_struct, tab_report = st.tabs([
@@ -616,196 +813,307 @@ tab_dashboard, tab_variants, tab_scores, tab_ann, tab_struct, tab_report = st.ta
 
 with tab_dashboard:
 	st.markdown("### 📊 Analysis Overview")
-	if st.session_state.results:
-		res = _filtered_results(st.session_state.results)
-		num_vars = len(res.get("variants", []))
-		total_vars = len(st.session_state.results.get("variants", []))
-		
-		col1, col2, col3, col4 = st.columns(4)
-		with col1:
-			st.metric("📊 Total Variants", total_vars)
-		with col2:
-			st.metric("🔍 Filtered Variants", num_vars)
-		with col3:
-			algo_count = len([a for a in st.session_state.get("analyses", ["all"]) if a != "all"]) or 4
-			st.metric("⚙️ Algorithms", algo_count)
-		with col4:
-			score_count = len(res.get("scores", {}))
-			st.metric("📈 Scored Variants", score_count)
-		
-		if num_vars > 0:
-			st.markdown("### 🎯 Quick Insights")
-			# Show top scoring variants
-			scores_data = []
-			for key, entry in res.get("scores", {}).items():
-				avg_score = sum(entry.values()) / len(entry) if entry else 0
-				scores_data.append({"variant": key, "avg_score": avg_score})
-			
-			if scores_data:
-				scores_data.sort(key=lambda x: x["avg_score"], reverse=True)
-				st.markdown("**Top 5 Highest Scoring Variants:**")
-				for i, item in enumerate(scores_data[:5], 1):
-					st.write(f"{i}. {item['variant']}: {item['avg_score']:.3f}")
-		else:
-			st.warning("No variants match the current filters. Adjust filters in the sidebar.")
+	if st.session_state.analysis_ready:
+		try:
+			_render_dashboard()
+		except Exception as e:  # noqa: BLE001
+			st.error(f"❌ Error: {str(e)}")
+	elif st.session_state.analysis_pending:
+		st.info("⏳ The dashboard appears when the analysis completes.")
 	else:
 		st.info("📁 Upload a variant file and run analysis to see the dashboard.")
 
+
+def _render_score_aggregates(agg: dict) -> None:
+	"""Histogram lines per score and the gene heatmap, from /aggregate output."""
+	edges = agg["edges"]
+	centers = [(lo + hi) / 2 for lo, hi in zip(edges, edges[1:])]
+	ensembles = set(FILTER_ENSEMBLES)
+	for title, names in (
+		("#### 🔬 Score Distributions by Algorithm", [n for n in agg["histograms"] if n not in ensembles]),
+		("#### 🎯 Ensemble Score Distributions", [n for n in agg["histograms"] if n in ensembles]),
+	):
+		st.markdown(title)
+		rows = [
+			{"score": center, "variants": count, "algorithm": name}
+			for name in names
+			for center, count in zip(centers, agg["histograms"][name]["counts"])
+		]
+		if rows:
+			fig = px.line(rows, x="score", y="variants", color="algorithm", line_shape="hvh")
+			st.plotly_chart(fig, use_container_width=True)
+		else:
+			st.warning("⚠️ No scores available.")
+
+	heat = agg["heatmap"]
+	if heat["genes"]:
+		st.markdown(f"#### 🧬 Mean Score by Gene (top {len(heat['genes'])} genes)")
+		fig = px.imshow(
+			[list(col) for col in zip(*heat["mean"])],
+			x=heat["columns"], y=heat["genes"], zmin=0, zmax=1,
+			color_continuous_scale=["#2ecc71", "#f39c12", "#e74c3c"], aspect="auto",
+		)
+		fig.update_layout(height=max(300, 20 * len(heat["genes"])))
+		st.plotly_chart(fig, use_container_width=True)
+
+
+def _render_score_points(agg: dict) -> None:
+	"""Per-variant scores as WebGL scatters: every filtered variant, or the evenly spaced sample of a large job."""
+	sample = agg["sample"]
+	ensembles = set(FILTER_ENSEMBLES)
+	names = list(agg["histograms"])
+	step = sample["step"]
+	for title, label, group in (
+		("#### 🔬 Individual Algorithm Scores", "algorithm", [n for n in names if n not in ensembles]),
+		("#### 🎯 Ensemble Scores", "ensemble", [n for n in names if n in ensembles]),
+	):
+		st.markdown(title if step == 1 else f"{title} (every {step:,}th variant)")
+		rows = [
+			{"variant": v["variant"], label: name, "score": v[name]}
+			for v in sample["rows"] for name in group if v[name] is not None
+		]
+		if rows:
+			# WebGL keeps thousands of points responsive; variant labels only fit for small sets
+			fig = px.scatter(rows, x="variant", y="score", color=label, render_mode="webgl", opacity=0.7)
+			fig.update_xaxes(showticklabels=len(sample["rows"]) <= 50)
+			fig.update_layout(height=400)
+			st.plotly_chart(fig, use_container_width=True)
+		else:
+			st.warning(f"⚠️ No {label} scores available.")
+
+
 with tab_variants:
 	st.markdown("### 🧬 Variant Data")
-	if st.session_state.results:
-		res = _filtered_results(st.session_state.results)
-		if res.get("variants"):
-			st.dataframe(res["variants"], use_container_width=True, hide_index=True)
-			st.caption(f"Showing {len(res['variants'])} variants after filtering")
+	if st.session_state.analysis_ready:
+		try:
+			num_matches = _query_variants(0, 1, columns=["variant"])["total"]
+			if num_matches:
+				page = _page_input(num_matches, "variant_page")
+				data = _query_variants(page * VARIANT_PAGE_SIZE, VARIANT_PAGE_SIZE)
+				st.dataframe(data["rows"], use_container_width=True, hide_index=True)
+				st.caption(f"Showing {len(data['rows'])} of {data['total']} variants after filtering, highest score first")
+			else:
+				st.warning("⚠️ No variants match the current filters.")
+		except Exception as e:  # noqa: BLE001
+			st.error(f"❌ Error: {str(e)}")
+	elif st.session_state.analysis_pending:
+		# Results are not indexed yet; page through what has been analyzed, unfiltered
+		processed = st.session_state.analysis_processed
+		if processed:
+			page = _page_input(processed, "pending_variant_page")
+			try:
+				partial = _analysis_page(page * VARIANT_PAGE_SIZE, VARIANT_PAGE_SIZE)
+			except Exception as e:  # noqa: BLE001
+				st.error(f"❌ Error: {str(e)}")
+				partial = None
+			if partial is not None:
+				st.dataframe(partial["variants"], use_container_width=True, hide_index=True)
+				st.caption(f"Showing {len(partial['variants'])} of {processed:,} variants analyzed so far; filters apply when the analysis completes")
+			else:
+				st.info("⏳ Variants appear when the analysis completes.")
 		else:
-			st.warning("⚠️ No variants match the current filters.")
+			st.info("⏳ Variants appear as they are analyzed.")
 	else:
 		st.info("📁 Upload a variant file to see data here.")
 
 with tab_scores:
 	st.markdown("### 📈 Pathogenicity Scores")
-	if st.session_state.results:
-		res = _filtered_results(st.session_state.results)
-		
-		# Individual algorithm scores
-		st.markdown("#### 🔬 Individual Algorithm Scores")
-		rows = []
-		for key, entry in res.get("scores", {}).items():
-			for algo, val in entry.items():
-				rows.append({"variant": key, "algorithm": algo, "score": val})
-		
-		if rows:
-			# Color scale: green (benign) to red (deleterious)
-			fig = px.bar(rows, x="variant", y="score", color="score", 
-						color_continuous_scale=["#2ecc71", "#f39c12", "#e74c3c"],
-						facet_row="algorithm", title="Pathogenicity Scores by Algorithm")
-			fig.update_layout(height=400 * len(set(r["algorithm"] for r in rows)))
-			st.plotly_chart(fig, use_container_width=True)
-		else:
-			st.warning("⚠️ No individual algorithm scores available.")
-
-		# Ensemble scores
-		st.markdown("#### 🎯 Ensemble Scores")
-		rows2 = []
-		for key, entry in res.get("ensemble", {}).items():
-			for algo, val in entry.items():
-				rows2.append({"variant": key, "ensemble": algo, "score": val})
-		
-		if rows2:
-			fig2 = px.bar(rows2, x="variant", y="score", color="score", 
-						color_continuous_scale=["#2ecc71", "#f39c12", "#e74c3c"],
-						facet_row="ensemble", title="Ensemble Pathogenicity Scores")
-			fig2.update_layout(height=400 * len(set(r["ensemble"] for r in rows2)))
-			st.plotly_chart(fig2, use_container_width=True)
-		else:
-			st.warning("⚠️ No ensemble scores available.")
+	if st.session_state.analysis_ready:
+		try:
+			agg = _aggregate_scores()
+			if agg["total"] > PLOT_MAX_VARIANTS:
+				st.info(f"{agg['total']:,} variants: showing distributions and a {len(agg['sample']['rows']):,}-variant sample.")
+				_render_score_aggregates(agg)
+			_render_score_points(agg)
+		except Exception as e:  # noqa: BLE001
+			st.error(f"❌ Error: {str(e)}")
+	elif st.session_state.analysis_pending:
+		st.info("⏳ Scores appear when the analysis completes.")
 	else:
 		st.info("📁 Upload a variant file to see scores here.")
 
 with tab_ann:
 	st.markdown("### 📋 Database Annotations")
-	if st.session_state.results:
-		res = _filtered_results(st.session_state.results)
-		ann = res.get("annotations", {})
-		if ann:
-			ann_rows = []
-			for k, v in ann.items():
-				ann_rows.append({
-					"Variant": k,
-					"COSMIC Match": "✅" if v.get("COSMIC", {}).get("match") else "❌",
-					"ClinVar Significance": v.get("ClinVar", {}).get("clinical_significance", "Unknown"),
-					"MyCancerGenome Evidence": v.get("MyCancerGenome", {}).get("evidence", "None"),
-				})
-			st.dataframe(ann_rows, use_container_width=True, hide_index=True)
-			st.caption("Database annotations for filtered variants")
-		else:
-			st.warning("⚠️ No database annotations available.")
+	if st.session_state.analysis_ready:
+		try:
+			num_matches = _query_variants(0, 1, columns=["variant"])["total"]
+			if num_matches:
+				page = _page_input(num_matches, "annotation_page")
+				data = _query_variants(page * VARIANT_PAGE_SIZE, VARIANT_PAGE_SIZE, columns=ANNOTATION_COLUMNS)
+				ann_rows = []
+				for v in data["rows"]:
+					ann_rows.append({
+						"Variant": f"{v['gene']}:{v['protein_change']}",
+						"COSMIC Match": "✅" if v["cosmic_match"] else "❌",
+						"COSMIC ID": v["cosmic_id"],
+						"ClinVar Significance": v["clinical_significance"] or "Unknown",
+						"MyCancerGenome Evidence": v["mycancergenome_evidence"] or "None",
+						"Actionable": "✅" if v["actionable"] else "❌",
+						"Therapies": v["num_therapies"],
+					})
+				st.dataframe(ann_rows, use_container_width=True, hide_index=True)
+				st.caption(f"Database annotations for {len(ann_rows)} of {data['total']} filtered variants")
+			else:
+				st.warning("⚠️ No variants match the current filters.")
+		except Exception as e:  # noqa: BLE001
+			st.error(f"❌ Error: {str(e)}")
+	elif st.session_state.analysis_pending:
+		st.info("⏳ Annotations appear when the analysis completes.")
 	else:
 		st.info("📁 Upload a variant file to see annotations here.")
 
+STRUCTURE_VIEW_HEIGHT = 600
+_AA3 = {
+	"A": "ALA", "R": "ARG", "N": "ASN", "D": "ASP", "C": "CYS", "Q": "GLN", "E": "GLU", "G": "GLY", "H": "HIS", "I": "ILE",
+	"L": "LEU", "K": "LYS", "M": "MET", "F": "PHE", "P": "PRO", "S": "SER", "T": "THR", "W": "TRP", "Y": "TYR", "V": "VAL",
+}
+_PROTEIN_CHANGE_RE = re.compile(r"^p\.\(?([A-Z][a-z]{2}|[A-Z])(\d+)")
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _structure_file(pdb_id: str) -> str:
+	"""mmCIF text from the backend's structure cache (no browser download from RCSB)."""
+	resp = _http().get(f"{API_BASE}/structures/{pdb_id}.cif", timeout=120)
+	resp.raise_for_status()
+	return resp.text
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _structure_residues(pdb_id: str) -> dict:
+	"""The structure's full UniProt position -> residue index, looked up locally per variant."""
+	resp = _http().get(f"{API_BASE}/structures/{pdb_id}/residues", timeout=120)
+	resp.raise_for_status()
+	return resp.json()
+
+
+def _variant_residues(index: dict, variant: dict) -> tuple:
+	"""Residues of the structure at a variant's protein position, and the reference amino acid."""
+	match = _PROTEIN_CHANGE_RE.match(variant.get("protein_change") or "")
+	if not match:
+		return [], None
+	ref, position = match.groups()
+	accessions = index["genes"].get((variant.get("gene") or "").upper(), [])
+	residues = [res for acc in accessions for res in index["uniprot"].get(acc, {}).get(position, [])]
+	return residues, _AA3.get(ref, ref.upper())
+
+
+def _render_structure(pdb_id: str, residues=()) -> None:
+	view = py3Dmol.view(height=STRUCTURE_VIEW_HEIGHT)
+	view.addModel(_structure_file(pdb_id), "cif")
+	view.setStyle({"cartoon": {"color": "spectrum"}})
+	view.addSurface(py3Dmol.VDW, {"opacity": 0.3})
+	for chain, resi, _, _ in residues:
+		selection = {"chain": chain, "resi": resi}
+		view.addStyle(selection, {"stick": {"colorscheme": "redCarbon", "radius": 0.3}})
+		view.addResLabels(selection, {"fontSize": 12})
+	if residues:
+		view.zoomTo({"or": [{"chain": c, "resi": r} for c, r, _, _ in residues]})
+	else:
+		view.zoomTo()
+	st.components.v1.html(view._make_html(), height=STRUCTURE_VIEW_HEIGHT)
+
+
 with tab_struct:
 	st.markdown("### 🔬 3D Protein Structure Viewer")
+	if "structure_id" not in st.session_state:
+		st.session_state.structure_id = None
 	
 	col1, col2 = st.columns([2, 1])
 	with col1:
 		pdb_id = st.text_input("**PDB ID**", value="1CRN", help="Enter a PDB ID (e.g., 1CRN, 1TUP)")
 	with col2:
 		load_btn = st.button("🔍 Load Structure", use_container_width=True)
-	
 	if load_btn and pdb_id:
+		st.session_state.structure_id = pdb_id.strip().upper()
+	
+	st.markdown("#### 📚 Popular Cancer-Related Structures")
+	popular_pdbs = ["1TUP", "1CRN", "2J4M", "3KMD", "4HJO"]
+	for col, pdb in zip(st.columns(len(popular_pdbs)), popular_pdbs):
+		if col.button(f"Load {pdb}", key=f"pdb_{pdb}"):
+			st.session_state.structure_id = pdb
+	
+	structure_id = st.session_state.structure_id
+	if structure_id:
 		try:
 			with st.spinner("Loading 3D structure..."):
-				view = py3Dmol.view(query=f"pdb:{pdb_id}")
-				view.setStyle({"cartoon": {"color": "spectrum"}})
-				view.addSurface(py3Dmol.VDW, {"opacity": 0.3})
-				view.zoomTo()
-				view.show()
-				st.components.v1.html(view._make_html(), height=600)
-				st.success(f"✅ Loaded structure: {pdb_id}")
+				residues = []
+				if st.session_state.analysis_ready:
+					index = _structure_residues(structure_id)
+					# Ask the backend for filtered variants in the modelled genes only
+					modelled = set(index["genes"])
+					wanted = {g.upper() for g in _filter_query()["genes"]}
+					genes = sorted(modelled & wanted if wanted else modelled)
+					choices = []
+					if genes:
+						rows = _query_variants(0, 500, genes=genes, columns=["gene", "protein_change"])["rows"]
+						choices = [v for v in rows if v.get("protein_change")]
+					if choices:
+						choice = st.selectbox(
+							"**Highlight Variant**", [None] + list(range(len(choices))),
+							format_func=lambda i: "None" if i is None else f"{choices[i].get('gene')} {choices[i].get('protein_change')}",
+						)
+						if choice is not None:
+							variant = choices[choice]
+							residues, ref = _variant_residues(index, variant)
+							if not residues:
+								st.warning(f"⚠️ {variant.get('protein_change')} is outside the residues modelled in {structure_id}.")
+							for chain, resi, icode, resname in residues:
+								note = "" if resname == ref else f" (structure has {resname})"
+								st.caption(f"Chain {chain}, residue {resi}{icode}{note}")
+					else:
+						st.caption(f"No filtered variants fall in genes modelled by {structure_id}.")
+				_render_structure(structure_id, residues)
+				st.success(f"✅ Loaded structure: {structure_id}")
 		except Exception as e:  # noqa: BLE001
 			st.error(f"❌ Error loading structure: {str(e)}")
-			st.info("💡 Try a different PDB ID or check your internet connection.")
-	
-	st.markdown("#### 📚 Popular Cancer-Related Structures")
-	popular_pdbs = ["1TUP", "1CRN", "2J4M", "3KMD", "4HJO"]
-	for pdb in popular_pdbs:
-		if st.button(f"Load {pdb}", key=f"pdb_{pdb}"):
-			try:
-				view = py3Dmol.view(query=f"pdb:{pdb}")
-				view.setStyle({"cartoon": {"color": "spectrum"}})
-				view.addSurface(py3Dmol.VDW, {"opacity": 0.3})
-				view.zoomTo()
-				view.show()
-				st.components.v1.html(view._make_html(), height=600)
-			except Exception as e:  # noqa: BLE001
-				st.error(f"Error loading {pdb}: {str(e)}")
+			st.info("💡 Check the PDB ID; in offline mode only structures in the server's cache are available.")
 
 with tab_report:
 	st.markdown("### 📄 Report Generation")
 	
-	if st.session_state.results and st.session_state.job_id:
+	if st.session_state.analysis_ready and st.session_state.job_id:
 		st.markdown("#### 📊 Report Options")
 		col1, col2 = st.columns(2)
 		with col1:
 			st.info(f"**Current Format:** {report_format.upper()}")
 			st.info(f"**Job ID:** {st.session_state.job_id}")
 		with col2:
-			st.info(f"**Variants:** {len(st.session_state.results.get('variants', []))}")
+			st.info(f"**Variants:** {st.session_state.num_variants}")
 			algs = st.session_state.get('analyses', ['all'])
 			st.info(f"**Algorithms:** {len(algs) if algs != ['all'] else 4}")
 		
 		if st.button("🚀 Generate Report", type="primary", use_container_width=True):
 			with st.spinner("Generating report..."):
 				try:
-					payload = {"job_id": st.session_state.job_id, "format": report_format}
-					resp3 = requests.post(f"{API_BASE}/report", json=payload, timeout=120)
+					job_id = st.session_state.job_id
+					if report_format == "html":
+						payload = {"job_id": job_id, "format": report_format}
+						resp3 = _http().post(f"{API_BASE}/report", json=payload, timeout=120)
+					else:
+						resp3 = _http().get(f"{API_BASE}/jobs/{job_id}/report.{report_format}", timeout=120)
 					resp3.raise_for_status()
-					data = resp3.json()
 					
 					if report_format == "html":
 						st.download_button(
 							label="📄 Download HTML Report",
-							data=data["html"],
-							file_name=f"cancer_mutation_report_{st.session_state.job_id[:8]}.html",
+							data=resp3.content,
+							file_name=f"cancer_mutation_report_{job_id[:8]}.html",
 							mime="text/html",
 							use_container_width=True
 						)
 					elif report_format == "pdf":
-						pdf_b64 = data["pdf_base64"].encode("utf-8")
 						st.download_button(
 							label="📄 Download PDF Report",
-							data=base64.b64decode(pdf_b64),
-							file_name=f"cancer_mutation_report_{st.session_state.job_id[:8]}.pdf",
-							mime="application/pdf",
+							data=resp3.content,
+							file_name=f"cancer_mutation_report_{job_id[:8]}.pdf",
+							mime=resp3.headers.get("content-type", "application/pdf"),
 							use_container_width=True
 						)
 					else:
-						xlsx_b64 = data["excel_base64"].encode("utf-8")
 						st.download_button(
 							label="📊 Download Excel Report",
-							data=base64.b64decode(xlsx_b64),
-							file_name=f"cancer_mutation_report_{st.session_state.job_id[:8]}.xlsx",
+							data=resp3.content,
+							file_name=f"cancer_mutation_report_{job_id[:8]}.xlsx",
 							mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
 							use_container_width=True
 						)
@@ -823,3 +1131,17 @@ with tab_report:
 		- **Clinical Insights**: Actionable mutations and therapy options
 		- **Visualizations**: Charts and graphs (HTML/PDF only)
 		""")
+
+# Rendered last so the counters include this run's searches
+with st.sidebar:
+	with st.expander("🐞 Debug: COSMIC search cache"):
+		stats = _cosmic_cache().stats()
+		col1, col2 = st.columns(2)
+		col1.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+		col2.metric("Entries", stats["entries"])
+		col1.metric("Hits", stats["hits"])
+		col2.metric("Misses", stats["misses"])
+		st.caption(f"TTL {COSMIC_CACHE_TTL:g}s, up to {COSMIC_CACHE_SIZE} entries, shared by all sessions")
+		if st.button("Clear cache", key="clear_cosmic_cache"):
+			_cosmic_cache().clear()
+			st.rerun()
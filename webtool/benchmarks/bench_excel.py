@@ -0,0 +1,50 @@
+"""Excel export benchmark: time, peak RSS and file size at cohort scale.
+
+Results are generated page by page and fed to ``write_excel_report`` the same
+way ``/jobs/{id}/report.xlsx`` feeds it from the store, so peak RSS should stay
+flat as ``--rows`` grows. Above 1,048,575 rows the sheets split.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.bench_excel --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+from app.backend.services.reports import EXCEL_MAX_ROWS, write_excel_report
+
+from .synthetic import synthetic_pages
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--max-rows", type=int, default=EXCEL_MAX_ROWS, help="rows per sheet before splitting")
+    args = parser.parse_args()
+
+    rss_before = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.xlsx")
+        t0 = time.perf_counter()
+        write_excel_report(synthetic_pages(args.rows, args.page_size), path, max_rows=args.max_rows)
+        elapsed = time.perf_counter() - t0
+        size = os.path.getsize(path)
+
+    print(f"Excel export of {args.rows:,} variants (5 sheets, page size {args.page_size:,})")
+    print(f"  time        {elapsed:10.1f} s  ({args.rows / elapsed:,.0f} variants/s)")
+    print(f"  file size   {size / 1e6:10.1f} MB")
+    print(f"  peak RSS    {peak_rss_mb():10.1f} MB  (before: {rss_before:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Full-pipeline benchmark on synthetic cohorts, with a regression check.
+
+Times each stage a job goes through (CSV parsing, scoring, ensemble,
+annotation against the bundled mock COSMIC client, ``LocalJSONStore``
+save/load and the HTML, Excel and PDF reports) and records throughput and
+peak RSS per stage and cohort size. Results are compared with a JSON
+baseline; the run fails (exit status 1) when a stage's throughput drops, or
+its peak RSS grows, by more than ``--threshold``.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.bench_pipeline --sizes 10000,100000 --save-baseline
+    python -m benchmarks.bench_pipeline --sizes 10000,100000
+
+Baselines are machine specific: record one on the machine that checks it.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from app.backend.services import reports
+from app.backend.services.annotate import annotate_with_databases, clinical_actionability
+from app.backend.services.cosmic_client import COSMICCache, get_cosmic_client
+from app.backend.services.parsers import parse_variant_file
+from app.backend.services.scoring import run_ensemble_scores, run_scoring_algorithms
+from app.backend.services.storage import LocalJSONStore
+
+from .synthetic import synthetic_csv
+
+STAGES = (
+    "parse", "scoring", "ensemble", "annotate", "store_save", "store_load",
+    "report_html", "report_excel", "report_pdf",
+)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# RSS changes smaller than this are noise, whatever the threshold
+RSS_NOISE_MB = 16.0
+MIN_STAGE_SECONDS = 1.0
+MAX_RUNS = 25
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE / 1e6
+    except OSError:
+        # No procfs: the process high-water mark is the best we have
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PeakRSS:
+    """Highest resident set size seen while the block runs, sampled every few ms."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakRSS":
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> tuple[Dict[str, float], Any]:
+    """Best wall time and peak RSS of ``fn`` over ``repeat`` runs, plus its last result.
+
+    Stages that finish quickly run again, up to ``MAX_RUNS`` times, until
+    ``MIN_STAGE_SECONDS`` have been spent, so their best time is stable
+    enough to compare against a baseline.
+    """
+    best_s, best_rss, out = float("inf"), float("inf"), None
+    runs, total = 0, 0.0
+    while runs < repeat or (total < MIN_STAGE_SECONDS and runs < MAX_RUNS):
+        out = None
+        gc.collect()
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            out = fn()
+            elapsed = time.perf_counter() - t0
+        best_s, best_rss = min(best_s, elapsed), min(best_rss, rss.peak_mb)
+        runs, total = runs + 1, total + elapsed
+    return {"seconds": best_s, "peak_rss_mb": best_rss, "runs": runs}, out
+
+
+def _annotate(variants: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Cold cache every run, so repeats measure the same work
+    get_cosmic_client().cache = COSMICCache()
+    return annotate_with_databases(variants)
+
+
+def run_cohort(n: int, stages: List[str], repeat: int, workdir: str, pdf_max_rows: int) -> Dict[str, Dict[str, Any]]:
+    content = synthetic_csv(n)
+    store = LocalJSONStore(os.path.join(workdir, f"store-{n}"))
+    key = f"bench-{n}"
+    results: Dict[str, Dict[str, Any]] = {}
+    data: Dict[str, Any] = {}
+
+    def save() -> None:
+        store.save(key, {"filename": "cohort.csv", "variants": variants})
+        store.save_results(key, {"variants": variants, **data})
+
+    def html() -> int:
+        return sum(len(chunk) for chunk in reports.stream_html_report(store.iter_results(key), n))
+
+    def excel() -> int:
+        path = os.path.join(workdir, f"report-{n}.xlsx")
+        reports.write_excel_report(store.iter_results(key), path)
+        return os.path.getsize(path)
+
+    def pdf() -> int:
+        path = os.path.join(workdir, f"report-{n}.pdf")
+        reports.write_pdf_report(store.iter_results(key), path, n)
+        return os.path.getsize(path)
+
+    # Later stages need the earlier stages' output, so those always run
+    wanted = set(stages)
+    steps = [
+        ("parse", lambda: parse_variant_file("cohort.csv", content)),
+        ("scoring", lambda: run_scoring_algorithms(variants, ["all"], {})),
+        ("ensemble", lambda: run_ensemble_scores(data["scores"])),
+        ("annotate", lambda: _annotate(variants)),
+        ("store_save", save),
+        ("store_load", lambda: store.load_results(key)),
+        ("report_html", html),
+        ("report_excel", excel),
+        ("report_pdf", pdf),
+    ]
+    variants: List[Dict[str, Any]] = []
+    needed = max(i for i, (name, _) in enumerate(steps) if name in wanted)
+    for name, fn in steps[:needed + 1]:
+        if name == "report_pdf" and (not reports.pdf_available() or n > pdf_max_rows):
+            reason = "WeasyPrint unavailable" if not reports.pdf_available() else f"above --pdf-max-rows {pdf_max_rows:,}"
+            results[name] = {"skipped": reason}
+            continue
+        if name.startswith("report_") and name not in wanted:
+            continue
+        metrics, out = _measure(fn, repeat if name in wanted else 1)
+        if name == "parse":
+            variants = out
+        elif name == "scoring":
+            data["scores"] = out
+        elif name == "ensemble":
+            data["ensemble"] = out
+        elif name == "annotate":
+            data["annotations"] = out
+            data["clinical"] = clinical_actionability(out)
+        if name in wanted:
+            metrics["variants_per_s"] = n / metrics["seconds"] if metrics["seconds"] else float("inf")
+            results[name] = metrics
+    return {name: results[name] for name in stages if name in results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Stages of ``current`` that regressed against ``baseline`` by more than ``threshold``."""
+    failures = []
+    for size, stages in current["results"].items():
+        for stage, now in stages.items():
+            before = baseline.get("results", {}).get(size, {}).get(stage)
+            if before is None or "skipped" in now or "skipped" in before:
+                continue
+            if now["variants_per_s"] < before["variants_per_s"] * (1 - threshold):
+                failures.append(
+                    f"{stage} @ {size}: {now['variants_per_s']:,.0f} variants/s "
+                    f"(baseline {before['variants_per_s']:,.0f})"
+                )
+            grown = now["peak_rss_mb"] - before["peak_rss_mb"]
+            if now["peak_rss_mb"] > before["peak_rss_mb"] * (1 + threshold) and grown > RSS_NOISE_MB:
+                failures.append(
+                    f"{stage} @ {size}: peak RSS {now['peak_rss_mb']:,.0f} MB "
+                    f"(baseline {before['peak_rss_mb']:,.0f} MB)"
+                )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated cohort sizes (up to 10M)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf-max-rows", type=int, default=10000, help="skip the PDF report above this size")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(s.replace("_", "")) for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    reports.load_templates()
+
+    run: Dict[str, Any] = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            print(f"Cohort of {n:,} variants")
+            results = run_cohort(n, stages, args.repeat, workdir, args.pdf_max_rows)
+            run["results"][str(n)] = results
+            for stage, m in results.items():
+                if "skipped" in m:
+                    print(f"  {stage:<13} skipped ({m['skipped']})")
+                else:
+                    print(
+                        f"  {stage:<13} {m['seconds']:9.3f} s  {m['variants_per_s']:>12,.0f} variants/s"
+                        f"  peak RSS {m['peak_rss_mb']:8.1f} MB"
+                    )
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(run, fh, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(run, fh, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    failures = compare(run, baseline, args.threshold)
+    if failures:
+        print(f"Regressions beyond {args.threshold:.0%} against {args.baseline}:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Serialization benchmark for a large ``/analyze`` result.
+
+Compares FastAPI's default encoding path (``jsonable_encoder`` + stdlib
+``json``) with the orjson layer in ``services.serialization`` and reports the
+bytes sent on the wire for identity, gzip and brotli encodings.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.bench_serialization --variants 50000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import zlib
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from app.backend.services.annotate import annotate_with_databases, clinical_actionability
+from app.backend.services.compression import brotli
+from app.backend.services.scoring import run_scoring_algorithms, run_ensemble_scores
+from app.backend.services.serialization import dumps
+
+from .synthetic import synthetic_variants
+
+
+def build_results(n: int, seed: int = 0) -> Dict[str, Any]:
+    variants: List[Dict[str, Any]] = list(synthetic_variants(n, seed))
+    scores = run_scoring_algorithms(variants, ["all"], {})
+    annotations = annotate_with_databases(variants)
+    return {
+        "job_id": "bench",
+        "variants": variants,
+        "scores": scores,
+        "ensemble": run_ensemble_scores(scores),
+        "annotations": annotations,
+        "clinical": clinical_actionability(annotations),
+    }
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    best, out = float("inf"), b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = build_results(args.variants)
+    stdlib = lambda: json.dumps(jsonable_encoder(results)).encode("utf-8")  # noqa: E731
+    fast = lambda: dumps(results)  # noqa: E731
+
+    print(f"/analyze payload with {args.variants:,} variants")
+    for name, fn in (("fastapi default", stdlib), ("orjson", fast)):
+        seconds, body = _time(fn, args.repeat)
+        print(f"  {name:<16} serialize {seconds * 1000:9.1f} ms  {len(body):>12,} bytes")
+
+    body = fast()
+    gz_s, gz = _time(lambda: zlib.compress(body, 5), args.repeat)
+    print(f"  {'gzip (level 5)':<16} compress  {gz_s * 1000:9.1f} ms  {len(gz):>12,} bytes")
+    if brotli is not None:
+        br_s, br = _time(lambda: brotli.compress(body, quality=5), args.repeat)
+        print(f"  {'brotli (q 5)':<16} compress  {br_s * 1000:9.1f} ms  {len(br):>12,} bytes")
+    else:
+        print("  brotli not installed; skipping")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Cold-start benchmark: backend import time, CLI startup and time to a serving ``/health``.
+
+Every measurement runs in a fresh interpreter, so nothing is cached between
+runs except by the OS. It reports the best and median of ``--repeat`` runs
+for:
+
+- ``import``: ``import app.backend.main`` (in-process timer, after interpreter start)
+- ``cli_batch``/``cli_sharded``: ``python -m app.backend.batch --help`` and ``sharded --help``, wall time
+- ``serve``: a uvicorn worker from process start to the first 200 from ``/health``
+- ``first_cosmic``: the first ``/cosmic/search`` on that worker, which loads the COSMIC client
+
+It also checks that importing the backend does not load any of
+``LAZY_MODULES``: heavy libraries are imported by the subsystem that needs
+them, on first use. The run fails (exit status 1) when one is loaded at
+import, or when the median ``serve`` time exceeds ``--target-ms``.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --target-ms 800 --output startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+WEBTOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Libraries that must not load with the backend itself
+LAZY_MODULES = ("pandas", "numpy", "pyarrow", "jinja2", "openpyxl", "weasyprint", "pypdf", "requests", "cyvcf2")
+DEFAULT_TARGET_MS = 1000.0
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.backend.main
+seconds = time.perf_counter() - t0
+print(json.dumps({"seconds": seconds, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _env(data_dir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "JOB_STORE_DIR": data_dir,
+        "STORAGE_SWEEP_INTERVAL": "0",
+        "PYTHONPATH": WEBTOOL_DIR,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(data_dir: str) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE % (LAZY_MODULES,)],
+        cwd=WEBTOOL_DIR, env=_env(data_dir), capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_cli(module: str, data_dir: str) -> float:
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", module, "--help"],
+        cwd=WEBTOOL_DIR, env=_env(data_dir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+    )
+    return time.perf_counter() - t0
+
+
+def _request(url: str, body: Any = None, timeout: float = 5.0) -> int:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+
+def measure_serve(data_dir: str, store: str, timeout: float = 60.0) -> Dict[str, float]:
+    """Seconds from spawning a uvicorn worker to its first ``/health`` 200, then the first COSMIC search."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "uvicorn", "app.backend.main:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", "1", "--log-level", "warning"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=WEBTOOL_DIR, env={**_env(data_dir), "JOB_STORE": store},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                if _request(f"{url}/health", timeout=1) == 200:
+                    break
+            except OSError:
+                pass
+            if proc.poll() is not None or time.perf_counter() - t0 > timeout:
+                raise RuntimeError("API server did not start")
+            time.sleep(0.005)
+        serve = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        _request(f"{url}/cosmic/search", {"search_type": "gene", "query": "TP53"}, timeout=30)
+        return {"serve": serve, "first_cosmic": time.perf_counter() - t1}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "best_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "runs": len(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--store", default="sqlite", choices=["json", "sqlite", "parquet"], help="JOB_STORE for the server")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS,
+                        help="fail when the median cold start to a serving /health exceeds this")
+    parser.add_argument("--output", help="also write the results to a JSON file")
+    args = parser.parse_args()
+
+    samples: Dict[str, List[float]] = {"import": [], "cli_batch": [], "cli_sharded": [], "serve": [], "first_cosmic": []}
+    loaded: set = set()
+    with tempfile.TemporaryDirectory() as data_dir:
+        for _ in range(args.repeat):
+            probe = measure_import(data_dir)
+            samples["import"].append(probe["seconds"])
+            loaded.update(probe["loaded"])
+            samples["cli_batch"].append(measure_cli("app.backend.batch", data_dir))
+            samples["cli_sharded"].append(measure_cli("app.backend.sharded", data_dir))
+            for name, seconds in measure_serve(data_dir, args.store).items():
+                samples[name].append(seconds)
+
+    results = {name: summarize(values) for name, values in samples.items()}
+    print(f"{'measurement':<14} {'best ms':>9} {'median ms':>10}")
+    for name, m in results.items():
+        print(f"{name:<14} {m['best_ms']:>9.1f} {m['median_ms']:>10.1f}")
+
+    failures = []
+    if loaded:
+        failures.append(f"importing the backend loads {', '.join(sorted(loaded))}")
+    if results["serve"]["median_ms"] > args.target_ms:
+        failures.append(f"cold start to /health {results['serve']['median_ms']:.0f} ms > target {args.target_ms:.0f} ms")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "store": args.store,
+                "target_ms": args.target_ms,
+                "results": results,
+                "eagerly_loaded": sorted(loaded),
+            }, fh, indent=2)
+    if failures:
+        for line in failures:
+            print(f"FAIL: {line}")
+        sys.exit(1)
+    print(f"Cold start within {args.target_ms:.0f} ms; no heavy modules loaded at import")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Peak memory of an analysis, streaming versus in memory, across job sizes.
+
+For each size a synthetic cohort is uploaded into a fresh job store, then
+analyzed in its own interpreter by the API's ``AnalysisRunner`` (``main.runner``,
+so the post-analysis hooks the server runs are included), once with
+``ANALYSIS_STREAMING=1`` (chunks flow through the stages and are written to
+the store as they finish) and once the in-memory way (chunks kept until
+one ``save_results``). It reports each run's peak RSS (``ru_maxrss``)
+above the interpreter's RSS after imports, and wall time, and checks that
+both modes produce the same ``results_sha256``.
+
+The run fails (exit status 1) when the results differ, or when streaming
+peak RSS grows from the smallest to the largest size by more than
+``--tolerance-mb``: it should not depend on the job size. Sizes should
+be above the Parquet row group size (65,536), since the Parquet writer
+holds up to one row group per section while it commits. The JSON store
+keeps streamed results in memory until they are saved, so it reports but
+is not checked.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.bench_streaming --sizes 100000,300000,1000000
+    python -m benchmarks.bench_streaming --store sqlite --chunk-size 2000 --output streaming.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from app.backend.services.streaming import STREAM_CHUNK_SIZE, STREAM_QUEUE_DEPTH
+
+WEBTOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TOLERANCE_MB = 32.0
+MODES = ("streaming", "in_memory")
+
+_UPLOAD = """
+import sys
+from benchmarks.synthetic import synthetic_csv
+from app.backend.services.parsers import parse_variant_file
+from app.backend.services.storage import get_store
+store = get_store(sys.argv[1], sys.argv[2])
+store.save("bench", {"filename": "cohort.csv", "variants": parse_variant_file("cohort.csv", synthetic_csv(int(sys.argv[3]), 7))})
+"""
+
+_ANALYZE = """
+import json, resource, sys, time
+from app.backend import main
+from app.backend.services.pipeline import analysis_key
+
+def rss_mb():
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * resource.getpagesize() / 1e6
+
+base = rss_mb()
+t0 = time.perf_counter()
+main.runner.submit("bench", ["all"], {}, analysis_key(["all"], {}))
+while (status := main.runner.status("bench"))["state"] not in ("done", "failed"):
+    time.sleep(0.05)
+seconds = time.perf_counter() - t0
+if status["state"] == "failed":
+    sys.exit(status["error"])
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+digest = main.store.load_meta("bench")["results_sha256"]
+print(json.dumps({"seconds": seconds, "base_mb": base, "peak_mb": peak, "results_sha256": digest}))
+"""
+
+
+def _run(script: str, *args: Any, **env: str) -> str:
+    env = {**os.environ, "PYTHONPATH": WEBTOOL_DIR, **env}
+    out = subprocess.run(
+        [sys.executable, "-c", script, *map(str, args)],
+        cwd=WEBTOOL_DIR, env=env, capture_output=True, text=True,
+    )
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit status {out.returncode}")
+    return out.stdout
+
+
+def measure(store: str, size: int, chunk_size: int, queue_depth: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as base_dir:
+        _run(_UPLOAD, store, base_dir, size)
+        for mode in MODES:
+            env = {
+                "JOB_STORE": store,
+                "JOB_STORE_DIR": base_dir,
+                "ANALYSIS_WORKERS": "1",
+                "ANALYSIS_STREAMING": "1" if mode == "streaming" else "0",
+                "STREAM_CHUNK_SIZE": str(chunk_size),
+                "STREAM_QUEUE_DEPTH": str(queue_depth),
+            }
+            run = json.loads(_run(_ANALYZE, **env).strip().splitlines()[-1])
+            results[mode] = {
+                "seconds": round(run["seconds"], 3),
+                "variants_per_second": round(size / run["seconds"]),
+                "peak_mb": round(run["peak_mb"] - run["base_mb"], 1),
+                "results_sha256": run["results_sha256"],
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,300000", help="comma-separated variant counts")
+    parser.add_argument("--store", default="parquet", choices=["parquet", "sqlite", "json"])
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE)
+    parser.add_argument("--queue-depth", type=int, default=STREAM_QUEUE_DEPTH)
+    parser.add_argument("--tolerance-mb", type=float, default=DEFAULT_TOLERANCE_MB,
+                        help="fail when streaming peak RSS grows by more than this from the smallest to the largest size")
+    parser.add_argument("--output", help="also write the results to a JSON file")
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+
+    results: Dict[int, Dict[str, Dict[str, float]]] = {}
+    print(f"{'variants':>10} {'mode':<10} {'seconds':>9} {'variants/s':>11} {'peak MB':>9}")
+    for size in sizes:
+        results[size] = measure(args.store, size, args.chunk_size, args.queue_depth)
+        for mode, m in results[size].items():
+            print(f"{size:>10,} {mode:<10} {m['seconds']:>9.1f} {m['variants_per_second']:>11,} {m['peak_mb']:>9.1f}")
+
+    failures: List[str] = []
+    for size, by_mode in results.items():
+        if by_mode["streaming"]["results_sha256"] != by_mode["in_memory"]["results_sha256"]:
+            failures.append(f"{size:,} variants: streaming results differ from the in-memory run")
+    growth = results[sizes[-1]]["streaming"]["peak_mb"] - results[sizes[0]]["streaming"]["peak_mb"]
+    # The JSON store buffers streamed results until commit, so it is not held to the bound
+    if len(sizes) > 1 and args.store != "json" and growth > args.tolerance_mb:
+        failures.append(
+            f"streaming peak RSS grows {growth:.1f} MB from {sizes[0]:,} to {sizes[-1]:,} variants"
+            f" (tolerance {args.tolerance_mb:.0f} MB)"
+        )
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "store": args.store,
+                "chunk_size": args.chunk_size,
+                "queue_depth": args.queue_depth,
+                "results": {str(size): by_mode for size, by_mode in results.items()},
+            }, fh, indent=2)
+    if failures:
+        for line in failures:
+            print(f"FAIL: {line}")
+        sys.exit(1)
+    print(f"Streaming peak RSS grows {growth:.1f} MB from {sizes[0]:,} to {sizes[-1]:,} variants; results match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""HTTP load test for the API: latency percentiles, throughput and errors per endpoint.
+
+Runs a weighted mix of ``/upload``, ``/analyze``, ``/report`` and
+``/cosmic/search`` requests from ``--concurrency`` client threads for
+``--duration`` seconds. Uploads are new synthetic cohorts of ``--variants``
+rows; analyses and reports target a pool of ``--jobs`` jobs created before
+the clock starts. Either point it at a running server with ``--url`` or let
+it start one with ``--spawn``, which makes worker counts and storage backends
+easy to compare.
+
+Run from ``webtool/``::
+
+    python -m benchmarks.loadtest --spawn --workers 1 --store sqlite --concurrency 16
+    python -m benchmarks.loadtest --spawn --workers 4 --store parquet --mix upload=1,analyze=1,report=2,cosmic=6
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --duration 60 --output run.json
+
+The client is Python threads, so at very high concurrency check that the
+load generator's own CPU is not the bottleneck.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from .synthetic import GENE_PANEL, synthetic_csv
+
+ENDPOINTS = ("upload", "analyze", "report", "cosmic")
+DEFAULT_MIX = "upload=1,analyze=2,report=1,cosmic=6"
+ALGORITHMS = ["SIFT", "PolyPhen-2", "PROVEAN", "MutationAssessor"]
+WEBTOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} in mix (expected {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadTest:
+    def __init__(self, url: str, variants: int, report_format: str, seed: int = 0) -> None:
+        self.url = url.rstrip("/")
+        self.variants = variants
+        self.report_format = report_format
+        self.jobs: List[str] = []
+        self._seeds = itertools.count(seed + 1_000_000)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # endpoint -> [(latency seconds, ok)]
+        self.samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _upload(self, seed: int) -> Callable[[], requests.Response]:
+        content = synthetic_csv(self.variants, seed=seed)
+        files = {"file": (f"cohort-{seed}.csv", content, "text/csv")}
+        return lambda: self._session().post(f"{self.url}/upload", files=files, timeout=600)
+
+    def setup(self, jobs: int) -> None:
+        """Upload and analyze the pool of jobs used by /analyze and /report requests."""
+        for seed in range(jobs):
+            resp = self._upload(seed)()
+            resp.raise_for_status()
+            job_id = resp.json()["job_id"]
+            self._session().post(f"{self.url}/analyze", json={"job_id": job_id, "analyses": ["all"]}, timeout=600).raise_for_status()
+            self.jobs.append(job_id)
+
+    def _request(self, endpoint: str, rng: random.Random) -> Callable[[], requests.Response]:
+        session = self._session()
+        if endpoint == "upload":
+            with self._lock:
+                seed = next(self._seeds)
+            return self._upload(seed)
+        if endpoint == "analyze":
+            analyses = rng.sample(ALGORITHMS, rng.randint(1, len(ALGORITHMS)))
+            body = {"job_id": rng.choice(self.jobs), "analyses": sorted(analyses)}
+            return lambda: session.post(f"{self.url}/analyze", json=body, timeout=600)
+        if endpoint == "report":
+            body = {"job_id": rng.choice(self.jobs), "format": self.report_format}
+            return lambda: session.post(f"{self.url}/report", json=body, timeout=600)
+        gene, _, _, _, hotspots = rng.choices(GENE_PANEL, weights=[1 / r for r in range(1, len(GENE_PANEL) + 1)])[0]
+        if hotspots and rng.random() < 0.5:
+            body = {"search_type": "mutation", "query": rng.choice(hotspots), "gene": gene}
+        else:
+            body = {"search_type": "gene", "query": gene}
+        return lambda: session.post(f"{self.url}/cosmic/search", json=body, timeout=60)
+
+    def _record(self, endpoint: str, latency: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.samples[endpoint].append((latency, error is None))
+            if error is not None:
+                self.errors[endpoint][error] += 1
+
+    def _worker(self, mix: Dict[str, float], deadline: float, seed: int) -> None:
+        rng = random.Random(seed)
+        names, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(names, weights=weights)[0]
+            send = self._request(endpoint, rng)
+            error = None
+            t0 = time.perf_counter()
+            try:
+                resp = send()
+                _ = resp.content  # include the full body in the latency
+                if resp.status_code >= 400:
+                    error = f"HTTP {resp.status_code}"
+            except requests.RequestException as exc:
+                error = type(exc).__name__
+            self._record(endpoint, time.perf_counter() - t0, error)
+
+    def run(self, mix: Dict[str, float], concurrency: int, duration: float, seed: int = 0) -> float:
+        """Drive the mix for ``duration`` seconds; returns the measured wall time."""
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self._worker, mix, start + duration, seed + i) for i in range(concurrency)]
+            for future in futures:
+                future.result()
+        return time.monotonic() - start
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints: Dict[str, Any] = {}
+        everything: List[float] = []
+        total_errors = 0
+        for endpoint in ENDPOINTS:
+            samples = self.samples.get(endpoint)
+            if not samples:
+                continue
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            everything.extend(latencies)
+            total_errors += errors
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": errors / len(samples),
+                "error_kinds": dict(self.errors.get(endpoint, {})),
+                "throughput_rps": len(samples) / elapsed,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": latencies[-1] * 1000,
+            }
+        everything.sort()
+        overall = {
+            "requests": len(everything),
+            "errors": total_errors,
+            "error_rate": total_errors / len(everything) if everything else 0.0,
+            "throughput_rps": len(everything) / elapsed,
+            "p50_ms": percentile(everything, 50) * 1000,
+            "p95_ms": percentile(everything, 95) * 1000,
+            "p99_ms": percentile(everything, 99) * 1000,
+        }
+        return {"elapsed_s": elapsed, "endpoints": endpoints, "overall": overall}
+
+
+@contextlib.contextmanager
+def spawned_server(port: int, workers: int, store: str, env: Dict[str, str]) -> Iterator[str]:
+    """A uvicorn server on a throwaway data directory, stopped on exit."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        server_env = {
+            **os.environ,
+            "JOB_STORE": store,
+            "JOB_STORE_DIR": data_dir,
+            "STORAGE_SWEEP_INTERVAL": "0",
+            **env,
+        }
+        cmd = [sys.executable, "-m", "uvicorn", "app.backend.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+        proc = subprocess.Popen(cmd, cwd=WEBTOOL_DIR, env=server_env)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if requests.get(f"{url}/health", timeout=1).ok:
+                        break
+                except requests.RequestException:
+                    pass
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("API server did not start")
+                time.sleep(0.2)
+            yield url
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    header = f"  {'endpoint':<10} {'requests':>9} {'req/s':>8} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    rows = list(summary["endpoints"].items()) + [("overall", summary["overall"])]
+    for name, m in rows:
+        print(
+            f"  {name:<10} {m['requests']:>9,} {m['throughput_rps']:>8.1f} {m['error_rate']:>8.1%}"
+            f" {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} {m['p99_ms']:>9.1f}"
+        )
+    for name, m in summary["endpoints"].items():
+        for kind, count in m["error_kinds"].items():
+            print(f"  {name}: {count:,} x {kind}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a uvicorn server for the run instead of using --url")
+    parser.add_argument("--port", type=int, default=8001, help="port for --spawn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for --spawn")
+    parser.add_argument("--store", default="sqlite", choices=["json", "sqlite", "parquet"], help="JOB_STORE for --spawn")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after setup")
+    parser.add_argument("--variants", type=int, default=1000, help="variants per uploaded job")
+    parser.add_argument("--jobs", type=int, default=4, help="jobs created up front for /analyze and /report")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--report-format", default="html", choices=["html", "pdf", "xlsx"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the configuration and results to a JSON file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.jobs < 1 and ({"analyze", "report"} & set(mix)):
+        parser.error("--jobs must be at least 1 when the mix includes analyze or report")
+
+    with contextlib.ExitStack() as stack:
+        url = stack.enter_context(spawned_server(args.port, args.workers, args.store, {})) if args.spawn else args.url
+        test = LoadTest(url, args.variants, args.report_format, seed=args.seed)
+        print(f"Setting up {args.jobs} jobs of {args.variants:,} variants on {url}")
+        test.setup(args.jobs)
+        print(f"Running {args.mix} with {args.concurrency} clients for {args.duration:g} s")
+        elapsed = test.run(mix, args.concurrency, args.duration, seed=args.seed)
+    summary = test.summary(elapsed)
+    print_summary(summary)
+
+    if args.output:
+        config = {name: getattr(args, name) for name in
+                  ("spawn", "workers", "store", "concurrency", "duration", "variants", "jobs", "mix", "report_format")}
+        config["url"] = url
+        with open(args.output, "w") as fh:
+            json.dump({"config": config, **summary}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
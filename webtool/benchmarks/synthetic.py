@@ -0,0 +1,134 @@
+"""Synthetic cancer cohorts for the benchmarks.
+
+Variants fall in a fixed panel of cancer genes with a Zipf-like gene
+frequency, and a share of them hit each gene's known hotspots (KRAS G12D,
+BRAF V600E, TP53 R175H, ...), so repeated variants and skewed genes behave
+as in real cohorts: caches hit, gene indexes are lopsided. Coordinates are
+derived from the gene and protein position, so a hotspot always has the same
+``chrom``/``pos``/``ref``/``alt``. They are not real genomic coordinates.
+"""
+from __future__ import annotations
+
+import io
+import random
+import re
+from typing import Any, Dict, Iterator, List
+
+from app.backend.services.scoring import run_ensemble_scores, run_scoring_algorithms
+
+# gene, chromosome, start (GRCh37, approximate), protein length, hotspots
+GENE_PANEL = [
+    ("TP53", "17", 7571720, 393, ["p.R175H", "p.R248Q", "p.R273H", "p.R248W", "p.R273C", "p.G245S", "p.Y220C"]),
+    ("KRAS", "12", 25357723, 189, ["p.G12D", "p.G12V", "p.G13D", "p.G12C", "p.Q61H"]),
+    ("PIK3CA", "3", 178866311, 1068, ["p.H1047R", "p.E545K", "p.E542K"]),
+    ("BRAF", "7", 140419127, 766, ["p.V600E"]),
+    ("APC", "5", 112043195, 2843, ["p.R1450*", "p.R876*", "p.Q1378*"]),
+    ("EGFR", "7", 55086725, 1210, ["p.L858R", "p.T790M", "p.G719S"]),
+    ("PTEN", "10", 89623195, 403, ["p.R130G", "p.R130Q", "p.R233*"]),
+    ("NRAS", "1", 115247085, 189, ["p.Q61K", "p.Q61R", "p.G12D"]),
+    ("ARID1A", "1", 27022522, 2285, ["p.R1989*"]),
+    ("KMT2D", "12", 49412758, 5537, []),
+    ("BRCA2", "13", 32889611, 3418, []),
+    ("BRCA1", "17", 41196312, 1863, ["p.C61G"]),
+    ("CTNNB1", "3", 41240942, 781, ["p.S45F", "p.S33C", "p.T41A"]),
+    ("IDH1", "2", 209100951, 414, ["p.R132H", "p.R132C"]),
+    ("FBXW7", "4", 153242410, 707, ["p.R465C", "p.R479Q"]),
+    ("ATM", "11", 108093559, 3056, []),
+    ("SMAD4", "18", 48556583, 552, ["p.R361H"]),
+    ("ERBB2", "17", 37844167, 1255, ["p.S310F", "p.V842I"]),
+    ("NOTCH1", "9", 139388896, 2555, []),
+    ("CDKN2A", "9", 21967751, 156, ["p.R80*", "p.H83Y"]),
+]
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+BASES = "ACGT"
+CSV_COLUMNS = ("chrom", "pos", "ref", "alt", "gene", "protein_change")
+
+_POSITION_RE = re.compile(r"p\.[A-Z](\d+)")
+
+
+def _alleles(seed: str) -> tuple[str, str]:
+    rng = random.Random(seed)
+    ref = rng.choice(BASES)
+    return ref, rng.choice(BASES.replace(ref, ""))
+
+
+def _hotspot(gene: str, chrom: str, start: int, change: str) -> Dict[str, Any]:
+    ref, alt = _alleles(f"{gene}:{change}")
+    position = int(_POSITION_RE.match(change).group(1))
+    return {"chrom": chrom, "pos": start + 3 * position, "ref": ref, "alt": alt, "gene": gene, "protein_change": change}
+
+
+def synthetic_variants(n: int, seed: int = 0, hotspot_fraction: float = 0.3) -> Iterator[Dict[str, Any]]:
+    """``n`` variant records as produced by the upload parsers.
+
+    Genes are drawn with weight 1/rank over :data:`GENE_PANEL`; for genes with
+    hotspots, ``hotspot_fraction`` of their variants are one of them (again
+    1/rank weighted), the rest fall anywhere in the protein.
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / rank for rank in range(1, len(GENE_PANEL) + 1)]
+    hotspots = [
+        [_hotspot(gene, chrom, start, change) for change in changes]
+        for gene, chrom, start, _, changes in GENE_PANEL
+    ]
+    hotspot_weights = [[1.0 / rank for rank in range(1, len(h) + 1)] for h in hotspots]
+    genes = rng.choices(range(len(GENE_PANEL)), weights=weights, k=n)
+    for g in genes:
+        gene, chrom, start, length, _ = GENE_PANEL[g]
+        if hotspots[g] and rng.random() < hotspot_fraction:
+            yield dict(rng.choices(hotspots[g], weights=hotspot_weights[g])[0])
+            continue
+        position = rng.randint(1, length)
+        ref = rng.choice(BASES)
+        yield {
+            "chrom": chrom,
+            "pos": start + 3 * position,
+            "ref": ref,
+            "alt": rng.choice(BASES.replace(ref, "")),
+            "gene": gene,
+            "protein_change": f"p.{rng.choice(AMINO_ACIDS)}{position}{rng.choice(AMINO_ACIDS)}",
+        }
+
+
+def synthetic_csv(n: int, seed: int = 0, hotspot_fraction: float = 0.3) -> bytes:
+    """The same cohort as :func:`synthetic_variants`, as an upload-ready CSV file."""
+    out = io.StringIO()
+    out.write(",".join(CSV_COLUMNS) + "\n")
+    for v in synthetic_variants(n, seed, hotspot_fraction):
+        out.write(",".join(str(v[c]) for c in CSV_COLUMNS) + "\n")
+    return out.getvalue().encode("utf-8")
+
+
+def synthetic_pages(rows: int, page_size: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Results for a ``rows``-variant job in consecutive pages, like a store's ``iter_results``.
+
+    Scores are computed; annotations and clinical entries are canned, so
+    pages are cheap to produce at cohort scale.
+    """
+    variants = synthetic_variants(rows, seed)
+    for offset in range(0, rows, page_size):
+        page: List[Dict[str, Any]] = [next(variants) for _ in range(min(page_size, rows - offset))]
+        scores = run_scoring_algorithms(page, ["all"], {}, offset=offset)
+        annotations, clinical = {}, {}
+        for i, v in enumerate(page, start=offset):
+            key = f"{v['gene']}:{v['protein_change']}#{i}"
+            annotations[key] = {
+                "COSMIC": {"match": True, "id": f"COSM{i}", "frequency": 0.1, "cancer_types": ["Breast"],
+                           "pathogenicity": "Pathogenic", "clinical_significance": "Pathogenic"},
+                "ClinVar": {"clinical_significance": "Pathogenic"},
+                "MyCancerGenome": {"evidence": "Pathogenic"},
+                "links": [],
+            }
+            clinical[key] = {
+                "actionable": True,
+                "therapies": [{"drug": "Olaparib", "status": "FDA-approved", "indication": "BRCA-mutated breast cancer"}],
+                "confidence": "medium",
+            }
+        yield {
+            "variants": page,
+            "scores": scores,
+            "ensemble": run_ensemble_scores(scores),
+            "annotations": annotations,
+            "clinical": clinical,
+        }
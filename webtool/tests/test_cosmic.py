@@ -0,0 +1,15 @@
+from app.backend.services.cosmic_client import MockCOSMICClient, run_search_batch
+
+
+def test_batch_keys_align_with_queries():
+    queries = [
+        {"search_type": "gene", "query": "tp53"},
+        {"search_type": "coordinates", "query": "", "chromosome": "17"},
+        {"search_type": "gene", "query": "TP53 "},
+    ]
+    out = run_search_batch(MockCOSMICClient(), queries)
+    assert out["keys"][0] == out["keys"][2] == "gene:TP53"
+    assert (out["num_queries"], out["num_unique"]) == (3, 2)
+    # Duplicates point at the shared result; failures are reported under the query's key
+    assert out["keys"][0] in out["results"]
+    assert out["keys"][1] in out["errors"]
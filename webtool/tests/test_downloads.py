@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.backend.services.downloads import etag_strong_match, serve_download
+
+ETAG = '"abc123"'
+
+
+def _request(**headers):
+    return Request({"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+
+def _body(response):
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+@pytest.mark.parametrize("header, expected", [
+    (ETAG, True),
+    (f" {ETAG} ", True),
+    (f"W/{ETAG}", False),
+    ("*", False),
+    ('"other"', False),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", False),
+    (None, False),
+])
+def test_if_range_uses_strong_comparison(header, expected):
+    assert etag_strong_match(header, ETAG) is expected
+    assert etag_strong_match(header, f"W/{ETAG}") is False
+
+
+@pytest.mark.parametrize("if_range, status, body", [
+    (ETAG, 206, b"2345"),
+    (f"W/{ETAG}", 200, b"0123456789"),
+    ("*", 200, b"0123456789"),
+])
+def test_range_is_served_only_for_a_strong_if_range_match(if_range, status, body):
+    response = serve_download(
+        _request(range="bytes=2-5", if_range=if_range), b"0123456789", "application/pdf", "r.pdf", ETAG,
+    )
+    assert response.status_code == status
+    assert _body(response) == body
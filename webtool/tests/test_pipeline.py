@@ -0,0 +1,7 @@
+from app.backend.services.pipeline import analysis_key
+
+
+def test_analysis_key_ignores_option_and_analysis_order():
+    assert analysis_key(["all"], {"a": 1, "b": {"x": 1, "y": 2}}) == analysis_key(["all"], {"b": {"y": 2, "x": 1}, "a": 1})
+    assert analysis_key(["SIFT", "REVEL"], {}) == analysis_key(["REVEL", "SIFT", "SIFT"], {})
+    assert analysis_key(["all"], {"a": 1}) != analysis_key(["all"], {"a": 2})
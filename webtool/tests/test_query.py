@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.backend.services import query
+from app.backend.services.query import JobIndexCache
+
+
+def test_index_builds_for_different_jobs_run_in_parallel(monkeypatch):
+    release = threading.Event()
+
+    def build(store, job_id, num_variants):
+        if job_id == "slow":
+            assert release.wait(10)
+        return job_id
+
+    monkeypatch.setattr(query.JobIndex, "build", staticmethod(build))
+    cache = JobIndexCache()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow = pool.submit(cache.get, None, "slow", "d", 0)
+        # Would time out if the slow build held a cache-wide lock
+        assert pool.submit(cache.get, None, "fast", "d", 0).result(timeout=5) == "fast"
+        release.set()
+        assert slow.result(timeout=5) == "slow"
+
+
+def test_concurrent_requests_for_one_index_build_it_once(monkeypatch):
+    builds = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def build(store, job_id, num_variants):
+        builds.append(job_id)
+        started.set()
+        assert release.wait(10)
+        return object()
+
+    monkeypatch.setattr(query.JobIndex, "build", staticmethod(build))
+    cache = JobIndexCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get, None, "job", "d", 0) for _ in range(8)]
+        assert started.wait(5)
+        release.set()
+        indexes = {id(f.result(timeout=5)) for f in futures}
+    assert builds == ["job"]
+    assert len(indexes) == 1
+
+
+def test_aggregate_sample_is_evenly_spaced(tmp_path):
+    from app.backend.services.pipeline import run_pipeline
+    from app.backend.services.storage import get_store
+
+    variants = [{"chrom": "1", "pos": i, "ref": "A", "alt": "T", "gene": "TP53", "protein_change": None} for i in range(25)]
+    store = get_store("sqlite", str(tmp_path))
+    store.save("job", {"filename": "job.csv", "variants": variants})
+    store.save_results("job", run_pipeline(variants, ["SIFT"], {}), analysis_key="k", results_sha256="d")
+    index = query.JobIndex.build(store, "job", len(variants))
+    rows = index.match(query.Query())
+
+    assert "sample" not in index.aggregate(rows)
+    sample = index.aggregate(rows, sample=10)["sample"]
+    assert sample["step"] == 3
+    assert [row["idx"] for row in sample["rows"]] == list(range(0, 25, 3))
+    assert set(sample["rows"][0]) == {"idx", "variant", "SIFT", "REVEL", "MetaLR"}
+    assert len(index.aggregate(rows, sample=100)["sample"]["rows"]) == 25
+
+
+@pytest.mark.parametrize("backend", ("json", "sqlite", "parquet"))
+def test_clinical_filters(backend, tmp_path):
+    from app.backend.services.pipeline import run_pipeline
+    from app.backend.services.storage import get_store
+
+    variants = [{"chrom": "17", "pos": 7577120 + i, "ref": "C", "alt": "T", "gene": "TP53", "protein_change": f"p.R{i}H"} for i in range(20)]
+    store = get_store(backend, str(tmp_path))
+    store.save("job", {"filename": "job.csv", "variants": variants})
+    store.save_results("job", run_pipeline(variants, ["SIFT", "REVEL"], {}), analysis_key="k", results_sha256="d")
+    index = query.JobIndex.build(store, "job", len(variants))
+    everything = index.rows(index.match(query.Query()), ["cancer_types", "REVEL", query.LEVEL_SCORE])
+
+    # REVEL is the level score wherever a variant has one
+    assert all(r[query.LEVEL_SCORE] == r["REVEL"] for r in everything)
+    cancer_type = everything[0]["cancer_types"].split(query.CANCER_TYPE_SEPARATOR)[0]
+    assert len(index.match(query.Query(cancer_types=[cancer_type.upper()]))) == len(variants)
+    assert len(index.match(query.Query(cancer_types=["no such cancer"]))) == 0
+
+    assert list(index.match(query.Query(contains="p.R7H"))) == [7]
+
+    cut = everything[3]["REVEL"]
+    below = index.match(query.Query(ranges={query.LEVEL_SCORE: query.ScoreRange(max=cut, max_exclusive=True)}))
+    at_or_above = index.match(query.Query(ranges={query.LEVEL_SCORE: query.ScoreRange(min=cut)}))
+    assert 3 not in below and 3 in at_or_above
+    assert len(below) + len(at_or_above) == len(variants)
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject  # noqa: E402
+
+from app.backend.services.reports import _PdfConcatenator  # noqa: E402
+
+
+def _part(tag, num_pages):
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for i in range(num_pages):
+        page = writer.add_blank_page(200, 200)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 100 Td ({tag}{i}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    title = writer.add_outline_item(f"{tag} title", 0)
+    writer.add_outline_item(f"{tag} section", num_pages - 1, parent=title)
+    writer.add_metadata({"/Title": f"Report {tag}"})
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def test_concatenated_parts_keep_pages_and_outline():
+    out = io.BytesIO()
+    pdf = _PdfConcatenator(out)
+    for tag, num_pages in (("a", 3), ("b", 2), ("c", 1)):
+        pdf.add(_part(tag, num_pages))
+    pdf.close()
+
+    reader = pypdf.PdfReader(io.BytesIO(out.getvalue()), strict=True)
+    assert [page.extract_text() for page in reader.pages] == ["a0", "a1", "a2", "b0", "b1", "c0"]
+    titles = [(item.title, reader.get_destination_page_number(item)) for item in reader.outline if not isinstance(item, list)]
+    assert titles == [("a title", 0), ("b title", 3), ("c title", 5)]
+    assert [reader.get_destination_page_number(items[0]) for items in reader.outline if isinstance(items, list)] == [2, 4, 5]
+    assert reader.metadata.title == "Report a"
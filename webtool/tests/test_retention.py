@@ -0,0 +1,45 @@
+import pytest
+
+from app.backend.services.pipeline import run_pipeline
+from app.backend.services.retention import RetentionManager, RetentionPolicy
+from app.backend.services.storage import get_store
+
+STORES = ("json", "sqlite", "parquet")
+VARIANTS = [{"chrom": "1", "pos": i, "ref": "A", "alt": "T", "gene": "TP53", "protein_change": None} for i in range(200)]
+
+
+def _job(store, key):
+    store.save(key, {"filename": f"{key}.csv", "variants": VARIANTS})
+    store.save_results(key, run_pipeline(VARIANTS, ["all"], {}), analysis_key="k", results_sha256="d")
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_compact_returns_new_size(backend, tmp_path):
+    store = get_store(backend, str(tmp_path))
+    _job(store, "a")
+    size = store.compact("a")
+    assert size is not None
+    assert size == {j["job_id"]: j["size_bytes"] for j in store.list_jobs()}["a"]
+    # Nothing left to drop
+    assert store.compact("a") is None
+    assert store.compact("missing") is None
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_quota_sweep_uses_compacted_sizes(backend, tmp_path, monkeypatch):
+    store = get_store(backend, str(tmp_path))
+    for key in ("a", "b", "c"):
+        _job(store, key)
+    sizes = {j["job_id"]: j["size_bytes"] for j in store.list_jobs()}
+    calls = []
+    list_jobs = store.list_jobs
+    monkeypatch.setattr(store, "list_jobs", lambda: calls.append(1) or list_jobs())
+
+    # Compacting the least recently used job is enough to fit
+    quota = sum(sizes.values()) - 1
+    manager = RetentionManager(store, RetentionPolicy(quota_bytes=quota, hot_seconds=0))
+    swept = manager.sweep(now=max(j["accessed_at"] for j in list_jobs()) + 10)
+    assert len(calls) == 1
+    assert len(swept["compacted_jobs"]) == 1 and not swept["removed_jobs"]
+    assert sum(j["size_bytes"] for j in list_jobs()) <= quota
+
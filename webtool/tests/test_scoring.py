@@ -0,0 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.backend.services.scoring import _stable_random_number
+
+
+def test_stable_random_number_is_deterministic_across_threads():
+    seeds = [f"seed-{i}" for i in range(20000)]
+    expected = [_stable_random_number(seed) for seed in seeds]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(3):
+            assert list(pool.map(_stable_random_number, seeds, chunksize=50)) == expected
@@ -0,0 +1,32 @@
+import hashlib
+
+import pytest
+
+from app.backend.services.pipeline import run_pipeline
+from app.backend.services.serialization import dumps
+from app.backend.services.shards import ShardQueue, ShardWorker, submit_sharded
+from app.backend.services.storage import get_store
+
+STORES = ("json", "sqlite", "parquet")
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_sharded_merge_matches_unsharded_run(backend, tmp_path, monkeypatch):
+    # Interleaved chromosomes give every shard many short runs; small chunks make the merge write several
+    monkeypatch.setattr("app.backend.services.shards.MERGE_CHUNK_SIZE", 7)
+    variants = [
+        {"chrom": str(i % 3 + 1), "pos": 1000 + i, "ref": "A", "alt": "T", "gene": "TP53", "protein_change": None}
+        for i in range(60)
+    ]
+    store = get_store(backend, str(tmp_path / "jobs"))
+    store.save("job", {"filename": "job.csv", "variants": variants})
+    queue = ShardQueue(str(tmp_path / "queue"))
+    submit_sharded(queue, store, "job", ["all"], {}, max_variants=8)
+    ShardWorker(queue, store).work(idle_exit=0)
+
+    status = queue.status("job")
+    expected = run_pipeline(variants, ["all"], {})
+    assert status["state"] == "done" and status["num_shards"] > 3
+    assert status["results_sha256"] == hashlib.sha256(dumps(expected)).hexdigest()
+    assert store.load_meta("job")["results_sha256"] == status["results_sha256"]
+    assert store.load_results("job") == expected
@@ -0,0 +1,57 @@
+import hashlib
+
+import pytest
+
+from app.backend.services import streaming
+from app.backend.services.pipeline import run_pipeline
+from app.backend.services.serialization import dumps
+from app.backend.services.storage import get_store
+
+STORES = ("json", "sqlite", "parquet")
+
+
+def _variants(n):
+    return [
+        {"chrom": f"chr{i % 3 + 1}", "pos": 1000 + i, "ref": "A", "alt": "T", "gene": "TP53", "protein_change": None}
+        for i in range(n)
+    ]
+
+
+def _analyzed_store(backend, tmp_path, variants):
+    store = get_store(backend, str(tmp_path))
+    store.save("job", {"filename": "a.csv", "variants": variants})
+    results = run_pipeline(variants, ["SIFT"], {})
+    store.save_results("job", results, analysis_key="previous", results_sha256="previous")
+    return store, results
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_stream_analysis_matches_in_memory_run(backend, tmp_path):
+    variants = _variants(2500)
+    store, _ = _analyzed_store(backend, tmp_path, variants)
+    digest = streaming.stream_analysis(store, "job", ["all"], {}, chunk_size=300, analysis_key="new")
+    expected = hashlib.sha256(dumps(run_pipeline(variants, ["all"], {}))).hexdigest()
+    assert digest == expected
+    assert hashlib.sha256(dumps(store.load_results("job"))).hexdigest() == expected
+    meta = store.load_meta("job")
+    assert (meta["analysis_key"], meta["results_sha256"], meta["has_results"]) == ("new", expected, True)
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_failed_stream_analysis_keeps_previous_results(backend, tmp_path, monkeypatch):
+    variants = _variants(2500)
+    store, previous = _analyzed_store(backend, tmp_path, variants)
+
+    def fail_late(part, offset, analyses, options):
+        if offset >= 1200:
+            raise ValueError("annotation failed")
+        part["annotations"] = {}
+
+    stages = tuple((name, fail_late if name == "annotate" else fn) for name, fn in streaming.PIPELINE_STAGES)
+    monkeypatch.setattr(streaming, "PIPELINE_STAGES", stages)
+    with pytest.raises(ValueError, match="annotation failed"):
+        streaming.stream_analysis(store, "job", ["all"], {}, chunk_size=300, analysis_key="new")
+
+    meta = store.load_meta("job")
+    assert (meta["analysis_key"], meta["results_sha256"], meta["has_results"]) == ("previous", "previous", True)
+    assert dumps(store.load_results("job")) == dumps(previous)
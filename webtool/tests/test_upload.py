@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+import pytest
+
+# The API creates its stores on import; keep them out of the repository's data/
+os.environ.setdefault("JOB_STORE_DIR", tempfile.mkdtemp(prefix="webtool-test-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.backend import main  # noqa: E402
+from app.backend.services.pipeline import run_pipeline  # noqa: E402
+from app.backend.services.storage import get_store  # noqa: E402
+
+STORES = ("json", "sqlite", "parquet")
+CSV = b"chrom,pos,ref,alt,gene,protein_change\n17,7577120,C,T,TP53,p.R273H\n12,25398284,C,A,KRAS,p.G12V\n"
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_copy_job_copies_variants_and_results(backend, tmp_path):
+    store = get_store(backend, str(tmp_path))
+    variants = [{"chrom": "1", "pos": i, "ref": "A", "alt": "T", "gene": "TP53", "protein_change": None} for i in range(50)]
+    store.save("a", {"filename": "a.csv", "variants": variants})
+    results = run_pipeline(variants, ["SIFT"], {})
+    store.save_results("a", results, analysis_key="k", results_sha256="d")
+    assert store.copy_job("a", "b")
+    assert not store.copy_job("missing", "c")
+    assert store.load_variants("b") == variants
+    assert store.load_results("b") == store.load_results("a")
+    meta = store.load_meta("b")
+    assert (meta["analysis_key"], meta["results_sha256"], meta["has_results"]) == ("k", "d", True)
+
+    # The copy is independent of the original
+    store.save_results("a", run_pipeline(variants, ["PolyPhen-2"], {}), analysis_key="k2", results_sha256="d2")
+    assert store.load_meta("b")["analysis_key"] == "k"
+    assert store.load_results("b") == results
+
+
+@pytest.mark.parametrize("backend", STORES)
+def test_identical_uploads_get_separate_jobs(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "store", get_store(backend, str(tmp_path)))
+    client = TestClient(main.app)
+    first = client.post("/upload", files={"file": ("x.csv", CSV, "text/csv")}).json()
+    second = client.post("/upload", files={"file": ("x.csv", CSV, "text/csv")}).json()
+    assert first["job_id"] != second["job_id"]
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+
+    for job, algorithm in ((first["job_id"], "SIFT"), (second["job_id"], "PolyPhen-2")):
+        assert client.post("/analyze", json={"job_id": job, "analyses": [algorithm]}).status_code == 200
+    for job, algorithm in ((first["job_id"], "SIFT"), (second["job_id"], "PolyPhen-2")):
+        scores = client.get(f"/jobs/{job}/results").json()["scores"]
+        assert scores and all(set(entry) == {algorithm} for entry in scores.values())
+
+    # A later upload starts from the first job's results, so its analysis is reused
+    third = client.post("/upload", files={"file": ("x.csv", CSV, "text/csv")}).json()
+    assert main.store.load_meta(third["job_id"])["analysis_key"] == main.store.load_meta(first["job_id"])["analysis_key"]